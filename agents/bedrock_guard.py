@@ -0,0 +1,303 @@
+"""
+Bedrock Guard
+Deadline-aware Bedrock calls with a circuit breaker, shared by the agents.
+Calls are bounded by the Lambda's remaining time (through the SDK's socket
+timeouts, so an overdue call is abandoned rather than left running), and a breaker that trips on
+consecutive failures or slow calls lets agents fall back immediately instead
+of stalling the state machine. Breaker state and p99 latency are exported as
+CloudWatch embedded metrics. Streaming responses can be parsed field by field
+so decision fields are usable before the model finishes writing.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Iterator, Tuple
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ConnectTimeoutError, ReadTimeoutError
+
+BEDROCK_CALL_TIMEOUT_SECONDS = float(os.environ.get('BEDROCK_CALL_TIMEOUT_SECONDS', '30'))
+BEDROCK_DEADLINE_MARGIN_SECONDS = float(os.environ.get('BEDROCK_DEADLINE_MARGIN_SECONDS', '5'))
+BEDROCK_MIN_CALL_SECONDS = float(os.environ.get('BEDROCK_MIN_CALL_SECONDS', '1'))
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', '3'))
+BREAKER_SLOW_CALL_SECONDS = float(os.environ.get('BREAKER_SLOW_CALL_SECONDS', '10'))
+BREAKER_RESET_SECONDS = float(os.environ.get('BREAKER_RESET_SECONDS', '60'))
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'SchemaGuard')
+BEDROCK_STREAMING = os.environ.get('BEDROCK_STREAMING', 'false').lower() == 'true'
+
+# Client-side ceiling for any single call; the per-call deadline below is usually tighter
+BEDROCK_CLIENT_CONFIG = Config(
+    connect_timeout=5,
+    read_timeout=BEDROCK_CALL_TIMEOUT_SECONDS,
+    retries={'max_attempts': 2, 'mode': 'standard'}
+)
+
+_bounded_clients = {}
+_bounded_clients_lock = threading.Lock()
+_json_decoder = json.JSONDecoder()
+_SEPARATORS = re.compile(r'[\s,]*')
+_NUMBER_TAIL = re.compile(r'[0-9eE.+-]*')
+
+class BreakerOpenError(Exception):
+    """The breaker is open; use the fallback without calling Bedrock"""
+
+class DeadlineExceededError(Exception):
+    """The call did not finish (or could not start) within the time budget"""
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open trial call.
+
+    CLOSED passes calls through. BREAKER_FAILURE_THRESHOLD failures or slow
+    calls in a row open it; after BREAKER_RESET_SECONDS one trial call is let
+    through (HALF_OPEN) and its outcome closes or re-opens the breaker.
+    State lives in the module, so it persists across warm invocations.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 slow_call_seconds: float = BREAKER_SLOW_CALL_SECONDS,
+                 reset_seconds: float = BREAKER_RESET_SECONDS, window: int = 200):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_seconds = reset_seconds
+        self.state = 'CLOSED'
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.latencies = deque(maxlen=window)
+        self.short_circuited = 0
+
+    def allow(self) -> bool:
+        if self.state == 'OPEN':
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                self.short_circuited += 1
+                return False
+            self.state = 'HALF_OPEN'
+            return True
+        # Only the single trial call may run while half-open
+        if self.state == 'HALF_OPEN':
+            self.short_circuited += 1
+            return False
+        return True
+
+    def record(self, latency_seconds: float, succeeded: bool):
+        self.latencies.append(latency_seconds)
+        if succeeded and latency_seconds <= self.slow_call_seconds:
+            self.state = 'CLOSED'
+            self.consecutive_failures = 0
+            return
+        self.consecutive_failures += 1
+        if self.state == 'HALF_OPEN' or self.consecutive_failures >= self.failure_threshold:
+            self.state = 'OPEN'
+            self.opened_at = time.monotonic()
+            print(f"Circuit breaker {self.name} opened after {self.consecutive_failures} failed or slow calls")
+
+    def p99_ms(self) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'short_circuited': self.short_circuited,
+            'p99_ms': round(self.p99_ms(), 1),
+            'calls': len(self.latencies)
+        }
+
+    def emit_metrics(self):
+        """Print one CloudWatch Embedded Metric Format record for this breaker"""
+        print(json.dumps({
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [['Agent']],
+                    'Metrics': [
+                        {'Name': 'BedrockBreakerOpen', 'Unit': 'Count'},
+                        {'Name': 'BedrockCallP99', 'Unit': 'Milliseconds'},
+                        {'Name': 'BedrockShortCircuited', 'Unit': 'Count'}
+                    ]
+                }]
+            },
+            'Agent': self.name,
+            'BedrockBreakerOpen': 0 if self.state == 'CLOSED' else 1,
+            'BedrockCallP99': round(self.p99_ms(), 1),
+            'BedrockShortCircuited': self.short_circuited
+        }))
+
+def call_deadline(context) -> float:
+    """Seconds a call may take: the per-call cap, less whatever the Lambda has left"""
+    if context is None:
+        return BEDROCK_CALL_TIMEOUT_SECONDS
+    remaining = context.get_remaining_time_in_millis() / 1000 - BEDROCK_DEADLINE_MARGIN_SECONDS
+    return min(BEDROCK_CALL_TIMEOUT_SECONDS, remaining)
+
+def bounded_client(client, deadline: float):
+    """Copy of a botocore client whose socket timeouts end at the deadline.
+
+    The read timeout bounds the wait for a response, so a hung call fails
+    with ReadTimeoutError in the caller's thread instead of outliving the
+    invocation; SDK retries are off so a timed-out attempt is not repeated.
+    Copies are cached per client and whole second of deadline. Anything that
+    is not a botocore client (a test fake) is returned unchanged.
+    """
+    meta = getattr(client, 'meta', None)
+    if not hasattr(meta, 'service_model'):
+        return client
+    timeout = float(int(deadline)) if deadline >= 1 else round(deadline, 1)
+    with _bounded_clients_lock:
+        bounded = _bounded_clients.get((client, timeout))
+        if bounded is None:
+            bounded = boto3.client(
+                meta.service_model.service_name,
+                region_name=meta.region_name,
+                endpoint_url=meta.endpoint_url,
+                config=meta.config.merge(Config(
+                    connect_timeout=min(timeout, 5),
+                    read_timeout=timeout,
+                    retries={'total_max_attempts': 1, 'mode': 'standard'}
+                ))
+            )
+            _bounded_clients[(client, timeout)] = bounded
+        return bounded
+
+def invoke_model(client, deadline: float = None, **request) -> Dict[str, Any]:
+    """Blocking invoke_model for guarded_call; the bounded client's read timeout enforces the deadline"""
+    return client.invoke_model(**request)
+
+def guarded_call(breaker: CircuitBreaker, context, call: Callable[..., Any], client, *args, **kwargs) -> Any:
+    """Run call(client, *args, deadline=seconds, **kwargs) under the breaker and the invocation's deadline.
+
+    client is swapped for a bounded_client copy, so the SDK gives up on the
+    call at the deadline; call receives the deadline too for checks of its
+    own (e.g. between stream events). Raises BreakerOpenError or
+    DeadlineExceededError instead of waiting, so callers can return their
+    fallback response right away.
+    """
+    deadline = call_deadline(context)
+    try:
+        if deadline < BEDROCK_MIN_CALL_SECONDS:
+            raise DeadlineExceededError(f"Only {deadline:.1f}s left for a Bedrock call")
+        if not breaker.allow():
+            raise BreakerOpenError(f"Circuit breaker {breaker.name} is open")
+
+        started = time.monotonic()
+        try:
+            result = call(bounded_client(client, deadline), *args, deadline=deadline, **kwargs)
+        except (ReadTimeoutError, ConnectTimeoutError, DeadlineExceededError) as e:
+            breaker.record(time.monotonic() - started, False)
+            raise DeadlineExceededError(f"Bedrock call exceeded its {deadline:.1f}s deadline") from e
+        except Exception:
+            breaker.record(time.monotonic() - started, False)
+            raise
+        breaker.record(time.monotonic() - started, True)
+        return result
+    finally:
+        breaker.emit_metrics()
+
+class IncrementalJsonObject:
+    """Parse the top-level fields of a JSON object from text that arrives in pieces.
+
+    feed() returns the (key, value) pairs completed by the new text, so a
+    caller can act on early fields while later ones are still being written.
+    Text before the opening brace (model preamble) is ignored. A number at
+    the very end of the buffer is held back until a delimiter proves it is
+    complete.
+    """
+
+    def __init__(self):
+        self.buf = ''
+        self.pos = -1
+        self.fields = {}
+        self.closed = False
+
+    def feed(self, text: str) -> Dict[str, Any]:
+        self.buf += text
+        completed = {}
+        if self.pos < 0:
+            start = self.buf.find('{')
+            if start < 0:
+                return completed
+            self.pos = start + 1
+
+        while not self.closed:
+            pos = _SEPARATORS.match(self.buf, self.pos).end()
+            if pos >= len(self.buf):
+                break
+            if self.buf[pos] == '}':
+                self.closed = True
+                self.pos = pos + 1
+                break
+            try:
+                key, end = _json_decoder.raw_decode(self.buf, pos)
+                colon = _SEPARATORS.match(self.buf, end).end()
+                if self.buf[colon:colon + 1] != ':':
+                    break
+                value_start = _SEPARATORS.match(self.buf, colon + 1).end()
+                value, end = _json_decoder.raw_decode(self.buf, value_start)
+            except (json.JSONDecodeError, IndexError):
+                break
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                if _NUMBER_TAIL.match(self.buf, end).end() == len(self.buf):
+                    break
+            completed[key] = value
+            self.pos = end
+
+        self.fields.update(completed)
+        return completed
+
+def iter_stream_text(response: Dict[str, Any]) -> Iterator[str]:
+    """Yield text deltas from an invoke_model_with_response_stream response (Anthropic messages)"""
+    for event in response['body']:
+        chunk = event.get('chunk')
+        if not chunk:
+            continue
+        payload = json.loads(chunk['bytes'])
+        if payload.get('type') == 'content_block_delta':
+            yield payload['delta'].get('text', '')
+
+def stream_json_fields(client, decision_fields: Iterable[str] = (), stop_at_decision: bool = False,
+                       deadline: float = None, **request) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Invoke a model with the streaming API and parse its JSON answer incrementally.
+
+    decision_ms records when every field in decision_fields had arrived. With
+    stop_at_decision the stream is closed at that point and the answer is
+    partial; otherwise it is read to the end. A stream still running after
+    deadline seconds is closed with DeadlineExceededError. Returns (fields,
+    timing) where timing holds first_field_ms, decision_ms and complete.
+    """
+    decision_fields = set(decision_fields)
+    started = time.monotonic()
+    timing = {'first_field_ms': None, 'decision_ms': None, 'complete': False}
+    parser = IncrementalJsonObject()
+    response = client.invoke_model_with_response_stream(**request)
+    try:
+        for text in iter_stream_text(response):
+            if deadline is not None and time.monotonic() - started > deadline:
+                raise DeadlineExceededError(f"Bedrock stream exceeded its {deadline:.1f}s deadline")
+            if not parser.feed(text):
+                continue
+            elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+            if timing['first_field_ms'] is None:
+                timing['first_field_ms'] = elapsed_ms
+            if decision_fields and timing['decision_ms'] is None and decision_fields <= parser.fields.keys():
+                timing['decision_ms'] = elapsed_ms
+                if stop_at_decision and not parser.closed:
+                    return parser.fields, timing
+            if parser.closed:
+                break
+    finally:
+        close = getattr(response['body'], 'close', None)
+        if close:
+            close()
+    if not parser.closed:
+        raise ValueError("Streamed model response did not contain a complete JSON object")
+    timing['complete'] = True
+    return parser.fields, timing
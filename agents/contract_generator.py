@@ -1,23 +1,48 @@
 """
 Contract Generator Agent
 Generates new data contract versions based on approved schema changes.
+Parks the workflow on a task token until a human decides, then resumes it.
+Publishes approved versions and maintains the latest-contract manifest.
+Bulk decisions are read from the bulk orchestrator's decisions document.
 """
 
 import json
 import boto3
 import os
+import hashlib
 from datetime import datetime
-from typing import Dict, Any
+from decimal import Decimal
+from typing import Dict, Any, Optional, Tuple
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
 
 s3_client = boto3.client('s3')
 dynamodb = boto3.resource('dynamodb')
+sfn_client = boto3.client('stepfunctions')
+sns_client = boto3.client('sns')
 
 CONTRACTS_BUCKET = os.environ['CONTRACTS_BUCKET']
 CONTRACT_APPROVALS_TABLE = os.environ['CONTRACT_APPROVALS_TABLE']
+AGENT_MEMORY_TABLE = os.environ.get('AGENT_MEMORY_TABLE', '')
+CONTRACT_MANIFEST_KEY = os.environ.get('CONTRACT_MANIFEST_KEY', 'latest.json')
+SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN', '')
+APPROVAL_DECISIONS = ('APPROVED', 'REJECTED')
+MANIFEST_UPDATE_ATTEMPTS = 5
+
+class ContractVersionConflict(Exception):
+    """A different contract was already published under this version number"""
 
 def lambda_handler(event, context):
-    """Generate new contract version"""
+    """Generate new contract version, publish an approved one, or learn from a human decision"""
     try:
+        if event.get('action') == 'publish':
+            return publish_contract(event['new_contract'])
+        if event.get('action') == 'record_decision':
+            return record_decision(event)
+
+        if 'decisions_document' in event:
+            event = dict(event, **load_bulk_decision(event['decisions_document'], event['schema_fingerprint']))
+
         execution_id = event['execution_id']
         incoming_schema = event['incoming_schema']
         current_contract = event['current_contract']
@@ -25,9 +50,9 @@ def lambda_handler(event, context):
         
         print(f"Generating contract for execution: {execution_id}")
         
-        # Get current version
+        # Get current version (bulk decisions also skip past versions published since the analysis)
         current_version = current_contract.get('version', 0)
-        new_version = current_version + 1
+        new_version = max(current_version, event.get('latest_version', 0)) + 1
         
         # Generate new contract
         new_contract = generate_contract(
@@ -37,14 +62,22 @@ def lambda_handler(event, context):
             new_version
         )
         
-        # Store for approval
-        approval_id = store_for_approval(execution_id, new_contract)
+        # Store for approval; with a task token the workflow waits until
+        # approval_handler resumes it with the human decision. Changes that
+        # agent memory auto-approved are stored for the audit trail only.
+        auto_approved = bool(event.get('auto_approved'))
+        task_token = event.get('task_token')
+        approval_id = store_for_approval(execution_id, new_contract, task_token,
+                                         'AUTO_APPROVED' if auto_approved else 'PENDING')
+        if task_token:
+            notify_approval_required(event, approval_id, new_version)
         
         return {
             'execution_id': execution_id,
             'approval_id': approval_id,
             'new_contract': new_contract,
-            'requires_approval': True,
+            'contract_version': new_version,
+            'requires_approval': not auto_approved,
             'timestamp': datetime.utcnow().isoformat()
         }
         
@@ -52,6 +85,31 @@ def lambda_handler(event, context):
         print(f"Error: {str(e)}")
         raise
 
+def load_bulk_decision(decisions_document: str, schema_fingerprint: str) -> Dict:
+    """Read one decision from a bulk run's decisions document and the contract it was analyzed against.
+
+    The bulk orchestrator's Map items carry only a reference to the
+    document; its decisions hold the incoming schema and diff. The newest
+    published version is returned too, so concurrent decisions of one run
+    do not all propose the same next version.
+    """
+    bucket, _, key = decisions_document[len('s3://'):].partition('/')
+    decisions = json.loads(s3_client.get_object(Bucket=bucket, Key=key)['Body'].read().decode('utf-8'))
+    decision = next(d for d in decisions if d['schema_fingerprint'] == schema_fingerprint)
+    version = int(decision['contract_version'])
+    current_contract = {"version": 0, "schema": {}}
+    if version:
+        response = s3_client.get_object(Bucket=CONTRACTS_BUCKET, Key=f"contract_v{version}.json")
+        current_contract = json.loads(response['Body'].read().decode('utf-8'))
+    latest, _ = read_manifest()
+    return {
+        'incoming_schema': decision['incoming_schema'],
+        'schema_diff': decision['schema_diff'],
+        'change_type': decision['change_type'],
+        'current_contract': current_contract,
+        'latest_version': latest['version'] if latest else 0
+    }
+
 def generate_contract(current: Dict, incoming_schema: Dict, diff: Dict, version: int) -> Dict:
     """Generate new contract version"""
     new_contract = {
@@ -63,6 +121,7 @@ def generate_contract(current: Dict, incoming_schema: Dict, diff: Dict, version:
         "optional_fields": current.get('optional_fields', []),
         "validation_rules": current.get('validation_rules', {}),
         "evolution_policy": current.get('evolution_policy', 'ADDITIVE_ONLY'),
+        "impact_rules": current.get('impact_rules', {}),
         "backward_compatible": True,
         "changes": {
             "added_fields": diff.get('added_fields', []),
@@ -77,29 +136,240 @@ def generate_contract(current: Dict, incoming_schema: Dict, diff: Dict, version:
         }
     }
     
-    # Update optional fields with new additions
+    # Update optional fields with new top-level additions (nested paths ride on their parent)
     for field in diff.get('added_fields', []):
         field_name = field['field']
+        if '.' in field_name or '[]' in field_name:
+            continue
         if field_name not in new_contract['optional_fields']:
             new_contract['optional_fields'].append(field_name)
     
     return new_contract
 
-def store_for_approval(execution_id: str, contract: Dict) -> str:
-    """Store contract for human approval"""
-    table = dynamodb.Table(CONTRACT_APPROVALS_TABLE)
+def store_for_approval(execution_id: str, contract: Dict, task_token: Optional[str] = None,
+                       status: str = 'PENDING') -> str:
+    """Store contract for human approval.
+
+    Items are keyed like the approvals table (contract_id, version) and
+    carry the Step Functions task token that approval_handler resumes.
+    Auto-approved contracts are stored as AUTO_APPROVED with no token.
+    """
     approval_id = f"approval-{execution_id}"
     timestamp = int(datetime.utcnow().timestamp() * 1000)
     
-    table.put_item(Item={
+    item = {
+        'contract_id': approval_id,
+        'version': contract['version'],
         'approval_id': approval_id,
         'timestamp': timestamp,
         'execution_id': execution_id,
         'contract_version': contract['version'],
         'contract_data': json.dumps(contract),
-        'status': 'PENDING',
+        'approval_status': status,
         'created_at': datetime.utcnow().isoformat(),
         'expiration_time': timestamp + (30 * 24 * 60 * 60)  # 30 days
-    })
+    }
+    if task_token:
+        item['task_token'] = task_token
+    dynamodb.Table(CONTRACT_APPROVALS_TABLE).put_item(Item=item)
     
     return approval_id
+
+def notify_approval_required(event: Dict, approval_id: str, version: int):
+    """Tell approvers how to decide; sent only after the approval item is stored"""
+    if not SNS_TOPIC_ARN:
+        return
+    sns_client.publish(
+        TopicArn=SNS_TOPIC_ARN,
+        Subject='SchemaGuard: Contract Approval Required',
+        Message=(
+            f"Schema drift detected requiring approval.\n\n"
+            f"Execution ID: {event['execution_id']}\n"
+            f"Change Type: {event.get('change_type', 'UNKNOWN')}\n"
+            f"S3 Location: s3://{event.get('s3_bucket', '')}/{event.get('s3_key', '')}\n\n"
+            f"Proposed Contract Version: {version}\n\n"
+            f"Set approval_status to APPROVED or REJECTED on the item contract_id={approval_id}, "
+            f"version={version} in {CONTRACT_APPROVALS_TABLE}. The workflow resumes within seconds."
+        )
+    )
+
+def approval_handler(event, context):
+    """Resume workflows waiting on a contract approval.
+
+    Triggered by the approvals table stream when an item leaves PENDING,
+    or invoked directly with approval_id, contract_version and decision
+    (which records the decision and lets the stream resume the workflow).
+    Stream records that cannot be resumed are reported as batch item
+    failures so they are retried.
+    """
+    if 'Records' not in event:
+        return decide_approval(event['approval_id'], int(event['contract_version']), event['decision'],
+                               event.get('approver', 'unknown'))
+
+    deserializer = TypeDeserializer()
+    failures = []
+    for record in event['Records']:
+        change = record.get('dynamodb', {})
+        old = {name: deserializer.deserialize(value) for name, value in change.get('OldImage', {}).items()}
+        new = {name: deserializer.deserialize(value) for name, value in change.get('NewImage', {}).items()}
+        if (record.get('eventName') != 'MODIFY' or old.get('approval_status') != 'PENDING'
+                or new.get('approval_status') not in APPROVAL_DECISIONS or not new.get('task_token')):
+            continue
+        try:
+            resume_workflow(new)
+        except ClientError as e:
+            print(f"Could not resume {new.get('approval_id')}: {e}")
+            failures.append({'itemIdentifier': change['SequenceNumber']})
+    return {'batchItemFailures': failures}
+
+def decide_approval(approval_id: str, version: int, decision: str, approver: str) -> Dict:
+    """Move a PENDING approval to APPROVED or REJECTED"""
+    if decision not in APPROVAL_DECISIONS:
+        raise ValueError(f"decision must be one of {APPROVAL_DECISIONS}, got {decision!r}")
+    table = dynamodb.Table(CONTRACT_APPROVALS_TABLE)
+    try:
+        table.update_item(
+            Key={'contract_id': approval_id, 'version': version},
+            UpdateExpression='SET approval_status = :decision, approver = :approver, decided_at = :now',
+            ConditionExpression='approval_status = :pending',
+            ExpressionAttributeValues={
+                ':decision': decision,
+                ':approver': approver,
+                ':now': datetime.utcnow().isoformat(),
+                ':pending': 'PENDING'
+            }
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return {'approval_id': approval_id, 'decision': decision, 'updated': False}
+    return {'approval_id': approval_id, 'decision': decision, 'updated': True}
+
+def resume_workflow(item: Dict):
+    """Hand the decided proposal back to the waiting GenerateContract task"""
+    proposal = {
+        'execution_id': item['execution_id'],
+        'approval_id': item['approval_id'],
+        'new_contract': json.loads(item['contract_data']),
+        'contract_version': int(item['contract_version']),
+        'requires_approval': True,
+        'decision': item['approval_status'],
+        'approver': item.get('approver', 'unknown'),
+        'decided_at': item.get('decided_at', datetime.utcnow().isoformat()),
+        'timestamp': item['created_at']
+    }
+    try:
+        sfn_client.send_task_success(taskToken=item['task_token'], output=json.dumps(proposal))
+    except ClientError as e:
+        # The execution already ended (timed out, stopped or resumed before)
+        if e.response['Error']['Code'] not in ('TaskTimedOut', 'InvalidToken', 'TaskDoesNotExist'):
+            raise
+        print(f"Workflow for {item['approval_id']} is no longer waiting: {e}")
+        return
+    print(f"Resumed {item['execution_id']} with {item['approval_status']}")
+
+def record_decision(event: Dict) -> Dict:
+    """Remember a human approval or rejection under the generalized schema pattern.
+
+    schema_analyzer auto-approves later ADDITIVE changes with the same
+    pattern while its latest decision is APPROVED. The time the change
+    waited for a human is stored so auto-approvals can report it as saved.
+    """
+    execution_id = event['execution_id']
+    decided_at = datetime.utcnow()
+    proposed_at = event.get('proposed_at')
+    wait_seconds = (decided_at - datetime.fromisoformat(proposed_at)).total_seconds() if proposed_at else 0.0
+    record = {
+        'execution_id': execution_id,
+        'schema_pattern': event['schema_pattern'],
+        'decision': event['decision'],
+        'approval_wait_seconds': round(max(wait_seconds, 0.0), 1)
+    }
+    if not AGENT_MEMORY_TABLE:
+        print("AGENT_MEMORY_TABLE is not set, decision not recorded")
+        return dict(record, recorded=False)
+
+    dynamodb.Table(AGENT_MEMORY_TABLE).put_item(Item={
+        'event_id': f"decision-{execution_id}",
+        'decision_timestamp': int(decided_at.timestamp() * 1000),
+        'execution_id': execution_id,
+        'schema_pattern': event['schema_pattern'],
+        'pattern_descriptors': event.get('pattern_descriptors', []),
+        'change_type': event.get('change_type', 'ADDITIVE'),
+        'decision': event['decision'],
+        'contract_version': event.get('contract_version', 0),
+        'approval_wait_seconds': Decimal(str(record['approval_wait_seconds'])),
+        'decided_at': decided_at.isoformat()
+    })
+    print(f"Recorded {event['decision']} for pattern {event['schema_pattern']} "
+          f"after {record['approval_wait_seconds']}s")
+    return dict(record, recorded=True)
+
+def publish_contract(contract: Dict) -> Dict:
+    """Write an approved contract version and point the manifest at it.
+
+    The versioned object is written first (and never overwritten) so the
+    manifest never references a missing key. A retried publish of the same
+    contract reuses it; a different contract under the same version raises
+    ContractVersionConflict so the caller can generate the next version. The manifest is then swapped with a conditional PUT
+    (If-Match on its ETag, or If-None-Match for the first publish), retrying
+    on concurrent writers and never moving the pointer to an older version.
+    Returns this version's entry either way; the workflow pins ETL to it.
+    """
+    key = f"contract_v{contract['version']}.json"
+    body = json.dumps(contract, indent=2)
+    try:
+        # Versions are immutable; a retried publish must not rewrite one
+        s3_client.put_object(
+            Bucket=CONTRACTS_BUCKET,
+            Key=key,
+            Body=body,
+            ContentType='application/json',
+            IfNoneMatch='*'
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'PreconditionFailed':
+            raise
+        stored = s3_client.get_object(Bucket=CONTRACTS_BUCKET, Key=key)['Body'].read().decode('utf-8')
+        if stored != body:
+            raise ContractVersionConflict(f"{key} already holds a different contract")
+        print(f"{key} already exists, keeping the stored version")
+
+    manifest = {
+        "version": contract['version'],
+        "key": key,
+        "sha256": hashlib.sha256(body.encode('utf-8')).hexdigest(),
+        "created_at": contract.get('created_at', datetime.utcnow().isoformat())
+    }
+
+    for _ in range(MANIFEST_UPDATE_ATTEMPTS):
+        current, etag = read_manifest()
+        if current and current.get('version', 0) >= manifest['version']:
+            print(f"Manifest already at v{current['version']}, not moving it to v{manifest['version']}")
+            return manifest
+        condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+        try:
+            s3_client.put_object(
+                Bucket=CONTRACTS_BUCKET,
+                Key=CONTRACT_MANIFEST_KEY,
+                Body=json.dumps(manifest),
+                ContentType='application/json',
+                **condition
+            )
+            print(f"Published contract v{manifest['version']} as {key}")
+            return manifest
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                raise
+
+    raise RuntimeError(f"Could not update {CONTRACT_MANIFEST_KEY}: too many concurrent writers")
+
+def read_manifest() -> Tuple[Optional[Dict], Optional[str]]:
+    """Return the latest-contract manifest and its ETag, or (None, None) if absent"""
+    try:
+        response = s3_client.get_object(Bucket=CONTRACTS_BUCKET, Key=CONTRACT_MANIFEST_KEY)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None, None
+        raise
+    return json.loads(response['Body'].read().decode('utf-8')), response['ETag']
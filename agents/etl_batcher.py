@@ -0,0 +1,340 @@
+"""
+ETL Batcher Agent
+Collects NO_CHANGE files queued by the orchestrator and runs the production
+ETL once per contract version over an explicit file manifest, instead of
+one Glue run per file. The SQS event source mapping provides the time and
+size window; glue_run_handler settles the files' executions when EventBridge
+reports the run finished. Also reduces the bulk orchestrator's fan-out
+results to one decision and manifest per distinct schema, and records the
+decisions it holds for review.
+"""
+
+import json
+import boto3
+import os
+import uuid
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional
+from botocore.exceptions import ClientError
+
+s3_client = boto3.client('s3')
+glue_client = boto3.client('glue')
+dynamodb = boto3.resource('dynamodb')
+sns_client = boto3.client('sns')
+
+GLUE_JOB_NAME = os.environ['GLUE_JOB_NAME']
+MANIFEST_BUCKET = os.environ['MANIFEST_BUCKET']
+EXECUTION_STATE_TABLE = os.environ['EXECUTION_STATE_TABLE']
+MANIFEST_PREFIX = os.environ.get('MANIFEST_PREFIX', 'manifests/')
+ETL_BATCH_MAX_FILES = int(os.environ.get('ETL_BATCH_MAX_FILES', '500'))
+SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN', '')
+
+def lambda_handler(event, context):
+    """Start one production Glue run per contract version for a window of queued files.
+
+    Messages whose run could not be started are reported as batch item
+    failures so SQS redelivers them in a later window.
+    """
+    if event.get('action') == 'reduce_fanout':
+        return reduce_fanout(event)
+    if event.get('action') == 'hold_for_review':
+        return hold_for_review(event)
+
+    files_by_version = {}
+    message_ids = {}
+    compression = {}
+    for record in event.get('Records', []):
+        request = json.loads(record['body'])
+        version = str(request.get('contract_version', 0))
+        path = f"s3://{request['s3_bucket']}/{request['s3_key']}"
+        # Duplicates of the same object are read once and linked to every execution
+        files_by_version.setdefault(version, {}).setdefault(path, []).append(request['execution_id'])
+        message_ids.setdefault((version, path), []).append(record['messageId'])
+        if request.get('raw_compression'):
+            compression[path] = request['raw_compression']
+
+    runs = []
+    failed = []
+    for version, files in files_by_version.items():
+        paths = list(files)
+        for start in range(0, len(paths), ETL_BATCH_MAX_FILES):
+            chunk = paths[start:start + ETL_BATCH_MAX_FILES]
+            try:
+                runs.append(start_batch_run(version, {path: files[path] for path in chunk}, compression))
+            except ClientError as e:
+                print(f"Could not start ETL batch for contract v{version}: {e}")
+                for path in chunk:
+                    failed.extend(message_ids[(version, path)])
+
+    file_count = sum(run['file_count'] for run in runs)
+    print(f"Started {len(runs)} Glue runs for {file_count} files from {len(event.get('Records', []))} messages")
+    return {
+        'runs': runs,
+        'glue_runs_started': len(runs),
+        'files_batched': file_count,
+        'glue_runs_avoided': max(file_count - len(runs), 0),
+        'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed]
+    }
+
+def start_batch_run(contract_version: str, files: Dict[str, List[str]],
+                    compression: Dict[str, str] = None) -> Dict[str, Any]:
+    """Write the manifest, start the Glue run and point each file's execution at it.
+
+    compression maps paths whose codec the key extension does not declare
+    to that codec; the manifest carries it so Glue inflates those objects.
+    """
+    compression = compression or {}
+    batch_id = f"batch-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    manifest_key = f"{MANIFEST_PREFIX}{batch_id}.json"
+    execution_ids = [execution_id for ids in files.values() for execution_id in ids]
+    s3_client.put_object(
+        Bucket=MANIFEST_BUCKET,
+        Key=manifest_key,
+        Body=json.dumps({
+            'batch_id': batch_id,
+            'contract_version': contract_version,
+            'paths': list(files),
+            'compression': {path: compression[path] for path in files if path in compression},
+            'execution_ids': execution_ids
+        }).encode('utf-8'),
+        ContentType='application/json'
+    )
+
+    response = glue_client.start_job_run(
+        JobName=GLUE_JOB_NAME,
+        Arguments={
+            '--EXECUTION_MODE': 'PRODUCTION',
+            '--EXECUTION_ID': batch_id,
+            '--INPUT_MANIFEST': f"s3://{MANIFEST_BUCKET}/{manifest_key}",
+            '--CONTRACT_VERSION': contract_version
+        }
+    )
+    record_batch(execution_ids, batch_id, response['JobRunId'])
+    print(f"Batch {batch_id}: {len(files)} files for contract v{contract_version}, run {response['JobRunId']}")
+    return {
+        'batch_id': batch_id,
+        'contract_version': contract_version,
+        'file_count': len(files),
+        'job_run_id': response['JobRunId'],
+        'manifest': manifest_key
+    }
+
+def record_batch(execution_ids: List[str], batch_id: str, job_run_id: str):
+    """Link each file's execution record to the Glue run that processes it"""
+    table = dynamodb.Table(EXECUTION_STATE_TABLE)
+    for execution_id in execution_ids:
+        try:
+            table.update_item(
+                Key={'execution_id': execution_id},
+                UpdateExpression='SET #status = :status, batch_id = :batch, glue_job_run_id = :run',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={':status': 'SUBMITTED', ':batch': batch_id, ':run': job_run_id}
+            )
+        except ClientError as e:
+            # The run has started; a missing link is not worth redelivering the files
+            print(f"Could not record batch {batch_id} for {execution_id}: {e}")
+
+def glue_run_handler(event, context):
+    """Settle the executions of a batched Glue run from its EventBridge state change.
+
+    The run's INPUT_MANIFEST lists the executions it processes; runs
+    without one, or whose manifest lists none, are watched by their own
+    state machine and ignored here. An execution is only updated while it
+    still points at this run. Failed, timed out and stopped runs are
+    reported on the alerts topic with the files to reprocess.
+    """
+    detail = event['detail']
+    job_run_id = detail['jobRunId']
+    run = glue_client.get_job_run(JobName=detail['jobName'], RunId=job_run_id)['JobRun']
+    manifest_uri = run.get('Arguments', {}).get('--INPUT_MANIFEST')
+    manifest = read_json(*manifest_uri[len("s3://"):].split("/", 1)) if manifest_uri else {}
+    execution_ids = manifest.get('execution_ids', [])
+    if not execution_ids:
+        return {'job_run_id': job_run_id, 'executions_updated': 0}
+
+    succeeded = detail['state'] == 'SUCCEEDED'
+    error = '' if succeeded else detail.get('message') or run.get('ErrorMessage', detail['state'])
+    updated = settle_executions(execution_ids, job_run_id, 'SUCCESS' if succeeded else 'FAILED', error)
+    if not succeeded:
+        notify_failed_batch(manifest, job_run_id, detail['state'], error)
+    print(f"Batch {manifest.get('batch_id')} run {job_run_id} {detail['state']}: "
+          f"{updated}/{len(execution_ids)} executions updated")
+    return {'job_run_id': job_run_id, 'state': detail['state'], 'executions_updated': updated}
+
+def settle_executions(execution_ids: List[str], job_run_id: str, status: str, error: str) -> int:
+    """Move each execution still linked to job_run_id to its final status"""
+    table = dynamodb.Table(EXECUTION_STATE_TABLE)
+    update = 'SET #status = :status, end_time = :end_time'
+    values = {':status': status, ':end_time': int(datetime.utcnow().timestamp() * 1000), ':run': job_run_id}
+    if error:
+        update += ', error_info = :error'
+        values[':error'] = error
+    updated = 0
+    for execution_id in execution_ids:
+        try:
+            table.update_item(
+                Key={'execution_id': execution_id},
+                UpdateExpression=update,
+                ConditionExpression='glue_job_run_id = :run',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues=values
+            )
+            updated += 1
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            print(f"{execution_id} is no longer linked to run {job_run_id}, leaving it")
+    return updated
+
+def notify_failed_batch(manifest: Dict, job_run_id: str, state: str, error: str):
+    """Alert on a batched run that did not succeed, listing the files to reprocess"""
+    if not SNS_TOPIC_ARN:
+        return
+    paths = manifest.get('paths', [])
+    listed = '\n'.join(paths[:20]) + (f"\n... and {len(paths) - 20} more" if len(paths) > 20 else '')
+    sns_client.publish(
+        TopicArn=SNS_TOPIC_ARN,
+        Subject='SchemaGuard: Batched ETL Run Failed',
+        Message=(
+            f"A batched production ETL run did not succeed.\n\n"
+            f"Batch ID: {manifest.get('batch_id')}\n"
+            f"Glue Run: {job_run_id} ({state})\n"
+            f"Error: {error}\n"
+            f"Contract Version: {manifest.get('contract_version')}\n\n"
+            f"{len(paths)} files, marked FAILED in {EXECUTION_STATE_TABLE}:\n{listed}"
+        )
+    )
+
+def reduce_fanout(event: Dict) -> Dict[str, Any]:
+    """Merge distributed Map results by schema fingerprint into one decision each.
+
+    Each child of the bulk orchestrator's Map ran schema_analyzer in batch
+    mode over a slice of the keys; the Map wrote those outputs to S3
+    (result_writer). A fingerprint seen in several slices becomes one
+    decision; it is auto-approved only if every slice agreed. Every
+    decision gets a Glue input manifest so its ETL runs once. The decisions,
+    with their incoming schemas and diffs, are written to one S3 object the
+    orchestrator's ETL Map reads; only counts and its location are returned.
+    """
+    execution_id = event['execution_id']
+    decisions = {}
+    failed_objects = []
+    failed_batches = 0
+    object_count = 0
+    for output in iter_fanout_outputs(event['result_writer']):
+        if output is None:
+            failed_batches += 1
+            continue
+        object_count += output['object_count']
+        failed_objects.extend(output.get('failed_objects', []))
+        contract_version = str(output.get('current_contract', {}).get('version', 0))
+        for schema in output['schemas']:
+            decision = decisions.get(schema['schema_fingerprint'])
+            if decision is None:
+                decisions[schema['schema_fingerprint']] = {
+                    'schema_fingerprint': schema['schema_fingerprint'],
+                    'change_type': schema['change_type'],
+                    'auto_approve': schema['auto_approve'],
+                    'contract_version': contract_version,
+                    'incoming_schema': schema['incoming_schema'],
+                    'schema_diff': schema['schema_diff'],
+                    's3_bucket': output['s3_bucket'],
+                    's3_keys': list(schema['s3_keys']),
+                    'raw_compression': dict(schema.get('raw_compression', {})),
+                    'record_count': schema['record_count']
+                }
+                continue
+            decision['auto_approve'] = decision['auto_approve'] and schema['auto_approve']
+            decision['s3_keys'].extend(schema['s3_keys'])
+            decision['raw_compression'].update(schema.get('raw_compression', {}))
+            decision['record_count'] += schema['record_count']
+
+    for decision in decisions.values():
+        keys = decision.pop('s3_keys')
+        compression = decision.pop('raw_compression')
+        decision['file_count'] = len(keys)
+        decision['batch_id'] = f"{execution_id}-{decision['schema_fingerprint'][:12]}"
+        manifest_key = f"{MANIFEST_PREFIX}{decision['batch_id']}.json"
+        s3_client.put_object(
+            Bucket=MANIFEST_BUCKET,
+            Key=manifest_key,
+            Body=json.dumps({
+                'batch_id': decision['batch_id'],
+                'contract_version': decision['contract_version'],
+                'paths': [f"s3://{decision['s3_bucket']}/{key}" for key in keys],
+                'compression': {f"s3://{decision['s3_bucket']}/{key}": codec for key, codec in compression.items()}
+            }).encode('utf-8'),
+            ContentType='application/json'
+        )
+        decision['manifest'] = f"s3://{MANIFEST_BUCKET}/{manifest_key}"
+
+    decisions_key = f"{MANIFEST_PREFIX}{execution_id}-decisions.json"
+    s3_client.put_object(
+        Bucket=MANIFEST_BUCKET,
+        Key=decisions_key,
+        Body=json.dumps(list(decisions.values())).encode('utf-8'),
+        ContentType='application/json'
+    )
+    change_types = {}
+    for decision in decisions.values():
+        change_types[decision['change_type']] = change_types.get(decision['change_type'], 0) + 1
+
+    print(f"Reduced {object_count} objects to {len(decisions)} decisions in {decisions_key} "
+          f"({len(failed_objects)} unreadable objects, {failed_batches} failed batches)")
+    return {
+        'execution_id': execution_id,
+        'object_count': object_count,
+        'decision_count': len(decisions),
+        'change_types': change_types,
+        'decisions_bucket': MANIFEST_BUCKET,
+        'decisions_key': decisions_key,
+        'failed_object_count': len(failed_objects),
+        'failed_objects': failed_objects[:100],
+        'failed_batches': failed_batches
+    }
+
+def hold_for_review(event: Dict) -> Dict[str, Any]:
+    """Record a bulk decision whose ETL did not run so it can be resumed after review.
+
+    The execution_state item is keyed by the decision's batch_id with status
+    HELD_FOR_REVIEW and keeps what a resumed run needs: the Glue input
+    manifest, the contract version the files were analyzed against (and the
+    version published for them, if the run got that far), and where the full
+    decision (incoming schema and diff) is stored.
+    """
+    decision = event['decision']
+    reason = decision.get('error') or decision.get('validation_result', {}).get('result') or (
+        f"{decision['change_type']} change needs review (auto-approve: {decision.get('auto_approve', False)})")
+    item = {
+        'execution_id': decision['batch_id'],
+        'status': 'HELD_FOR_REVIEW',
+        'start_time': int(datetime.utcnow().timestamp() * 1000),
+        'bulk_execution_id': decision['bulk_execution_id'],
+        'schema_fingerprint': decision['schema_fingerprint'],
+        'change_type': decision['change_type'],
+        'contract_version': decision['contract_version'],
+        'file_count': decision['file_count'],
+        'manifest': decision['manifest'],
+        'decisions_document': decision['decisions_document'],
+        'error_info': reason if isinstance(reason, str) else json.dumps(reason, default=str)
+    }
+    if 'contract_publication' in decision:
+        item['published_contract_version'] = str(decision['contract_publication']['result']['version'])
+    dynamodb.Table(EXECUTION_STATE_TABLE).put_item(Item=item)
+    print(f"Held {decision['batch_id']} ({decision['change_type']}, {decision['file_count']} files) for review")
+    return {'batch_id': decision['batch_id'], 'status': 'HELD_FOR_REVIEW'}
+
+def iter_fanout_outputs(result_writer: Dict) -> Iterator[Optional[Dict]]:
+    """Yield each child's analyzer output from a Map run's ResultWriter files (None for a failed child)"""
+    bucket = result_writer['Bucket']
+    manifest = read_json(bucket, result_writer['Key'])
+    for status, files in manifest.get('ResultFiles', {}).items():
+        for result_file in files:
+            for child in read_json(bucket, result_file['Key']):
+                if status == 'SUCCEEDED' and child.get('Output'):
+                    yield json.loads(child['Output'])
+                else:
+                    yield None
+
+def read_json(bucket: str, key: str) -> Any:
+    return json.loads(s3_client.get_object(Bucket=bucket, Key=key)['Body'].read().decode('utf-8'))
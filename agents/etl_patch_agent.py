@@ -10,8 +10,12 @@ import os
 from datetime import datetime
 from typing import Dict, Any
 
+from bedrock_guard import (BEDROCK_CLIENT_CONFIG, BEDROCK_STREAMING, CircuitBreaker, guarded_call, invoke_model,
+                           stream_json_fields)
+
 s3_client = boto3.client('s3')
-bedrock_runtime = boto3.client('bedrock-runtime')
+bedrock_runtime = boto3.client('bedrock-runtime', config=BEDROCK_CLIENT_CONFIG)
+bedrock_breaker = CircuitBreaker('etl_patch_agent')
 
 SCRIPTS_BUCKET = os.environ['SCRIPTS_BUCKET']
 BEDROCK_MODEL_ID = os.environ['BEDROCK_MODEL_ID']
@@ -32,7 +36,8 @@ def lambda_handler(event, context):
         patch_proposal = generate_patch_with_bedrock(
             current_script,
             schema_diff,
-            change_type
+            change_type,
+            context
         )
         
         # Store patch for review
@@ -43,6 +48,7 @@ def lambda_handler(event, context):
             'patch_proposal': patch_proposal,
             'patch_s3_key': patch_key,
             'requires_review': True,
+            'bedrock_breaker': bedrock_breaker.stats(),
             'timestamp': datetime.utcnow().isoformat()
         }
         
@@ -61,8 +67,8 @@ def get_current_etl_script() -> str:
     except:
         return ""
 
-def generate_patch_with_bedrock(script: str, diff: Dict, change_type: str) -> Dict:
-    """Use Bedrock to generate safe ETL patch"""
+def generate_patch_with_bedrock(script: str, diff: Dict, change_type: str, context=None) -> Dict:
+    """Use Bedrock to generate safe ETL patch (deadline-bounded, skipped while the breaker is open)"""
     try:
         prompt = f"""You are an ETL code patch generator. Generate a minimal, safe patch for a Glue ETL job.
 
@@ -91,15 +97,23 @@ Provide JSON response:
   "testing_required": true/false
 }}"""
 
-        response = bedrock_runtime.invoke_model(
-            modelId=BEDROCK_MODEL_ID,
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 2000,
-                "messages": [{"role": "user", "content": prompt}]
-            })
-        )
+        body = json.dumps({
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": 2000,
+            "messages": [{"role": "user", "content": prompt}]
+        })
+        if BEDROCK_STREAMING:
+            patch, timing = guarded_call(
+                bedrock_breaker, context, stream_json_fields, bedrock_runtime,
+                modelId=BEDROCK_MODEL_ID, body=body
+            )
+            print(f"Bedrock stream timing: {json.dumps(timing)}")
+            return patch
         
+        response = guarded_call(
+            bedrock_breaker, context, invoke_model, bedrock_runtime,
+            modelId=BEDROCK_MODEL_ID, body=body
+        )
         result = json.loads(response['body'].read())
         return json.loads(result['content'][0]['text'])
     except Exception as e:
@@ -7,58 +7,152 @@ Uses Amazon Bedrock for intelligent impact analysis.
 import json
 import boto3
 import os
+import re
+import random
+import codecs
+import io
+import gzip
+import bz2
+import zlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, Any
+from decimal import Decimal
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional
 import hashlib
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import Binary
+from botocore.exceptions import ClientError
+
+from bedrock_guard import (BEDROCK_CLIENT_CONFIG, BEDROCK_STREAMING, CircuitBreaker, call_deadline,
+                           guarded_call, invoke_model, stream_json_fields)
+from write_buffer import WriteBuffer, flush_on_exit
+
+try:
+    import zstandard
+except ImportError:  # zstd input is optional; gzip and bz2 use the standard library
+    zstandard = None
 
 s3_client = boto3.client('s3')
 dynamodb = boto3.resource('dynamodb')
-bedrock_runtime = boto3.client('bedrock-runtime')
+bedrock_runtime = boto3.client('bedrock-runtime', config=BEDROCK_CLIENT_CONFIG)
+sqs_client = boto3.client('sqs')
+bedrock_breaker = CircuitBreaker('schema_analyzer')
 
 SCHEMA_HISTORY_TABLE = os.environ['SCHEMA_HISTORY_TABLE']
 AGENT_MEMORY_TABLE = os.environ['AGENT_MEMORY_TABLE']
 CONTRACTS_BUCKET = os.environ['CONTRACTS_BUCKET']
 BEDROCK_MODEL_ID = os.environ['BEDROCK_MODEL_ID']
+STREAMING_INFERENCE = os.environ.get('STREAMING_INFERENCE', 'true').lower() == 'true'
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', str(1024 * 1024)))
+SCHEMA_SAMPLE_RECORDS = int(os.environ.get('SCHEMA_SAMPLE_RECORDS', '0'))
+SCHEMA_RESERVOIR_SIZE = int(os.environ.get('SCHEMA_RESERVOIR_SIZE', '0'))
+SCHEMA_STABLE_RECORDS = int(os.environ.get('SCHEMA_STABLE_RECORDS', '500'))
+SCHEMA_HEAD_SAMPLE_BYTES = int(float(os.environ.get('SCHEMA_HEAD_SAMPLE_MB', '0')) * 1024 * 1024)
+SCHEMA_RANDOM_RANGES = int(os.environ.get('SCHEMA_RANDOM_RANGES', '0'))
+SCHEMA_RANGE_SIZE_BYTES = int(os.environ.get('SCHEMA_RANGE_SIZE_KB', '256')) * 1024
+CONTRACT_CACHE_TTL_SECONDS = int(os.environ.get('CONTRACT_CACHE_TTL_SECONDS', '300'))
+CONTRACT_MANIFEST_KEY = os.environ.get('CONTRACT_MANIFEST_KEY', 'latest.json')
+SCHEMA_FINGERPRINT_TABLE = os.environ.get('SCHEMA_FINGERPRINT_TABLE', '')
+FINGERPRINT_CACHE_SIZE = int(os.environ.get('FINGERPRINT_CACHE_SIZE', '256'))
+FINGERPRINT_TTL_DAYS = int(os.environ.get('FINGERPRINT_TTL_DAYS', '30'))
+IMPACT_CACHE_TABLE = os.environ.get('IMPACT_CACHE_TABLE', '')
+IMPACT_CACHE_SIZE = int(os.environ.get('IMPACT_CACHE_SIZE', '256'))
+IMPACT_CACHE_TTL_DAYS = int(os.environ.get('IMPACT_CACHE_TTL_DAYS', '7'))
+BEDROCK_EARLY_DECISION = os.environ.get('BEDROCK_EARLY_DECISION', 'false').lower() == 'true'
+DECISION_FIELDS = ('risk_level', 'safe_to_auto_approve')
+IMPACT_BATCH_QUEUE_URL = os.environ.get('IMPACT_BATCH_QUEUE_URL', '')
+IMPACT_BATCH_WAIT_SECONDS = float(os.environ.get('IMPACT_BATCH_WAIT_SECONDS', '30'))
+IMPACT_BATCH_POLL_SECONDS = float(os.environ.get('IMPACT_BATCH_POLL_SECONDS', '0.5'))
+# A chunk's answers must all fit in one response: diffs per call are capped at
+# the output token limit divided by the tokens one answer is allowed
+IMPACT_BATCH_MAX_OUTPUT_TOKENS = 4096
+IMPACT_BATCH_ANSWER_TOKENS = int(os.environ.get('IMPACT_BATCH_ANSWER_TOKENS', '400'))
+IMPACT_BATCH_MAX_DIFFS = max(min(int(os.environ.get('IMPACT_BATCH_MAX_DIFFS', '10')),
+                                 IMPACT_BATCH_MAX_OUTPUT_TOKENS // IMPACT_BATCH_ANSWER_TOKENS), 1)
+
+SCALAR_TYPES = {'string', 'integer', 'number', 'boolean', 'null'}
+DEFAULT_IMPACT_ANALYSIS = {"risk_level": "MEDIUM", "impacts": [], "recommendations": [], "safe_to_auto_approve": False}
+
+STEP_CONCURRENCY = int(os.environ.get('STEP_CONCURRENCY', '4'))
+BATCH_FETCH_CONCURRENCY = int(os.environ.get('BATCH_FETCH_CONCURRENCY', '16'))
+SCHEMA_BLOB_TABLE = os.environ.get('SCHEMA_BLOB_TABLE', '')
+HISTORY_COMPRESS_MIN_BYTES = int(os.environ.get('HISTORY_COMPRESS_MIN_BYTES', '1024'))
+HISTORY_WRITE_SHARDS = int(os.environ.get('HISTORY_WRITE_SHARDS', '8'))
+HISTORY_BUCKET_SECONDS = int(os.environ.get('HISTORY_BUCKET_SECONDS', '3600'))
+HISTORY_PER_FILE_DETAIL = os.environ.get('HISTORY_PER_FILE_DETAIL', 'true').lower() == 'true'
+HISTORY_RETENTION_SECONDS = 90 * 24 * 60 * 60
+MEMORY_INDEX_REFRESH_SECONDS = int(os.environ.get('MEMORY_INDEX_REFRESH_SECONDS', '300'))
+MEMORY_INDEX_OVERLAP_SECONDS = int(os.environ.get('MEMORY_INDEX_OVERLAP_SECONDS', '300'))
+
+# Per-file history rows are write-behind: batched with batch_write_item and flushed on exit
+history_writes = WriteBuffer(dynamodb, SCHEMA_HISTORY_TABLE, key_names=('schema_id', 'timestamp'))
+
+_step_pool = ThreadPoolExecutor(max_workers=STEP_CONCURRENCY)
+_tables = {}
+_tables_lock = threading.Lock()
+_stored_blobs = set()
+_json_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_NUMBER_TAIL = re.compile(r'[0-9eE.+-]*')
+
+COMPRESSION_EXTENSIONS = {'.gz': 'gzip', '.gzip': 'gzip', '.bz2': 'bz2', '.zst': 'zstd', '.zstd': 'zstd'}
+COMPRESSION_MAGIC = {b'\x1f\x8b': 'gzip', b'BZh': 'bz2', b'\x28\xb5\x2f\xfd': 'zstd'}
 
+@flush_on_exit(history_writes)
 def lambda_handler(event, context):
     """Main handler for schema analysis"""
     try:
+        if 's3_keys' in event:
+            return analyze_batch(event, context)
+        
         execution_id = event['execution_id']
         s3_bucket = event['s3_bucket']
         s3_key = event['s3_key']
+        timings = {}
         
         print(f"Analyzing schema for execution: {execution_id}")
         
-        # Extract incoming schema
-        incoming_schema = extract_schema_from_s3(s3_bucket, s3_key)
-        
-        # Get current contract
-        current_contract = get_current_contract()
-        expected_schema = current_contract.get('schema', {})
+        # Extract incoming schema (union across all records of NDJSON/array files)
+        # while the current contract is fetched
+        loaded = run_steps({
+            'extract_schema': lambda: extract_schema_profile_from_s3(s3_bucket, s3_key),
+            'get_contract': get_current_contract
+        }, timings)
+        schema_profile = loaded['extract_schema']
+        incoming_schema = schema_profile['schema']
+        current_contract = loaded['get_contract']
         
-        # Compare schemas
-        schema_diff = compare_schemas(expected_schema, incoming_schema)
-        
-        # Classify change
-        change_type = classify_change(schema_diff)
-        
-        # Analyze impact with Bedrock
-        impact_analysis = analyze_impact_with_bedrock(schema_diff, change_type, execution_id)
-        
-        # Store history
-        store_schema_history(execution_id, incoming_schema, expected_schema, schema_diff, change_type, impact_analysis)
-        
-        # Check agent memory
-        auto_approve = check_agent_memory(schema_diff, change_type)
+        decision = analyze_schema(execution_id, incoming_schema, current_contract, context, timings,
+                                  schema_profile['record_count'])
+        timed_step('flush_history', timings, history_writes.flush)
         
         return {
             'execution_id': execution_id,
-            'change_type': change_type,
-            'schema_diff': schema_diff,
+            'change_type': decision['change_type'],
+            'schema_diff': decision['schema_diff'],
+            'schema_pattern': decision['schema_pattern'],
+            'pattern_descriptors': decision['pattern_descriptors'],
             'incoming_schema': incoming_schema,
+            'raw_compression': schema_profile['raw_compression'],
+            'record_count': schema_profile['record_count'],
+            'field_presence': schema_profile['field_presence'],
+            'sampled': schema_profile['sampled'],
+            'schema_confidence': schema_profile['confidence'],
             'current_contract': current_contract,
-            'impact_analysis': impact_analysis,
-            'auto_approve': auto_approve,
+            'impact_analysis': decision['impact_analysis'],
+            'auto_approve': decision['auto_approve'],
+            'contract_cache': contract_cache.stats(),
+            'fingerprint_cache': fingerprint_cache.stats(decision['cached']),
+            'impact_cache': impact_cache.stats(),
+            'impact_rules': impact_rule_stats,
+            'bedrock_breaker': bedrock_breaker.stats(),
+            'history_writes': history_writes.stats(),
+            'memory_index': memory_index.stats(),
+            'agent_memory': agent_memory_stats(),
+            'step_timings_ms': timings,
             'timestamp': datetime.utcnow().isoformat()
         }
         
@@ -66,11 +160,378 @@ def lambda_handler(event, context):
         print(f"Error: {str(e)}")
         raise
 
-def extract_schema_from_s3(bucket: str, key: str) -> Dict[str, Any]:
-    """Extract schema from JSON file"""
+def analyze_schema(execution_id: str, incoming_schema: Dict, current_contract: Dict, context,
+                   timings: Dict[str, float], record_count: int = 0, file_count: int = 1) -> Dict[str, Any]:
+    """Diff, classify, assess and record one incoming schema against the current contract"""
+    expected_schema = current_contract.get('schema', {})
+    
+    # Already-seen (schema, contract version) pairs skip diff, Bedrock and the
+    # history detail row; only the aggregated counter is bumped
+    fingerprint = schema_fingerprint(incoming_schema)
+    contract_version = current_contract.get('version', 0)
+    started = time.perf_counter()
+    cached = fingerprint_cache.lookup(fingerprint, contract_version)
+    if cached:
+        schema_diff = cached['schema_diff']
+        change_type = cached['change_type']
+        impact_analysis = cached['impact_analysis']
+        fingerprint_cache.record_saving(cached, time.perf_counter() - started)
+        schema_pattern, pattern_descriptors = schema_change_pattern(schema_diff, current_contract)
+        auto_approve = run_steps({
+            'check_memory': lambda: check_agent_memory(schema_pattern, change_type),
+            'count_history': lambda: record_schema_counter(fingerprint, change_type, execution_id,
+                                                           record_count, file_count)
+        }, timings)['check_memory']
+    else:
+        # Compare schemas
+        schema_diff = compare_schemas(expected_schema, incoming_schema)
+        
+        # Classify change
+        change_type = classify_change(schema_diff)
+        schema_pattern, pattern_descriptors = schema_change_pattern(schema_diff, current_contract)
+        
+        # Impact analysis (local rules, escalating to Bedrock) and the history
+        # write that records it run alongside the agent memory lookup
+        def analyze_and_record():
+            impact = timed_step('analyze_impact', timings, analyze_impact,
+                                schema_diff, change_type, execution_id, current_contract, context)
+            timed_step('store_history', timings, store_schema_history,
+                       execution_id, incoming_schema, expected_schema, schema_diff, change_type, impact,
+                       record_count, file_count)
+            return impact
+        
+        results = run_steps({
+            'impact_and_history': analyze_and_record,
+            'check_memory': lambda: check_agent_memory(schema_pattern, change_type)
+        }, timings)
+        impact_analysis = results['impact_and_history']
+        auto_approve = results['check_memory']
+        
+        # Fallback and early-decision impacts are retried on the next run
+        if impact_analysis != DEFAULT_IMPACT_ANALYSIS and not impact_analysis.get('partial'):
+            fingerprint_cache.store(fingerprint, contract_version, change_type, schema_diff,
+                                    impact_analysis, time.perf_counter() - started)
+    
+    return {
+        'fingerprint': fingerprint,
+        'change_type': change_type,
+        'schema_diff': schema_diff,
+        'schema_pattern': schema_pattern,
+        'pattern_descriptors': pattern_descriptors,
+        'impact_analysis': impact_analysis,
+        'auto_approve': auto_approve,
+        'cached': cached
+    }
+
+def analyze_batch(event, context):
+    """Analyze many objects in one invocation and return one decision per distinct schema.
+
+    Objects are fetched and inferred in parallel (BATCH_FETCH_CONCURRENCY)
+    and grouped by schema fingerprint; each group is analyzed once. Objects
+    that cannot be read or parsed are listed in failed_objects instead of
+    failing the batch.
+    """
+    execution_id = event['execution_id']
+    s3_bucket = event['s3_bucket']
+    s3_keys = event['s3_keys']
+    timings = {}
+    
+    print(f"Analyzing {len(s3_keys)} objects for execution: {execution_id}")
+    
+    current_contract = timed_step('get_contract', timings, get_current_contract)
+    
+    profiles = {}
+    failed_objects = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=BATCH_FETCH_CONCURRENCY) as pool:
+        futures = {pool.submit(extract_schema_profile_from_s3, s3_bucket, key): key for key in s3_keys}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                profiles[key] = future.result()
+            except Exception as e:
+                print(f"Could not analyze s3://{s3_bucket}/{key}: {e}")
+                failed_objects.append({'s3_key': key, 'error': str(e)})
+    timings['extract_schemas'] = round((time.perf_counter() - started) * 1000, 1)
+    
+    # Group in request order so the output is deterministic
+    groups = {}
+    for key in s3_keys:
+        if key in profiles:
+            fingerprint = schema_fingerprint(profiles[key]['schema'])
+            groups.setdefault(fingerprint, []).append(key)
+    
+    schemas = []
+    for fingerprint, keys in groups.items():
+        incoming_schema = profiles[keys[0]]['schema']
+        record_count = sum(profiles[key]['record_count'] for key in keys)
+        decision = analyze_schema(execution_id, incoming_schema, current_contract, context, {},
+                                  record_count, len(keys))
+        schemas.append({
+            'schema_fingerprint': fingerprint,
+            's3_keys': keys,
+            'object_count': len(keys),
+            'record_count': record_count,
+            'change_type': decision['change_type'],
+            'schema_diff': decision['schema_diff'],
+            'schema_pattern': decision['schema_pattern'],
+            'pattern_descriptors': decision['pattern_descriptors'],
+            'incoming_schema': incoming_schema,
+            'raw_compression': {key: profiles[key]['raw_compression']
+                                for key in keys if profiles[key]['raw_compression']},
+            'impact_analysis': decision['impact_analysis'],
+            'auto_approve': decision['auto_approve']
+        })
+    timings['analyze_schemas'] = round((time.perf_counter() - started) * 1000 - timings['extract_schemas'], 1)
+    timed_step('flush_history', timings, history_writes.flush)
+    
+    return {
+        'execution_id': execution_id,
+        's3_bucket': s3_bucket,
+        'object_count': len(s3_keys),
+        'schema_count': len(schemas),
+        'schemas': schemas,
+        'failed_objects': failed_objects,
+        'current_contract': current_contract,
+        'contract_cache': contract_cache.stats(),
+        'fingerprint_cache': fingerprint_cache.stats(),
+        'impact_cache': impact_cache.stats(),
+        'impact_rules': impact_rule_stats,
+        'bedrock_breaker': bedrock_breaker.stats(),
+        'history_writes': history_writes.stats(),
+        'memory_index': memory_index.stats(),
+        'agent_memory': agent_memory_stats(),
+        'step_timings_ms': timings,
+        'timestamp': datetime.utcnow().isoformat()
+    }
+
+def get_table(name: str):
+    """Shared Table resource per name; boto3 resources must not be created concurrently"""
+    with _tables_lock:
+        if name not in _tables:
+            _tables[name] = dynamodb.Table(name)
+        return _tables[name]
+
+def timed_step(name: str, timings: Dict[str, float], step: Callable[..., Any], *args) -> Any:
+    """Call step(*args), recording its wall time in milliseconds under name"""
+    started = time.perf_counter()
+    try:
+        return step(*args)
+    finally:
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+def run_steps(steps: Dict[str, Callable[[], Any]], timings: Dict[str, float]) -> Dict[str, Any]:
+    """Run independent I/O-bound steps concurrently on the shared step pool.
+
+    Waits for every step, so none is abandoned mid-write, then re-raises the
+    first failure (all failures are logged with their step names).
+    """
+    futures = {name: _step_pool.submit(timed_step, name, timings, step) for name, step in steps.items()}
+    results = {}
+    failures = []
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            print(f"Step {name} failed: {e}")
+            failures.append(e)
+    if failures:
+        raise failures[0]
+    return results
+
+def extract_schema_profile_from_s3(bucket: str, key: str, streaming: bool = STREAMING_INFERENCE,
+                                   max_records: int = SCHEMA_SAMPLE_RECORDS,
+                                   sample_size: int = SCHEMA_RESERVOIR_SIZE,
+                                   stable_after: int = SCHEMA_STABLE_RECORDS,
+                                   head_sample_bytes: int = SCHEMA_HEAD_SAMPLE_BYTES) -> Dict[str, Any]:
+    """Extract union schema and per-field presence counts from a JSON, JSON array or NDJSON file.
+
+    The profile's raw_compression names the codec the Glue read must be
+    told about (see glue_compression), or is empty.
+    """
+    if head_sample_bytes:
+        profile = sample_profile_from_ranges(bucket, key, head_sample_bytes, max_records, sample_size, stable_after)
+        if profile:
+            return profile
+        print(f"Range sample of s3://{bucket}/{key} could not be parsed, falling back to full read")
+
     response = s3_client.get_object(Bucket=bucket, Key=key)
-    data = json.loads(response['Body'].read().decode('utf-8'))
-    return infer_schema(data)
+    body, compression = open_body(key, response)
+    if streaming:
+        profile = infer_profile_from_stream(body, max_records, sample_size, stable_after)
+    else:
+        text = body.read().decode('utf-8')
+        profile = infer_profile(iter_documents(text), max_records, sample_size, stable_after)
+    profile['raw_compression'] = glue_compression(key, compression)
+    return profile
+
+def sample_profile_from_ranges(bucket: str, key: str, head_bytes: int, max_records: int = 0,
+                               sample_size: int = 0, stable_after: int = 0,
+                               random_ranges: int = SCHEMA_RANDOM_RANGES,
+                               range_bytes: int = SCHEMA_RANGE_SIZE_BYTES) -> Dict[str, Any]:
+    """Infer a profile from Range-GET slices instead of the whole object.
+
+    Fetches the first head_bytes and, for NDJSON bodies, random_ranges extra
+    slices trimmed to newline boundaries. Compressed objects are inflated only
+    as far as the head slice reaches (random slices cannot be decoded
+    mid-stream and are skipped). Returns None when the slices do not
+    yield any complete record (e.g. one large JSON document) so the caller can
+    fall back to a full read.
+    """
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=key, Range=f'bytes=0-{head_bytes - 1}')
+        head = response['Body'].read()
+        total_size = int(response.get('ContentRange', f'/{len(head)}').rsplit('/', 1)[1])
+    except Exception as e:
+        print(f"Range GET failed: {str(e)}")
+        return None
+
+    complete = total_size <= len(head)
+    compression = detect_compression(key, response, head)
+    if compression:
+        head = inflate_prefix(head, compression)
+        random_ranges = 0
+    if complete:
+        profile = infer_profile_from_stream(io.BytesIO(head), max_records, sample_size, stable_after)
+        profile['raw_compression'] = glue_compression(key, compression)
+        return profile
+
+    if head.lstrip()[:1] == b'[':
+        profile = SchemaProfile(max_records, True, sample_size, stable_after)
+        _sample_array_prefix(head, profile)
+    else:
+        profile = SchemaProfile(max_records, False, sample_size, stable_after)
+        slices = [head[:head.rfind(b'\n') + 1]]
+        for _ in range(random_ranges if total_size > head_bytes + range_bytes else 0):
+            start = random.randint(len(head), total_size - range_bytes)
+            chunk = s3_client.get_object(
+                Bucket=bucket, Key=key, Range=f'bytes={start}-{start + range_bytes - 1}'
+            )['Body'].read()
+            # Drop the partial lines at both edges of the slice
+            slices.append(chunk[chunk.find(b'\n') + 1:chunk.rfind(b'\n') + 1])
+        try:
+            for line in b''.join(slices).splitlines():
+                if profile.done():
+                    break
+                if line.strip():
+                    profile.offer(json.loads(line))
+        except ValueError:
+            return None
+
+    if not profile.record_count:
+        return None
+    profile.sampled = True
+    return dict(profile.result(), raw_compression=glue_compression(key, compression))
+
+def detect_compression(key: str, response: Dict[str, Any], prefix: bytes = b'') -> str:
+    """Detect gzip/bz2/zstd from Content-Encoding, Content-Type, key extension or magic bytes"""
+    declared = f"{response.get('ContentEncoding', '')} {response.get('ContentType', '')}".lower()
+    for marker, compression in (('gzip', 'gzip'), ('bzip2', 'bz2'), ('bz2', 'bz2'), ('zstd', 'zstd')):
+        if marker in declared:
+            return compression
+    extension = os.path.splitext(key.lower())[1]
+    if extension in COMPRESSION_EXTENSIONS:
+        return COMPRESSION_EXTENSIONS[extension]
+    for magic, compression in COMPRESSION_MAGIC.items():
+        if prefix.startswith(magic):
+            return compression
+    return ''
+
+def glue_compression(key: str, compression: str) -> str:
+    """Codec to pass to the Glue read, which (like Spark) inflates by file extension only.
+
+    Empty when the object is not compressed or its extension already
+    declares the codec; otherwise e.g. a gzip body under a `.json` key.
+    zstd is always reported: the Glue job inflates it with the zstandard
+    module rather than relying on a Hadoop codec.
+    """
+    if compression == 'zstd':
+        return compression
+    if not compression or COMPRESSION_EXTENSIONS.get(os.path.splitext(key.lower())[1]) == compression:
+        return ''
+    return compression
+
+def _require_zstandard():
+    if zstandard is None:
+        raise RuntimeError("zstd-compressed input requires the 'zstandard' package")
+    return zstandard
+
+def open_body(key: str, response: Dict[str, Any]) -> tuple:
+    """Return a file-like body that inflates gzip/bz2/zstd objects as they are read, and the codec"""
+    body = PrefixedBody(response['Body'])
+    compression = detect_compression(key, response, body.prefix)
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=body, mode='rb'), compression
+    if compression == 'bz2':
+        return bz2.BZ2File(body, mode='rb'), compression
+    if compression == 'zstd':
+        return _require_zstandard().ZstdDecompressor().stream_reader(body, read_across_frames=True), compression
+    return body, compression
+
+def inflate_prefix(data: bytes, compression: str) -> bytes:
+    """Decompress as much of a (possibly truncated) compressed prefix as is decodable"""
+    if compression == 'gzip':
+        inflated = []
+        while data:  # Concatenated gzip members each need a fresh decompressor
+            decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 32)
+            inflated.append(decompressor.decompress(data))
+            data = decompressor.unused_data if decompressor.eof else b''
+        return b''.join(inflated)
+    if compression == 'bz2':
+        return bz2.BZ2Decompressor().decompress(data)
+    return _require_zstandard().ZstdDecompressor().decompressobj().decompress(data)
+
+class PrefixedBody:
+    """Non-seekable body wrapper that lets the first bytes be sniffed without losing them"""
+
+    def __init__(self, body, prefix_size: int = 4):
+        self.body = body
+        self.prefix = body.read(prefix_size)
+        self._pending = self.prefix
+
+    def read(self, size: int = -1) -> bytes:
+        if not self._pending:
+            return self.body.read(size) if size is not None and size >= 0 else self.body.read()
+        if size is None or size < 0:
+            data, self._pending = self._pending + self.body.read(), b''
+            return data
+        data, self._pending = self._pending[:size], self._pending[size:]
+        if len(data) < size:
+            data += self.body.read(size - len(data))
+        return data
+
+def _sample_array_prefix(head: bytes, profile: 'SchemaProfile'):
+    """Offer every complete element in the truncated prefix of a JSON array"""
+    stream = JsonStream(io.BytesIO(head))
+    stream.expect('[')
+    try:
+        while not profile.done():
+            record = stream.decode_value()
+            stream.expect(',')
+            profile.offer(record)
+    except ValueError:
+        pass  # Reached the cut-off element
+
+def iter_documents(text: str) -> Iterator[Any]:
+    """Yield every top-level JSON value in text (one for plain JSON, one per line for NDJSON)"""
+    idx = _WHITESPACE.match(text).end()
+    while idx < len(text):
+        document, idx = _json_decoder.raw_decode(text, idx)
+        yield document
+        idx = _WHITESPACE.match(text, idx).end()
+
+def infer_profile(documents: Iterable[Any], max_records: int = 0, sample_size: int = 0,
+                  stable_after: int = 0) -> Dict[str, Any]:
+    """Union the schemas of already-parsed documents into a profile"""
+    documents = list(documents)
+    is_array = len(documents) == 1 and isinstance(documents[0], list)
+    profile = SchemaProfile(max_records, is_array, sample_size, stable_after)
+    for record in documents[0] if is_array else documents:
+        if profile.done():
+            profile.sampled = True
+            break
+        profile.offer(record)
+    return profile.result()
 
 def infer_schema(data: Any, path: str = "") -> Dict[str, Any]:
     """Recursively infer schema from JSON data"""
@@ -80,7 +541,10 @@ def infer_schema(data: Any, path: str = "") -> Dict[str, Any]:
             "properties": {k: infer_schema(v, f"{path}.{k}") for k, v in data.items()}
         }
     elif isinstance(data, list):
-        return {"type": "array", "items": infer_schema(data[0], f"{path}[]") if data else {}}
+        items = {}
+        for item in data:
+            items = merge_schemas(items, infer_schema(item, f"{path}[]"))
+        return {"type": "array", "items": items}
     elif isinstance(data, str):
         return {"type": "string"}
     elif isinstance(data, bool):
@@ -93,45 +557,599 @@ def infer_schema(data: Any, path: str = "") -> Dict[str, Any]:
         return {"type": "null"}
     return {"type": "unknown"}
 
+def schema_types(schema: Dict[str, Any]) -> set:
+    """Return the set of types a schema node allows"""
+    node_type = schema.get('type')
+    if isinstance(node_type, list):
+        return set(node_type)
+    return {node_type} if node_type else set()
+
+def merge_schemas(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    """Union two inferred schemas; conflicting types become a sorted type list"""
+    if not left:
+        return right
+    if not right:
+        return left
+    types = schema_types(left) | schema_types(right)
+    if types == {"integer", "number"}:
+        types = {"number"}
+    merged = {"type": types.pop() if len(types) == 1 else sorted(types)}
+    if 'properties' in left or 'properties' in right:
+        properties = dict(left.get('properties', {}))
+        for name, child in right.get('properties', {}).items():
+            properties[name] = merge_schemas(properties.get(name, {}), child)
+        merged['properties'] = properties
+    if 'items' in left or 'items' in right:
+        merged['items'] = merge_schemas(left.get('items', {}), right.get('items', {}))
+    return merged
+
+def schema_paths(schema: Dict[str, Any], prefix: str = "") -> Iterator[str]:
+    """Yield the dotted path of every field in a schema (array elements as `field[]`)"""
+    for name, child in schema.get('properties', {}).items():
+        path = f"{prefix}.{name}" if prefix else name
+        yield path
+        yield from schema_paths(child, path)
+    if schema.get('items'):
+        yield from schema_paths(schema['items'], f"{prefix}[]")
+
+class SchemaProfile:
+    """Accumulates a union schema and per-field presence counts across records.
+
+    With sample_size set, records are selected by reservoir sampling (every
+    record while the reservoir fills, then with probability sample_size/n), so
+    only the sampled records pay for schema inference and presence counts are
+    estimated from the reservoir. Once stable_after consecutive sampled records
+    add no new path or type, done() tells the reader to stop early.
+    """
+
+    def __init__(self, max_records: int = 0, is_array: bool = False, sample_size: int = 0,
+                 stable_after: int = 0):
+        self.max_records = max_records
+        self.is_array = is_array
+        self.sample_size = sample_size
+        self.stable_after = stable_after
+        self.schema = {}
+        self.record_count = 0
+        self.inferred_count = 0
+        self.novel_count = 0
+        self.stable_run = 0
+        self.field_presence = {}
+        self.reservoir = []
+        self.sampled = False
+        self._last_schema = None
+        self._last_paths = []
+
+    def done(self) -> bool:
+        if self.max_records and self.record_count >= self.max_records:
+            return True
+        return bool(self.sample_size and self.stable_after) and self.stable_run >= self.stable_after
+
+    def offer(self, record: Any):
+        """Count a record, inferring its schema only if the reservoir selects it"""
+        if self.sample_size and self.record_count >= self.sample_size:
+            slot = random.randrange(self.record_count + 1)
+            if slot >= self.sample_size:
+                self.record_count += 1
+                self.sampled = True
+                return
+            self.add(infer_schema(record), slot)
+        else:
+            self.add(infer_schema(record))
+
+    def add(self, record_schema: Dict[str, Any], slot: int = None):
+        novel = False
+        # Consecutive records usually share a shape; re-merging an identical schema is a no-op
+        if record_schema != self._last_schema:
+            merged = merge_schemas(self.schema, record_schema)
+            novel = merged != self.schema
+            self.schema = merged
+            self._last_schema = record_schema
+            self._last_paths = list(schema_paths(record_schema))
+        self.record_count += 1
+        self.inferred_count += 1
+        if novel:
+            self.novel_count += 1
+            self.stable_run = 0
+        else:
+            self.stable_run += 1
+
+        if not self.sample_size:
+            for path in self._last_paths:
+                self.field_presence[path] = self.field_presence.get(path, 0) + 1
+        elif slot is None:
+            self.reservoir.append(self._last_paths)
+        else:
+            self.reservoir[slot] = self._last_paths
+
+    def estimated_presence(self) -> Dict[str, int]:
+        """Scale reservoir path counts up to the number of records read"""
+        counts = {}
+        for paths in self.reservoir:
+            for path in paths:
+                counts[path] = counts.get(path, 0) + 1
+        scale = self.record_count / len(self.reservoir) if self.reservoir else 0
+        return {path: round(count * scale) for path, count in counts.items()}
+
+    def confidence(self) -> float:
+        """Good-Turing estimate that the next unread record adds no new path or type"""
+        if not self.sampled or not self.inferred_count:
+            return 1.0
+        return round(1 - self.novel_count / self.inferred_count, 4)
+
+    def result(self) -> Dict[str, Any]:
+        # A top-level array is a batch of records: its schema is the record union,
+        # which is what the (per-record) contract describes
+        return {
+            "schema": self.schema,
+            "is_array": self.is_array,
+            "record_count": self.record_count,
+            "inferred_records": self.inferred_count,
+            "field_presence": self.estimated_presence() if self.sample_size else self.field_presence,
+            "sampled": self.sampled,
+            "confidence": self.confidence()
+        }
+
+class JsonStream:
+    """Buffered reader that walks a JSON body incrementally instead of loading it whole"""
+
+    def __init__(self, body, chunk_size: int = STREAM_CHUNK_SIZE):
+        self.body = body
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size: int):
+        """Drop consumed text and read at least `size` more characters (unless EOF)"""
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+        target = len(self.buf) + size
+        while len(self.buf) < target and not self.eof:
+            chunk = self.body.read(self.chunk_size)
+            if chunk:
+                self.buf += self.decoder.decode(chunk)
+            else:
+                self.buf += self.decoder.decode(b'', final=True)
+                self.eof = True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character, or '' at end of input"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                return ''
+            self.fill(self.chunk_size)
+
+    def expect(self, char: str):
+        """Consume a structural character or fail"""
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' in JSON input")
+        self.pos += 1
+
+    def decode_value(self) -> Any:
+        """Decode one complete value at the cursor, reading more while it is truncated"""
+        self.peek()
+        while True:
+            try:
+                value, end = _json_decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                # Grow geometrically so large values are re-scanned O(log n) times
+                self.fill(max(self.chunk_size, len(self.buf) - self.pos))
+                continue
+            # A number cut at the buffer edge ("12" of "12.5e3") may continue in the next chunk
+            if not self.eof and _NUMBER_TAIL.match(self.buf, end).end() == len(self.buf):
+                self.fill(self.chunk_size)
+                continue
+            self.pos = end
+            return value
+
+def infer_profile_from_stream(body, max_records: int = 0, sample_size: int = 0,
+                              stable_after: int = 0) -> Dict[str, Any]:
+    """Build a schema profile while reading a JSON, JSON array or NDJSON body.
+
+    A top-level array is treated as a list of records and each line of an
+    NDJSON body as one record. Records are decoded one at a time and
+    discarded, so peak memory is bounded by the largest single record rather
+    than the file size. Reading stops early once max_records have been read
+    or, in sampling mode, once the schema has stabilised (see SchemaProfile).
+    """
+    stream = JsonStream(body)
+    if stream.peek() == '[':
+        profile = SchemaProfile(max_records, True, sample_size, stable_after)
+        stream.pos += 1
+        closed = stream.peek() == ']'
+        if closed:
+            stream.pos += 1
+        while not closed:
+            if profile.done():
+                profile.sampled = True
+                return profile.result()
+            profile.offer(stream.decode_value())
+            char = stream.peek()
+            stream.pos += 1
+            if char == ']':
+                closed = True
+            elif char != ',':
+                raise ValueError("Expected ',' or ']' in array")
+        if stream.peek() != '':
+            raise ValueError("Extra data after top-level JSON array")
+        return profile.result()
+
+    # First document is walked key by key in case it is one very large object
+    profile = SchemaProfile(max_records, False, sample_size, stable_after)
+    profile.add(_infer_stream_value(stream))
+    while stream.peek() != '':
+        if profile.done():
+            profile.sampled = True
+            break
+        profile.offer(stream.decode_value())
+    return profile.result()
+
+def _infer_stream_value(stream: JsonStream) -> Dict[str, Any]:
+    """Build the schema of the value at the cursor while consuming it"""
+    char = stream.peek()
+    if char == '{':
+        stream.pos += 1
+        properties = {}
+        if stream.peek() == '}':
+            stream.pos += 1
+            return {"type": "object", "properties": properties}
+        while True:
+            key = stream.decode_value()
+            if not isinstance(key, str):
+                raise ValueError("Object keys must be strings")
+            stream.expect(':')
+            properties[key] = _infer_stream_value(stream)
+            char = stream.peek()
+            stream.pos += 1
+            if char == '}':
+                return {"type": "object", "properties": properties}
+            if char != ',':
+                raise ValueError("Expected ',' or '}' in object")
+    if char == '[':
+        stream.pos += 1
+        items = {}
+        if stream.peek() == ']':
+            stream.pos += 1
+            return {"type": "array", "items": items}
+        while True:
+            items = merge_schemas(items, infer_schema(stream.decode_value()))
+            char = stream.peek()
+            stream.pos += 1
+            if char == ']':
+                return {"type": "array", "items": items}
+            if char != ',':
+                raise ValueError("Expected ',' or ']' in array")
+    if char == '':
+        raise ValueError("Unexpected end of JSON input")
+    return infer_schema(stream.decode_value())
+
+class S3JsonCache:
+    """Warm-container cache of JSON objects in S3, revalidated by ETag after the TTL.
+
+    Fresh entries cost no request. Stale entries are confirmed either by an
+    ETag the caller already holds (e.g. from a listing) or by a conditional
+    GET with If-None-Match, which returns 304 without a body when unchanged.
+    Immutable keys (versioned contracts) never go stale; missing keys are
+    cached as None for the TTL.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, bucket: str, key: str, etag: str = None, immutable: bool = False) -> Any:
+        entry = self.entries.get((bucket, key))
+        now = time.monotonic()
+        if entry and (immutable or now - entry['checked_at'] < self.ttl_seconds
+                      or (etag and etag == entry['etag'])):
+            entry['checked_at'] = now
+            self.hits += 1
+            return entry['value']
+
+        params = {'Bucket': bucket, 'Key': key}
+        if entry and entry['etag']:
+            params['IfNoneMatch'] = entry['etag']
+        try:
+            response = s3_client.get_object(**params)
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if entry and code in ('304', 'NotModified'):
+                entry['checked_at'] = now
+                self.hits += 1
+                self.not_modified += 1
+                return entry['value']
+            if code in ('NoSuchKey', '404'):
+                self.misses += 1
+                self.entries[(bucket, key)] = {'etag': None, 'value': None, 'checked_at': now}
+                return None
+            raise
+
+        self.misses += 1
+        value = json.loads(response['Body'].read().decode('utf-8'))
+        self.entries[(bucket, key)] = {'etag': response['ETag'], 'value': value, 'checked_at': now}
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'not_modified': self.not_modified}
+
+contract_cache = S3JsonCache(CONTRACT_CACHE_TTL_SECONDS)
+_latest_contract_listing = {'object': None, 'checked_at': float('-inf')}
+
 def get_current_contract() -> Dict[str, Any]:
-    """Retrieve current contract from S3"""
+    """Retrieve current contract from S3 (cached across warm invocations)"""
     try:
-        response = s3_client.list_objects_v2(Bucket=CONTRACTS_BUCKET, Prefix='contract_v')
-        if 'Contents' not in response:
+        # The manifest written by contract_generator resolves the latest version in one GET
+        manifest = contract_cache.get(CONTRACTS_BUCKET, CONTRACT_MANIFEST_KEY)
+        if manifest:
+            return contract_cache.get(CONTRACTS_BUCKET, manifest['key'], immutable=True)
+
+        latest = _get_latest_contract_object()
+        if not latest:
             return {"version": 0, "schema": {}}
-        
-        latest = sorted(response['Contents'], key=lambda x: x['LastModified'], reverse=True)[0]
-        contract_response = s3_client.get_object(Bucket=CONTRACTS_BUCKET, Key=latest['Key'])
-        return json.loads(contract_response['Body'].read().decode('utf-8'))
+        return contract_cache.get(CONTRACTS_BUCKET, latest['Key'], latest['ETag'])
     except:
         return {"version": 0, "schema": {}}
 
+def _get_latest_contract_object() -> Dict[str, Any]:
+    """Newest contract_v* object by listing (pre-manifest buckets), re-listed at most once per TTL"""
+    now = time.monotonic()
+    if now - _latest_contract_listing['checked_at'] < CONTRACT_CACHE_TTL_SECONDS:
+        return _latest_contract_listing['object']
+
+    latest = None
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=CONTRACTS_BUCKET, Prefix='contract_v'):
+        for obj in page.get('Contents', []):
+            if latest is None or obj['LastModified'] > latest['LastModified']:
+                latest = obj
+    _latest_contract_listing.update({'object': latest, 'checked_at': now})
+    return latest
+
+class SchemaTree:
+    """Canonical, read-only view of a schema where every node carries a Merkle digest.
+
+    A node's digest covers only its structure (type, whether it is open, its
+    property names with their child digests, and its items digest), so
+    annotations such as `description` do not affect equality. Two subtrees
+    with equal digests are identical and can be skipped wholesale.
+    """
+
+    __slots__ = ('type', 'open', 'properties', 'items', 'digest')
+
+    def __init__(self, schema: Dict[str, Any]):
+        self.type = schema.get('type')
+        self.open = 'object' in schema_types(schema) and 'properties' not in schema
+        self.properties = {name: SchemaTree(child) for name, child in schema.get('properties', {}).items()}
+        self.items = SchemaTree(schema['items']) if schema.get('items') else None
+
+        parts = [repr((self.type, self.open)).encode()]
+        for name in sorted(self.properties):
+            encoded = name.encode('utf-8', 'surrogatepass')
+            parts += [len(encoded).to_bytes(4, 'big'), encoded, self.properties[name].digest]
+        if self.items:
+            parts += [b'[]', self.items.digest]
+        self.digest = hashlib.blake2b(b''.join(parts), digest_size=16).digest()
+
+_schema_tree_memo = []
+
+def schema_tree(schema: Dict[str, Any]) -> SchemaTree:
+    """Build (or reuse) the SchemaTree for a schema object.
+
+    The cached contract schema and the incoming schema are the same objects
+    for the whole invocation, so their trees are memoized by identity (the
+    memo holds a reference, so identities cannot be recycled).
+    """
+    for cached_schema, tree in _schema_tree_memo:
+        if cached_schema is schema:
+            return tree
+    tree = SchemaTree(schema)
+    _schema_tree_memo.insert(0, (schema, tree))
+    del _schema_tree_memo[8:]
+    return tree
+
+def schema_fingerprint(schema: Dict[str, Any]) -> str:
+    """Root Merkle digest of a schema as hex; used as the schema_id"""
+    return schema_tree(schema).digest.hex()
+
 def compare_schemas(expected: Dict, incoming: Dict) -> Dict[str, Any]:
-    """Compare schemas and identify differences"""
+    """Compare schemas and identify differences at every nesting level"""
     diff = {"added_fields": [], "removed_fields": [], "type_changes": []}
-    
-    expected_props = expected.get('properties', {})
-    incoming_props = incoming.get('properties', {})
-    
-    for field in incoming_props:
-        if field not in expected_props:
-            diff["added_fields"].append({"field": field, "type": incoming_props[field].get('type')})
-    
-    for field in expected_props:
-        if field not in incoming_props:
-            diff["removed_fields"].append({"field": field, "type": expected_props[field].get('type')})
-    
-    for field in expected_props:
-        if field in incoming_props:
-            if expected_props[field].get('type') != incoming_props[field].get('type'):
-                diff["type_changes"].append({
-                    "field": field,
-                    "expected_type": expected_props[field].get('type'),
-                    "incoming_type": incoming_props[field].get('type')
-                })
-    
+    _diff_trees(schema_tree(expected), schema_tree(incoming), "", diff)
     return diff
 
+def _diff_trees(expected: SchemaTree, incoming: SchemaTree, prefix: str, diff: Dict[str, Any]):
+    """Walk only the subtrees whose digests differ, recording changes with full paths"""
+    if expected.digest == incoming.digest:
+        return
+    children = [(f"{prefix}.{name}" if prefix else name, expected.properties.get(name), child)
+                for name, child in incoming.properties.items()]
+    if incoming.items:
+        children.append((f"{prefix}[]", expected.items, incoming.items))
+
+    for path, expected_child, incoming_child in children:
+        if expected_child is None:
+            _record_subtree(incoming_child, path, diff["added_fields"])
+            continue
+        if expected_child.type != incoming_child.type:
+            diff["type_changes"].append({
+                "field": path,
+                "expected_type": expected_child.type,
+                "incoming_type": incoming_child.type
+            })
+        # Children of an open contract object are not constrained
+        if not expected_child.open:
+            _diff_trees(expected_child, incoming_child, path, diff)
+
+    # An array that was always empty says nothing about its elements, so a
+    # missing incoming items schema is unconstrained rather than a removal
+    for name, child in expected.properties.items():
+        if name not in incoming.properties:
+            _record_subtree(child, f"{prefix}.{name}" if prefix else name, diff["removed_fields"])
+
+def _record_subtree(tree: SchemaTree, path: str, entries: list):
+    """Record a field and all of its descendants as added or removed"""
+    entries.append({"field": path, "type": tree.type})
+    for name, child in tree.properties.items():
+        _record_subtree(child, f"{path}.{name}", entries)
+    if tree.items:
+        _record_subtree(tree.items, f"{path}[]", entries)
+
+class TieredCache:
+    """JSON values in a bounded in-container LRU backed by a shared DynamoDB table.
+
+    Lookups try the warm container first and fall back to one GetItem; table
+    hits are promoted into memory. Both tiers expire values after ttl_days
+    (items carry an expiration_time for the table's TTL). Table errors are logged
+    and treated as misses so the cache never fails an analysis.
+    """
+
+    def __init__(self, table_name: str, key_attribute: str, max_entries: int, ttl_days: int):
+        self.table_name = table_name
+        self.key_attribute = key_attribute
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_days * 24 * 60 * 60
+        self.entries = OrderedDict()
+        self.memory_hits = 0
+        self.table_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Dict[str, Any]:
+        """Return {'value', 'source', ...extra attributes} or None"""
+        entry = self.entries.get(key)
+        if entry and time.monotonic() - entry['cached_at'] >= self.ttl_seconds:
+            del self.entries[key]
+            entry = None
+        if entry:
+            self.entries.move_to_end(key)
+            self.memory_hits += 1
+            return dict(entry, source='memory')
+
+        if self.table_name:
+            try:
+                item = get_table(self.table_name).get_item(Key={self.key_attribute: key}).get('Item')
+            except ClientError as e:
+                print(f"Cache lookup in {self.table_name} failed: {e}")
+                item = None
+            if item and item.get('expiration_time', float('inf')) > time.time():
+                entry = {name: value for name, value in item.items()
+                         if name not in (self.key_attribute, 'payload', 'expiration_time')}
+                entry['value'] = json.loads(item['payload'])
+                self._remember(key, entry)
+                self.table_hits += 1
+                return dict(entry, source='dynamodb')
+
+        self.misses += 1
+        return None
+
+    def wait_for(self, key: str, timeout_seconds: float, poll_seconds: float) -> Dict[str, Any]:
+        """Poll the table until another writer stores key.
+
+        Called after get() missed; that miss is the lookup's only count, so
+        waiting does not add a hit or another miss.
+        """
+        give_up = time.monotonic() + timeout_seconds
+        while True:
+            try:
+                item = get_table(self.table_name).get_item(Key={self.key_attribute: key}).get('Item')
+            except ClientError as e:
+                print(f"Cache lookup in {self.table_name} failed: {e}")
+                item = None
+            if item:
+                entry = {'value': json.loads(item['payload'])}
+                self._remember(key, entry)
+                return dict(entry, source='dynamodb')
+            if time.monotonic() + poll_seconds > give_up:
+                return None
+            time.sleep(poll_seconds)
+
+    def put(self, key: str, value: Any, **attributes):
+        entry = dict(attributes, value=value)
+        self._remember(key, entry)
+        if not self.table_name:
+            return
+        try:
+            get_table(self.table_name).put_item(Item=dict(
+                attributes,
+                **{self.key_attribute: key},
+                payload=json.dumps(value),
+                expiration_time=int(time.time()) + self.ttl_seconds
+            ))
+        except ClientError as e:
+            print(f"Cache write to {self.table_name} failed: {e}")
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        entry['cached_at'] = time.monotonic()
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.table_hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'table_hits': self.table_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.memory_hits + self.table_hits) / lookups, 4) if lookups else 0.0
+        }
+
+class FingerprintCache(TieredCache):
+    """Analysis results keyed by (incoming schema fingerprint, contract version).
+
+    Entries remember how long the original analysis took, which is
+    reported as latency saved on each hit.
+    """
+
+    def __init__(self, table_name: str, max_entries: int, ttl_days: int):
+        super().__init__(table_name, 'fingerprint_key', max_entries, ttl_days)
+        self.saved_ms = 0.0
+
+    def lookup(self, fingerprint: str, contract_version: Any) -> Dict[str, Any]:
+        entry = self.get(f"{fingerprint}#v{contract_version}")
+        if entry:
+            entry.update(entry.pop('value'))
+        return entry
+
+    def store(self, fingerprint: str, contract_version: Any, change_type: str, schema_diff: Dict,
+              impact_analysis: Dict, elapsed_seconds: float):
+        self.put(f"{fingerprint}#v{contract_version}",
+                 {'change_type': change_type, 'schema_diff': schema_diff, 'impact_analysis': impact_analysis},
+                 fingerprint=fingerprint, contract_version=str(contract_version),
+                 analysis_ms=Decimal(str(round(elapsed_seconds * 1000, 1))))
+
+    def record_saving(self, entry: Dict[str, Any], lookup_seconds: float):
+        entry['saved_ms'] = max(float(entry['analysis_ms']) - lookup_seconds * 1000, 0.0)
+        self.saved_ms += entry['saved_ms']
+
+    def stats(self, entry: Dict[str, Any] = None) -> Dict[str, Any]:
+        return dict(
+            super().stats(),
+            hit=entry['source'] if entry else None,
+            latency_saved_ms=round(entry['saved_ms'], 1) if entry else 0.0,
+            total_latency_saved_ms=round(self.saved_ms, 1)
+        )
+
+fingerprint_cache = FingerprintCache(SCHEMA_FINGERPRINT_TABLE, FINGERPRINT_CACHE_SIZE, FINGERPRINT_TTL_DAYS)
+impact_cache = TieredCache(IMPACT_CACHE_TABLE, 'diff_key', IMPACT_CACHE_SIZE, IMPACT_CACHE_TTL_DAYS)
+
+def impact_cache_key(schema_diff: Dict, change_type: str, contract_version: Any) -> str:
+    """Canonical hash of a diff: entry order within each list does not matter"""
+    normalized = {
+        kind: sorted(entries, key=lambda entry: json.dumps(entry, sort_keys=True))
+        for kind, entries in schema_diff.items()
+    }
+    canonical = json.dumps([normalized, change_type, str(contract_version)], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
 def classify_change(schema_diff: Dict[str, Any]) -> str:
     """Classify the type of schema change"""
     if not any(schema_diff.values()):
@@ -142,8 +1160,99 @@ def classify_change(schema_diff: Dict[str, Any]) -> str:
         return "ADDITIVE"
     return "UNKNOWN"
 
-def analyze_impact_with_bedrock(schema_diff: Dict, change_type: str, execution_id: str) -> Dict:
-    """Use Bedrock for impact analysis"""
+ImpactRule = Callable[[Dict, str, Dict], Optional[Dict]]
+IMPACT_RULES: List[ImpactRule] = []
+impact_rule_stats = {'bedrock_calls_avoided': 0, 'escalations': 0, 'rule_hits': {}}
+
+def impact_rule(rule: ImpactRule) -> ImpactRule:
+    """Register a deterministic impact rule; rules run in registration order"""
+    IMPACT_RULES.append(rule)
+    return rule
+
+def _added_field_types(entry: Dict[str, Any]) -> set:
+    return set(entry['type']) if isinstance(entry['type'], list) else {entry['type']}
+
+@impact_rule
+def no_change_rule(schema_diff: Dict, change_type: str, contract: Dict) -> Optional[Dict]:
+    """Nothing changed, nothing to assess"""
+    if change_type != "NO_CHANGE":
+        return None
+    return {"risk_level": "LOW", "impacts": [], "recommendations": [], "safe_to_auto_approve": True}
+
+@impact_rule
+def breaking_required_field_rule(schema_diff: Dict, change_type: str, contract: Dict) -> Optional[Dict]:
+    """Removing or retyping a field the contract requires always breaks consumers"""
+    required = set(contract.get('required_fields', []))
+    broken = [entry['field'] for entry in schema_diff['removed_fields'] + schema_diff['type_changes']
+              if entry['field'] in required]
+    if change_type != "BREAKING" or not broken:
+        return None
+    return {
+        "risk_level": "HIGH",
+        "impacts": [f"Required field '{field}' was removed or changed type" for field in broken],
+        "recommendations": ["Quarantine the batch and fix the producer before reprocessing"],
+        "safe_to_auto_approve": False
+    }
+
+@impact_rule
+def additive_optional_scalars_rule(schema_diff: Dict, change_type: str, contract: Dict) -> Optional[Dict]:
+    """New top-level scalar fields are optional by construction and safe under ADDITIVE_ONLY"""
+    settings = contract.get('impact_rules', {})
+    added = schema_diff['added_fields']
+    if (change_type != "ADDITIVE"
+            or contract.get('evolution_policy', 'ADDITIVE_ONLY') != 'ADDITIVE_ONLY'
+            or len(added) > settings.get('max_auto_added_fields', 10)):
+        return None
+    required = set(contract.get('required_fields', []))
+    for entry in added:
+        if ('.' in entry['field'] or '[]' in entry['field'] or entry['field'] in required
+                or not _added_field_types(entry) <= SCALAR_TYPES):
+            return None
+    return {
+        "risk_level": "LOW",
+        "impacts": [f"New optional field '{entry['field']}' ({entry['type']})" for entry in added],
+        "recommendations": ["Add the new columns to the curated table as nullable"],
+        "safe_to_auto_approve": True
+    }
+
+def analyze_impact(schema_diff: Dict, change_type: str, execution_id: str, contract: Dict,
+                   context=None) -> Dict:
+    """Apply local rules and escalate to Bedrock only when none of them match.
+
+    Contracts can switch rules off with impact_rules.disabled (a list of
+    rule function names) and tune them through other impact_rules keys.
+    """
+    disabled = set(contract.get('impact_rules', {}).get('disabled', []))
+    for rule in IMPACT_RULES:
+        if rule.__name__ in disabled:
+            continue
+        impact_analysis = rule(schema_diff, change_type, contract)
+        if impact_analysis is not None:
+            impact_rule_stats['bedrock_calls_avoided'] += 1
+            hits = impact_rule_stats['rule_hits']
+            hits[rule.__name__] = hits.get(rule.__name__, 0) + 1
+            print(f"Impact decided locally by {rule.__name__}")
+            return impact_analysis
+
+    impact_rule_stats['escalations'] += 1
+    return analyze_impact_with_bedrock(schema_diff, change_type, execution_id, contract.get('version', 0), context)
+
+def analyze_impact_with_bedrock(schema_diff: Dict, change_type: str, execution_id: str,
+                                contract_version: Any = 0, context=None) -> Dict:
+    """Use Bedrock for impact analysis, reusing earlier answers for the same diff.
+
+    The call is bounded by the invocation's remaining time and skipped while
+    the circuit breaker is open; both cases return the fallback analysis.
+    With BEDROCK_STREAMING the answer is parsed as it streams, and with
+    BEDROCK_EARLY_DECISION reading stops once the decision fields arrive
+    (the result is then marked partial and not cached).
+    """
+    cache_key = impact_cache_key(schema_diff, change_type, contract_version)
+    cached = impact_cache.get(cache_key)
+    if cached:
+        return cached['value']
+    if IMPACT_BATCH_QUEUE_URL and impact_cache.table_name:
+        return request_batched_impact(cache_key, schema_diff, change_type, contract_version, context)
     try:
         prompt = f"""Analyze schema change impact:
 Change Type: {change_type}
@@ -151,54 +1260,443 @@ Added: {json.dumps(schema_diff['added_fields'])}
 Removed: {json.dumps(schema_diff['removed_fields'])}
 Type Changes: {json.dumps(schema_diff['type_changes'])}
 
-Provide JSON: {{"risk_level": "LOW/MEDIUM/HIGH", "impacts": [], "recommendations": [], "safe_to_auto_approve": true/false}}"""
+Provide JSON: {{"risk_level": "LOW/MEDIUM/HIGH", "safe_to_auto_approve": true/false, "impacts": [], "recommendations": []}}"""
 
-        response = bedrock_runtime.invoke_model(
-            modelId=BEDROCK_MODEL_ID,
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 1000,
-                "messages": [{"role": "user", "content": prompt}]
-            })
-        )
-        
-        result = json.loads(response['body'].read())
-        return json.loads(result['content'][0]['text'])
-    except:
-        return {"risk_level": "MEDIUM", "impacts": [], "recommendations": [], "safe_to_auto_approve": False}
+        body = json.dumps({
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": 1000,
+            "messages": [{"role": "user", "content": prompt}]
+        })
+        if BEDROCK_STREAMING:
+            fields, timing = guarded_call(
+                bedrock_breaker, context, stream_json_fields, bedrock_runtime,
+                decision_fields=DECISION_FIELDS, stop_at_decision=BEDROCK_EARLY_DECISION,
+                modelId=BEDROCK_MODEL_ID, body=body
+            )
+            print(f"Bedrock stream timing: {json.dumps(timing)}")
+            impact_analysis = dict({"impacts": [], "recommendations": []}, **fields)
+            if not timing['complete']:
+                impact_analysis['partial'] = True
+                return impact_analysis
+        else:
+            response = guarded_call(
+                bedrock_breaker, context, invoke_model, bedrock_runtime,
+                modelId=BEDROCK_MODEL_ID, body=body
+            )
+            result = json.loads(response['body'].read())
+            impact_analysis = json.loads(result['content'][0]['text'])
+        impact_cache.put(cache_key, impact_analysis, change_type=change_type)
+        return impact_analysis
+    except Exception as e:
+        print(f"Bedrock impact analysis unavailable, using fallback: {e}")
+        return dict(DEFAULT_IMPACT_ANALYSIS)
+
+def request_batched_impact(cache_key: str, schema_diff: Dict, change_type: str, contract_version: Any,
+                           context=None) -> Dict:
+    """Queue the diff for the impact batcher and wait for its answer in the impact cache.
+
+    Concurrent executions with the same diff share one queued request's
+    answer. Waiting is bounded by IMPACT_BATCH_WAIT_SECONDS and the
+    invocation's remaining time; on timeout the fallback analysis is used.
+    """
+    try:
+        sqs_client.send_message(QueueUrl=IMPACT_BATCH_QUEUE_URL, MessageBody=json.dumps({
+            'diff_key': cache_key,
+            'schema_diff': schema_diff,
+            'change_type': change_type,
+            'contract_version': str(contract_version)
+        }))
+    except ClientError as e:
+        print(f"Could not queue impact analysis, using fallback: {e}")
+        return dict(DEFAULT_IMPACT_ANALYSIS)
+
+    wait_seconds = min(IMPACT_BATCH_WAIT_SECONDS, call_deadline(context))
+    answered = impact_cache.wait_for(cache_key, wait_seconds, IMPACT_BATCH_POLL_SECONDS)
+    if answered:
+        return answered['value']
+    print(f"No batched impact analysis within {wait_seconds:.1f}s, using fallback")
+    return dict(DEFAULT_IMPACT_ANALYSIS)
+
+def batch_impact_handler(event, context):
+    """SQS-triggered handler: analyze distinct queued diffs with one Bedrock call per chunk.
+
+    Results are written to the impact cache, where the waiting analyzer
+    invocations pick them up. Messages whose diff could not be analyzed are
+    reported as batch item failures so SQS redelivers them.
+    """
+    requests = {}
+    message_ids = {}
+    for record in event.get('Records', []):
+        request = json.loads(record['body'])
+        requests.setdefault(request['diff_key'], request)
+        message_ids.setdefault(request['diff_key'], []).append(record['messageId'])
+
+    pending = [request for key, request in requests.items() if not impact_cache.get(key)]
+    print(f"Batching {len(pending)} distinct diffs from {len(event.get('Records', []))} messages")
+
+    failed = []
+    for start in range(0, len(pending), IMPACT_BATCH_MAX_DIFFS):
+        chunk = pending[start:start + IMPACT_BATCH_MAX_DIFFS]
+        try:
+            results = analyze_impact_batch_with_bedrock(chunk, context)
+        except Exception as e:
+            print(f"Batched impact analysis failed: {e}")
+            results = {}
+        for request in chunk:
+            impact_analysis = results.get(request['diff_key'])
+            if impact_analysis is None:
+                failed.extend(message_ids[request['diff_key']])
+                continue
+            impact_cache.put(request['diff_key'], impact_analysis, change_type=request['change_type'])
+
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed]}
+
+def analyze_impact_batch_with_bedrock(requests: List[Dict[str, Any]], context=None) -> Dict[str, Dict]:
+    """Ask Bedrock about several diffs in one prompt and map the answers back by diff_key"""
+    changes = [{
+        'id': index,
+        'change_type': request['change_type'],
+        'added': request['schema_diff']['added_fields'],
+        'removed': request['schema_diff']['removed_fields'],
+        'type_changes': request['schema_diff']['type_changes']
+    } for index, request in enumerate(requests)]
+    prompt = f"""Analyze the impact of each schema change below independently.
+Changes: {json.dumps(changes)}
+
+Provide a JSON array with one object per change, in any order:
+[{{"id": <change id>, "risk_level": "LOW/MEDIUM/HIGH", "safe_to_auto_approve": true/false, "impacts": [], "recommendations": []}}]"""
+
+    response = guarded_call(
+        bedrock_breaker, context, invoke_model, bedrock_runtime,
+        modelId=BEDROCK_MODEL_ID,
+        body=json.dumps({
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": min(IMPACT_BATCH_ANSWER_TOKENS * len(requests), IMPACT_BATCH_MAX_OUTPUT_TOKENS),
+            "messages": [{"role": "user", "content": prompt}]
+        })
+    )
+    result = json.loads(response['body'].read())
+    answers = json.loads(result['content'][0]['text'])
+
+    results = {}
+    for answer in answers:
+        index = answer.pop('id', None)
+        if isinstance(index, int) and 0 <= index < len(requests):
+            results[requests[index]['diff_key']] = answer
+    return results
+
+def store_schema_history(execution_id, incoming_schema, expected_schema, schema_diff, change_type, impact_analysis,
+                         record_count: int = 0, file_count: int = 1):
+    """Store in DynamoDB.
+
+    Every call bumps the aggregated counter for the schema's time bucket;
+    the per-file detail row is written only with HISTORY_PER_FILE_DETAIL.
+    Both use write-sharded partition keys (see history_shard_key).
+    Schemas are written once as content-addressed blobs (SCHEMA_BLOB_TABLE)
+    and referenced by hash; without a blob table they are stored inline.
+    Large attributes are compressed (see encode_attribute); read items back
+    with read_schema_history. Detail rows go through the history_writes
+    buffer and reach DynamoDB when it is flushed.
+    """
+    fingerprint = schema_fingerprint(incoming_schema)
+    record_schema_counter(fingerprint, change_type, execution_id, record_count, file_count)
+    if not HISTORY_PER_FILE_DETAIL:
+        return
 
-def store_schema_history(execution_id, incoming_schema, expected_schema, schema_diff, change_type, impact_analysis):
-    """Store in DynamoDB"""
-    table = dynamodb.Table(SCHEMA_HISTORY_TABLE)
-    schema_id = hashlib.md5(json.dumps(incoming_schema, sort_keys=True).encode()).hexdigest()
     timestamp = int(datetime.utcnow().timestamp() * 1000)
     
-    table.put_item(Item={
-        'schema_id': schema_id,
+    item = {
+        'schema_id': history_shard_key(fingerprint),
         'timestamp': timestamp,
+        'schema_fingerprint': fingerprint,
         'execution_id': execution_id,
         'data_source': 'raw_data',
-        'incoming_schema': json.dumps(incoming_schema),
-        'expected_schema': json.dumps(expected_schema),
-        'schema_diff': json.dumps(schema_diff),
+        'record_count': record_count,
+        'schema_diff': encode_attribute(schema_diff),
         'change_type': change_type,
-        'impact_analysis': json.dumps(impact_analysis),
+        'impact_analysis': encode_attribute(impact_analysis),
         'expiration_time': timestamp + (90 * 24 * 60 * 60)
-    })
+    }
+    if SCHEMA_BLOB_TABLE:
+        item['incoming_schema_ref'] = store_schema_blob(incoming_schema)
+        item['expected_schema_ref'] = store_schema_blob(expected_schema)
+    else:
+        item['incoming_schema'] = encode_attribute(incoming_schema)
+        item['expected_schema'] = encode_attribute(expected_schema)
+    history_writes.put(item)
+
+def history_shard_key(fingerprint: str, prefix: str = '') -> str:
+    """Spread one schema's writes over HISTORY_WRITE_SHARDS partition keys"""
+    if HISTORY_WRITE_SHARDS <= 1:
+        return f"{prefix}{fingerprint}"
+    return f"{prefix}{fingerprint}#{random.randrange(HISTORY_WRITE_SHARDS)}"
+
+def record_schema_counter(fingerprint: str, change_type: str, execution_id: str,
+                          record_count: int = 0, file_count: int = 1):
+    """Atomically add this file to the (schema, time bucket) counter item.
+
+    One small UpdateItem replaces a full history item per file. Counter
+    items live in the history table under 'counter#<fingerprint>#<shard>'
+    with the bucket start as the sort key, and carry no data_source so they
+    stay out of DataSourceIndex.
+    """
+    now = int(time.time())
+    bucket_start = now - now % HISTORY_BUCKET_SECONDS
+    get_table(SCHEMA_HISTORY_TABLE).update_item(
+        Key={
+            'schema_id': history_shard_key(fingerprint, 'counter#'),
+            'timestamp': bucket_start * 1000
+        },
+        UpdateExpression=(
+            'ADD file_count :files, record_count :records '
+            'SET schema_fingerprint = :fingerprint, change_type = :change_type, '
+            'last_execution_id = :execution_id, expiration_time = :expires'
+        ),
+        ExpressionAttributeValues={
+            ':files': file_count,
+            ':records': record_count,
+            ':fingerprint': fingerprint,
+            ':change_type': change_type,
+            ':execution_id': execution_id,
+            ':expires': bucket_start + HISTORY_RETENTION_SECONDS
+        }
+    )
+
+def read_schema_counters(fingerprint: str, since_ms: int = 0) -> Dict[int, Dict[str, Any]]:
+    """Sum the counter shards of one schema per time bucket.
 
-def check_agent_memory(schema_diff: Dict, change_type: str) -> bool:
-    """Check agent memory for auto-approval"""
+    Returns {bucket_start_ms: {file_count, record_count, change_types}}, where
+    change_types splits the bucket's files by the change type each shard recorded.
+    """
+    table = get_table(SCHEMA_HISTORY_TABLE)
+    shards = [f"counter#{fingerprint}"] if HISTORY_WRITE_SHARDS <= 1 else \
+        [f"counter#{fingerprint}#{shard}" for shard in range(HISTORY_WRITE_SHARDS)]
+    buckets = {}
+    for shard_key in shards:
+        params = {
+            'KeyConditionExpression': 'schema_id = :id AND #ts >= :since',
+            'ExpressionAttributeNames': {'#ts': 'timestamp'},
+            'ExpressionAttributeValues': {':id': shard_key, ':since': since_ms}
+        }
+        while True:
+            response = table.query(**params)
+            for item in response['Items']:
+                bucket = buckets.setdefault(int(item['timestamp']),
+                                            {'file_count': 0, 'record_count': 0, 'change_types': {}})
+                bucket['file_count'] += int(item.get('file_count', 0))
+                bucket['record_count'] += int(item.get('record_count', 0))
+                change_type = item.get('change_type', 'UNKNOWN')
+                bucket['change_types'][change_type] = (bucket['change_types'].get(change_type, 0)
+                                                       + int(item.get('file_count', 0)))
+            if 'LastEvaluatedKey' not in response:
+                break
+            params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return buckets
+
+def encode_attribute(value: Any, canonical: str = None) -> Any:
+    """JSON text, or a compressed Binary once the JSON reaches HISTORY_COMPRESS_MIN_BYTES.
+
+    Compressed payloads are prefixed with their codec ('zstd:' when the
+    zstandard package is available, otherwise 'zlib:').
+    """
+    text = canonical or json.dumps(value, sort_keys=True, separators=(',', ':'))
+    if len(text) < HISTORY_COMPRESS_MIN_BYTES:
+        return text
+    raw = text.encode('utf-8')
+    if zstandard:
+        return Binary(b'zstd:' + zstandard.ZstdCompressor(level=3).compress(raw))
+    return Binary(b'zlib:' + zlib.compress(raw, 6))
+
+def decode_attribute(value: Any) -> Any:
+    """Inverse of encode_attribute; plain JSON strings from older items decode too"""
+    if isinstance(value, str):
+        return json.loads(value)
+    data = value.value if isinstance(value, Binary) else bytes(value)
+    codec, _, payload = data.partition(b':')
+    if codec == b'zstd':
+        raw = _require_zstandard().ZstdDecompressor().decompress(payload)
+    elif codec == b'zlib':
+        raw = zlib.decompress(payload)
+    else:
+        raise ValueError(f"Unknown attribute codec {codec!r}")
+    return json.loads(raw.decode('utf-8'))
+
+def store_schema_blob(schema: Dict[str, Any]) -> str:
+    """Write a schema once under the hash of its canonical JSON and return that hash"""
+    canonical = json.dumps(schema, sort_keys=True, separators=(',', ':'))
+    blob_id = hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+    if blob_id in _stored_blobs:
+        return blob_id
+    try:
+        get_table(SCHEMA_BLOB_TABLE).put_item(
+            Item={
+                'blob_id': blob_id,
+                'schema': encode_attribute(schema, canonical),
+                'created_at': datetime.utcnow().isoformat()
+            },
+            ConditionExpression='attribute_not_exists(blob_id)'
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+    _stored_blobs.add(blob_id)
+    return blob_id
+
+def load_schema_blob(blob_id: str) -> Dict[str, Any]:
+    item = get_table(SCHEMA_BLOB_TABLE).get_item(Key={'blob_id': blob_id}).get('Item')
+    if not item:
+        raise KeyError(f"Schema blob {blob_id} not found")
+    return decode_attribute(item['schema'])
+
+def read_schema_history(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Decode a schema history item: resolve schema refs and decompress attributes"""
+    decoded = dict(item)
+    for name in ('incoming_schema', 'expected_schema'):
+        if f'{name}_ref' in item:
+            decoded[name] = load_schema_blob(decoded.pop(f'{name}_ref'))
+    for name in ('incoming_schema', 'expected_schema', 'schema_diff', 'impact_analysis'):
+        if name in decoded and not isinstance(decoded[name], dict):
+            decoded[name] = decode_attribute(decoded[name])
+    return decoded
+
+class PatternIndex:
+    """In-memory set of schema patterns that agent memory has approved.
+
+    Loaded with one DecisionIndex query on the first check after a cold
+    start and refreshed incrementally: later queries only return approvals
+    from overlap_seconds before the newest decision_timestamp already seen
+    onwards. The overlap re-reads recent approvals, because DecisionIndex is
+    eventually consistent and decisions are stamped by the writer's clock,
+    so an approval can show up after a newer one was read; re-reads are
+    harmless since patterns is a set. An approval that becomes visible more
+    than overlap_seconds behind the watermark is still missed. A pattern
+    missing from the set is answered locally; a pattern in it is confirmed
+    against SchemaPatternIndex, which still decides. Approvals newer than
+    the last refresh are missed for up to refresh_seconds. While the index
+    cannot be loaded every pattern is treated as a possible positive.
+    """
+
+    def __init__(self, table_name: str, refresh_seconds: int, overlap_seconds: int = 0):
+        self.table_name = table_name
+        self.refresh_seconds = refresh_seconds
+        self.overlap_seconds = overlap_seconds
+        self.lock = threading.Lock()
+        self.patterns = set()
+        self.watermark = None
+        self.refreshed_at = None
+        self.refreshes = 0
+        self.local_answers = 0
+        self.confirm_queries = 0
+
+    def might_be_approved(self, pattern: str) -> bool:
+        if self.refresh_seconds <= 0:
+            return True
+        with self.lock:
+            if self.refreshed_at is None or time.monotonic() - self.refreshed_at >= self.refresh_seconds:
+                try:
+                    self._refresh()
+                except ClientError as e:
+                    print(f"Pattern index refresh from {self.table_name} failed: {e}")
+            if self.refreshed_at is None:
+                return True
+            if pattern in self.patterns:
+                self.confirm_queries += 1
+                return True
+            self.local_answers += 1
+            return False
+
+    def _refresh(self):
+        condition = Key('decision').eq('APPROVED')
+        if self.watermark is not None:
+            condition = condition & Key('decision_timestamp').gte(self.watermark - self.overlap_seconds * 1000)
+        request = {'IndexName': 'DecisionIndex', 'KeyConditionExpression': condition,
+                   'ProjectionExpression': 'schema_pattern, decision_timestamp'}
+        while True:
+            response = get_table(self.table_name).query(**request)
+            for item in response['Items']:
+                if 'schema_pattern' in item:
+                    self.patterns.add(item['schema_pattern'])
+                if self.watermark is None or item['decision_timestamp'] > self.watermark:
+                    self.watermark = item['decision_timestamp']
+            if 'LastEvaluatedKey' not in response:
+                break
+            request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        self.refreshed_at = time.monotonic()
+        self.refreshes += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'patterns': len(self.patterns),
+            'refreshes': self.refreshes,
+            'local_answers': self.local_answers,
+            'confirm_queries': self.confirm_queries
+        }
+
+memory_index = PatternIndex(AGENT_MEMORY_TABLE, MEMORY_INDEX_REFRESH_SECONDS, MEMORY_INDEX_OVERLAP_SECONDS)
+memory_decisions = {'checks': 0, 'auto_approvals': 0, 'approval_wait_saved_seconds': 0.0}
+
+def schema_change_pattern(schema_diff: Dict, contract: Dict) -> tuple:
+    """Generalize a diff into a field-name-free pattern and its hash.
+
+    Each change becomes a descriptor such as 'added:top:string:optional'
+    (kind, position, types, requiredness). Descriptors are de-duplicated and
+    sorted, so adding any optional top-level string field, or several,
+    yields the same pattern as earlier decisions of that kind.
+    """
+    required = set(contract.get('required_fields', []))
+
+    def position(field: str) -> str:
+        return 'array' if '[]' in field else 'nested' if '.' in field else 'top'
+
+    def requiredness(field: str) -> str:
+        return 'required' if field in required else 'optional'
+
+    descriptors = set()
+    for kind, entries in (('added', schema_diff['added_fields']), ('removed', schema_diff['removed_fields'])):
+        for entry in entries:
+            types = '|'.join(sorted(_added_field_types(entry)))
+            descriptors.add(f"{kind}:{position(entry['field'])}:{types}:{requiredness(entry['field'])}")
+    for entry in schema_diff['type_changes']:
+        descriptors.add(f"retyped:{position(entry['field'])}:{entry['expected_type']}->{entry['incoming_type']}:"
+                        f"{requiredness(entry['field'])}")
+    descriptors = sorted(descriptors)
+    return hashlib.md5(json.dumps(descriptors).encode()).hexdigest(), descriptors
+
+def check_agent_memory(schema_pattern: str, change_type: str) -> bool:
+    """Auto-approve ADDITIVE changes whose pattern was last decided APPROVED.
+
+    Decisions are recorded by contract_generator's record_decision action;
+    each auto-approval counts the approval wait stored with that decision
+    as wall-clock time saved.
+    """
     if change_type != "ADDITIVE":
         return False
+    memory_decisions['checks'] += 1
     try:
-        table = dynamodb.Table(AGENT_MEMORY_TABLE)
-        pattern = hashlib.md5(json.dumps(schema_diff, sort_keys=True).encode()).hexdigest()
+        if not memory_index.might_be_approved(schema_pattern):
+            return False
+        table = get_table(AGENT_MEMORY_TABLE)
         response = table.query(
             IndexName='SchemaPatternIndex',
             KeyConditionExpression='schema_pattern = :pattern',
-            ExpressionAttributeValues={':pattern': pattern},
+            ExpressionAttributeValues={':pattern': schema_pattern},
+            ScanIndexForward=False,
             Limit=1
         )
-        return bool(response['Items'] and response['Items'][0].get('decision') == 'APPROVED')
+        latest = response['Items'][0] if response['Items'] else {}
+        if latest.get('decision') != 'APPROVED':
+            return False
+        memory_decisions['auto_approvals'] += 1
+        memory_decisions['approval_wait_saved_seconds'] += float(latest.get('approval_wait_seconds', 0))
+        return True
     except:
         return False
+
+def agent_memory_stats() -> Dict[str, Any]:
+    checks = memory_decisions['checks']
+    return {
+        'checks': checks,
+        'auto_approvals': memory_decisions['auto_approvals'],
+        'auto_approve_rate': round(memory_decisions['auto_approvals'] / checks, 4) if checks else 0.0,
+        'approval_wait_saved_seconds': round(memory_decisions['approval_wait_saved_seconds'], 1)
+    }
@@ -0,0 +1,150 @@
+"""
+Write Buffer
+Write-behind buffering for DynamoDB puts, shared by the agents.
+Items are collected and written with batch_write_item (25 per request),
+flushed when the buffer fills, when its oldest item gets too old, or when
+the Lambda handler returns. Unprocessed items are retried with exponential
+backoff and jitter; items that still cannot be written stay buffered.
+Buffering only pays off where one invocation writes several items (e.g. the
+analyzer's batch mode).
+"""
+
+import functools
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List
+
+BATCH_WRITE_MAX_ITEMS = 25
+WRITE_BUFFER_MAX_ITEMS = int(os.environ.get('WRITE_BUFFER_MAX_ITEMS', '25'))
+WRITE_BUFFER_MAX_AGE_SECONDS = float(os.environ.get('WRITE_BUFFER_MAX_AGE_SECONDS', '2'))
+WRITE_BUFFER_MAX_ATTEMPTS = int(os.environ.get('WRITE_BUFFER_MAX_ATTEMPTS', '8'))
+WRITE_BUFFER_BASE_DELAY_SECONDS = float(os.environ.get('WRITE_BUFFER_BASE_DELAY_SECONDS', '0.05'))
+
+class UnprocessedItemsError(Exception):
+    """Items were still unprocessed after every retry (they are in .items)"""
+
+    def __init__(self, message: str, items: List[Dict[str, Any]]):
+        super().__init__(message)
+        self.items = items
+
+class WriteBuffer:
+    """Buffered PutRequests for one table.
+
+    put() never blocks on DynamoDB unless it triggers a flush. Items with
+    the same key (key_names) in one flush are collapsed, last write wins,
+    because batch_write_item rejects duplicate keys in a request.
+    """
+
+    def __init__(self, dynamodb, table_name: str, key_names: Iterable[str] = (),
+                 max_items: int = WRITE_BUFFER_MAX_ITEMS, max_age_seconds: float = WRITE_BUFFER_MAX_AGE_SECONDS,
+                 max_attempts: int = WRITE_BUFFER_MAX_ATTEMPTS,
+                 base_delay_seconds: float = WRITE_BUFFER_BASE_DELAY_SECONDS):
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.key_names = tuple(key_names)
+        self.max_items = max_items
+        self.max_age_seconds = max_age_seconds
+        self.max_attempts = max_attempts
+        self.base_delay_seconds = base_delay_seconds
+        self.lock = threading.Lock()
+        self.items = []
+        self.oldest = None
+        self.requests = 0
+        self.items_written = 0
+        self.retries = 0
+
+    def put(self, item: Dict[str, Any]):
+        with self.lock:
+            if not self.items:
+                self.oldest = time.monotonic()
+            self.items.append(item)
+            due = (len(self.items) >= self.max_items
+                   or time.monotonic() - self.oldest >= self.max_age_seconds)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far.
+
+        If a request fails or retries run out, the items not yet written go
+        back into the buffer (for the next flush) and the error is re-raised.
+        """
+        with self.lock:
+            items, self.items = self.items, []
+            oldest, self.oldest = self.oldest, None
+        if not items:
+            return
+        if self.key_names:
+            items = list({tuple(item[name] for name in self.key_names): item for item in items}.values())
+        for start in range(0, len(items), BATCH_WRITE_MAX_ITEMS):
+            chunk = items[start:start + BATCH_WRITE_MAX_ITEMS]
+            try:
+                self._write([{'PutRequest': {'Item': item}} for item in chunk])
+            except UnprocessedItemsError as e:
+                self._requeue(e.items + items[start + BATCH_WRITE_MAX_ITEMS:], oldest)
+                raise
+            except Exception:
+                self._requeue(items[start:], oldest)
+                raise
+
+    def _requeue(self, items: List[Dict[str, Any]], oldest: float):
+        """Put unwritten items back ahead of anything buffered since the flush started"""
+        with self.lock:
+            self.items = items + self.items
+            self.oldest = oldest if oldest is not None else time.monotonic()
+
+    def _write(self, requests: List[Dict[str, Any]]):
+        pending = requests
+        for attempt in range(self.max_attempts):
+            if attempt:
+                with self.lock:
+                    self.retries += 1
+                # Full jitter keeps concurrent writers from retrying in lockstep
+                time.sleep(random.uniform(0, self.base_delay_seconds * 2 ** attempt))
+            response = self.dynamodb.batch_write_item(RequestItems={self.table_name: pending})
+            unprocessed = response.get('UnprocessedItems', {}).get(self.table_name, [])
+            with self.lock:
+                self.requests += 1
+                self.items_written += len(pending) - len(unprocessed)
+            if not unprocessed:
+                return
+            pending = unprocessed
+        raise UnprocessedItemsError(
+            f"{len(pending)} items for {self.table_name} still unprocessed after {self.max_attempts} attempts",
+            [request['PutRequest']['Item'] for request in pending]
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'items_written': self.items_written,
+            'items_per_request': round(self.items_written / self.requests, 2) if self.requests else 0.0,
+            'retries': self.retries,
+            'buffered': len(self.items)
+        }
+
+def flush_on_exit(*buffers: WriteBuffer) -> Callable:
+    """Decorate a Lambda handler so its buffers are flushed before it returns or raises.
+
+    A flush failure fails a handler that succeeded; when the handler itself
+    raised, flush failures are only logged so its original error propagates.
+    """
+    def decorate(handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            try:
+                result = handler(event, context)
+            except Exception:
+                for buffer in buffers:
+                    try:
+                        buffer.flush()
+                    except Exception as e:
+                        print(f"Could not flush {buffer.table_name} after a handler error: {e}")
+                raise
+            for buffer in buffers:
+                buffer.flush()
+            return result
+        return wrapper
+    return decorate
@@ -26,6 +26,36 @@ args = getResolvedOptions(sys.argv, [
     'EXECUTION_ID'
 ])
 
+# Optional: force a codec for raw objects that carry no .gz/.bz2 extension
+# (Spark already inflates gzip and bzip2 by file extension). zstd objects are
+# always passed as 'zstd' and inflated with the zstandard module, installed
+# through --additional-python-modules. The orchestrator passes the codec the
+# schema analyzer detected for S3_INPUT_PATH; batch manifests carry it per path.
+RAW_COMPRESSION = (
+    getResolvedOptions(sys.argv, ['RAW_COMPRESSION'])['RAW_COMPRESSION']
+    if '--RAW_COMPRESSION' in sys.argv else ''
+)
+
+# Optional: read only the given objects instead of the whole raw data/ prefix.
+# INPUT_MANIFEST is a JSON manifest of paths written by the ETL batcher;
+# S3_INPUT_PATH is the single object of a per-file run.
+INPUT_MANIFEST = (
+    getResolvedOptions(sys.argv, ['INPUT_MANIFEST'])['INPUT_MANIFEST']
+    if '--INPUT_MANIFEST' in sys.argv else ''
+)
+S3_INPUT_PATH = (
+    getResolvedOptions(sys.argv, ['S3_INPUT_PATH'])['S3_INPUT_PATH']
+    if '--S3_INPUT_PATH' in sys.argv else ''
+)
+
+# Optional: the contract version the input was analyzed (or approved) against.
+# Batched and staging runs pin it so a contract published meanwhile is not
+# applied to files it was not checked for; '' or '0' means the latest.
+CONTRACT_VERSION = (
+    getResolvedOptions(sys.argv, ['CONTRACT_VERSION'])['CONTRACT_VERSION']
+    if '--CONTRACT_VERSION' in sys.argv else ''
+)
+
 sc = SparkContext()
 glueContext = GlueContext(sc)
 spark = glueContext.spark_session
@@ -34,26 +64,104 @@ job.init(args['JOB_NAME'], args)
 
 s3_client = boto3.client('s3')
 
+CONTRACT_MANIFEST_KEY = 'latest.json'
+
 def get_current_contract():
-    """Retrieve current data contract"""
+    """Retrieve the pinned data contract version, or the current one"""
+    if CONTRACT_VERSION not in ('', '0'):
+        key = f"contract_v{CONTRACT_VERSION}.json"
+        contract = read_contract_object(key)
+        if contract is None:
+            raise ValueError(f"Pinned contract {key} not found in {args['CONTRACTS_BUCKET']}")
+        return contract
     try:
-        response = s3_client.list_objects_v2(
-            Bucket=args['CONTRACTS_BUCKET'],
-            Prefix='contract_v'
-        )
-        if 'Contents' not in response:
+        # One GET via the manifest kept by the contract generator; list only for older buckets
+        manifest = read_contract_object(CONTRACT_MANIFEST_KEY)
+        key = manifest['key'] if manifest else find_latest_contract_key()
+        if not key:
             return None
-        
-        latest = sorted(response['Contents'], key=lambda x: x['LastModified'], reverse=True)[0]
-        contract_response = s3_client.get_object(
-            Bucket=args['CONTRACTS_BUCKET'],
-            Key=latest['Key']
-        )
-        return json.loads(contract_response['Body'].read().decode('utf-8'))
+        return read_contract_object(key)
     except Exception as e:
         print(f"Error loading contract: {str(e)}")
         return None
 
+def read_contract_object(key):
+    """Load a JSON object from the contracts bucket, or None if it does not exist"""
+    try:
+        response = s3_client.get_object(Bucket=args['CONTRACTS_BUCKET'], Key=key)
+    except s3_client.exceptions.NoSuchKey:
+        return None
+    return json.loads(response['Body'].read().decode('utf-8'))
+
+def find_latest_contract_key():
+    """Newest contract_v* key across all listing pages"""
+    latest = None
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=args['CONTRACTS_BUCKET'], Prefix='contract_v'):
+        for obj in page.get('Contents', []):
+            if latest is None or obj['LastModified'] > latest['LastModified']:
+                latest = obj
+    return latest['Key'] if latest else None
+
+def input_paths():
+    """Paths to read, grouped by the codec the read must be told about ('' for none).
+
+    Sources: the batch manifest (with its per-path codecs), the single input
+    object, or the whole raw prefix.
+    """
+    if INPUT_MANIFEST:
+        bucket, key = INPUT_MANIFEST[len("s3://"):].split("/", 1)
+        manifest = json.loads(s3_client.get_object(Bucket=bucket, Key=key)['Body'].read().decode('utf-8'))
+        compression = manifest.get('compression', {})
+        groups = {}
+        for path in manifest['paths']:
+            groups.setdefault(compression.get(path, ''), []).append(path)
+        return groups
+    if S3_INPUT_PATH:
+        return {RAW_COMPRESSION: [S3_INPUT_PATH]}
+    return {RAW_COMPRESSION: [f"s3://{args['RAW_BUCKET']}/data/"]}
+
+def raw_connection_options(raw_paths, compression=''):
+    """S3 connection options for the raw read, including an explicit codec if given"""
+    options = {
+        "paths": raw_paths,
+        "recurse": True
+    }
+    if compression:
+        options["compression"] = {"gz": "gzip", "bz2": "bzip2"}.get(compression, compression)
+    return options
+
+def read_zstd(raw_paths):
+    """Read zstd-compressed JSON lines objects, inflating them on the executors"""
+    def inflate(path_and_body):
+        import io
+        import zstandard
+        reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(path_and_body[1]), read_across_frames=True)
+        return reader.readall().decode('utf-8').splitlines()
+
+    lines = sc.binaryFiles(",".join(raw_paths)).flatMap(inflate).filter(lambda line: line.strip())
+    return DynamicFrame.fromDF(spark.read.json(lines), glueContext, "raw_data_zstd")
+
+def read_raw(groups):
+    """Read each codec group of raw paths and union them into one frame"""
+    frames = [
+        read_zstd(paths) if compression == 'zstd' else
+        glueContext.create_dynamic_frame.from_options(
+            format_options={"multiline": False},
+            connection_type="s3",
+            format="json",
+            connection_options=raw_connection_options(paths, compression),
+            transformation_ctx=f"raw_data_{compression}" if compression else "raw_data"
+        )
+        for compression, paths in groups.items()
+    ]
+    if len(frames) == 1:
+        return frames[0]
+    df = frames[0].toDF()
+    for frame in frames[1:]:
+        df = df.unionByName(frame.toDF(), allowMissingColumns=True)
+    return DynamicFrame.fromDF(df, glueContext, "raw_data_union")
+
 def apply_schema_mapping(dynamic_frame, contract):
     """Apply schema mapping based on contract"""
     if not contract:
@@ -112,19 +220,11 @@ def main():
         print(f"Loaded contract version: {contract.get('version') if contract else 'None'}")
         
         # Read raw data using DynamicFrame (schema-flexible)
-        raw_path = f"s3://{args['RAW_BUCKET']}/data/"
-        print(f"Reading from: {raw_path}")
+        raw_groups = input_paths()
+        for compression, paths in raw_groups.items():
+            print(f"Reading {len(paths)} path(s) ({compression or 'codec by extension'}), first: {paths[0]}")
         
-        dynamic_frame = glueContext.create_dynamic_frame.from_options(
-            format_options={"multiline": False},
-            connection_type="s3",
-            format="json",
-            connection_options={
-                "paths": [raw_path],
-                "recurse": True
-            },
-            transformation_ctx="raw_data"
-        )
+        dynamic_frame = read_raw(raw_groups)
         
         print(f"Raw record count: {dynamic_frame.count()}")
         
@@ -13,12 +13,35 @@ data "aws_region" "current" {
   # Gets current AWS region
 }
 
+# Agent dependency layer, built by terraform_data.agent_dependencies
+data "archive_file" "agent_dependencies" {
+  type        = "zip"
+  source_dir  = local.agent_dependencies_dir
+  output_path = "${path.module}/../agents/agent_dependencies.zip"
+
+  depends_on = [terraform_data.agent_dependencies]
+}
+
 # Archive Lambda functions for deployment
 # This creates zip files from Python code automatically
 data "archive_file" "schema_analyzer" {
   type        = "zip"
-  source_file = "${path.module}/../agents/schema_analyzer.py"
   output_path = "${path.module}/../agents/schema_analyzer.zip"
+
+  source {
+    content  = file("${path.module}/../agents/schema_analyzer.py")
+    filename = "schema_analyzer.py"
+  }
+
+  source {
+    content  = file("${path.module}/../agents/bedrock_guard.py")
+    filename = "bedrock_guard.py"
+  }
+
+  source {
+    content  = file("${path.module}/../agents/write_buffer.py")
+    filename = "write_buffer.py"
+  }
 }
 
 data "archive_file" "contract_generator" {
@@ -29,8 +52,23 @@ data "archive_file" "contract_generator" {
 
 data "archive_file" "etl_patch_agent" {
   type        = "zip"
-  source_file = "${path.module}/../agents/etl_patch_agent.py"
   output_path = "${path.module}/../agents/etl_patch_agent.zip"
+
+  source {
+    content  = file("${path.module}/../agents/etl_patch_agent.py")
+    filename = "etl_patch_agent.py"
+  }
+
+  source {
+    content  = file("${path.module}/../agents/bedrock_guard.py")
+    filename = "bedrock_guard.py"
+  }
+}
+
+data "archive_file" "etl_batcher" {
+  type        = "zip"
+  source_file = "${path.module}/../agents/etl_batcher.py"
+  output_path = "${path.module}/../agents/etl_batcher.zip"
 }
 
 data "archive_file" "staging_validator" {
@@ -46,6 +46,77 @@ resource "aws_dynamodb_table" "schema_history" {
   )
 }
 
+# Schema blob table - content-addressed schemas referenced by schema history rows
+resource "aws_dynamodb_table" "schema_blobs" {
+  name           = "${local.resource_prefix}-schema-blobs"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "blob_id"
+
+  attribute {
+    name = "blob_id"
+    type = "S"
+  }
+
+  point_in_time_recovery {
+    enabled = var.enable_point_in_time_recovery
+  }
+
+  tags = merge(
+    local.common_tags,
+    {
+      Name = "SchemaGuard Schema Blobs"
+    }
+  )
+}
+
+# Schema fingerprint table - caches analysis results per (schema fingerprint, contract version)
+resource "aws_dynamodb_table" "schema_fingerprints" {
+  name           = "${local.resource_prefix}-schema-fingerprints"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "fingerprint_key"
+
+  attribute {
+    name = "fingerprint_key"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expiration_time"
+    enabled        = true
+  }
+
+  tags = merge(
+    local.common_tags,
+    {
+      Name = "SchemaGuard Schema Fingerprints"
+    }
+  )
+}
+
+# Impact cache table - reuses Bedrock impact analyses for identical schema diffs
+resource "aws_dynamodb_table" "impact_cache" {
+  name           = "${local.resource_prefix}-impact-cache"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "diff_key"
+
+  attribute {
+    name = "diff_key"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expiration_time"
+    enabled        = true
+  }
+
+  tags = merge(
+    local.common_tags,
+    {
+      Name = "SchemaGuard Impact Cache"
+    }
+  )
+}
+
 # Contract approvals table - tracks human approval decisions
 resource "aws_dynamodb_table" "contract_approvals" {
   name           = "${local.resource_prefix}-contract-approvals"
@@ -53,6 +124,10 @@ resource "aws_dynamodb_table" "contract_approvals" {
   hash_key       = "contract_id"
   range_key      = "version"
 
+  # Decisions stream to the approval handler, which resumes the waiting workflow
+  stream_enabled   = true
+  stream_view_type = "NEW_AND_OLD_IMAGES"
+
   attribute {
     name = "contract_id"
     type = "S"
@@ -109,6 +184,11 @@ resource "aws_dynamodb_table" "agent_memory" {
     type = "S"
   }
 
+  attribute {
+    name = "decision"
+    type = "S"
+  }
+
   global_secondary_index {
     name            = "SchemaPatternIndex"
     hash_key        = "schema_pattern"
@@ -116,6 +196,15 @@ resource "aws_dynamodb_table" "agent_memory" {
     projection_type = "ALL"
   }
 
+  # Lets the analyzer's pattern index load approvals newer than its watermark without scanning
+  global_secondary_index {
+    name               = "DecisionIndex"
+    hash_key           = "decision"
+    range_key          = "decision_timestamp"
+    projection_type    = "INCLUDE"
+    non_key_attributes = ["schema_pattern"]
+  }
+
   point_in_time_recovery {
     enabled = var.enable_point_in_time_recovery
   }
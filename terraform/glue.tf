@@ -35,6 +35,7 @@ resource "aws_glue_job" "etl_job" {
     "--SCHEMA_HISTORY_TABLE"             = aws_dynamodb_table.schema_history.name
     "--DATABASE_NAME"                    = aws_glue_catalog_database.schemaguard.name
     "--ENVIRONMENT"                      = var.environment
+    "--additional-python-modules"        = "zstandard==0.22.0"
   }
 
   glue_version      = "4.0"
@@ -42,6 +42,13 @@ resource "aws_iam_role_policy" "glue_job" {
           "${aws_s3_bucket.scripts.arn}/*"
         ]
       },
+      {
+        Effect = "Allow"
+        Action = [
+          "s3:GetObject"
+        ]
+        Resource = "${aws_s3_bucket.contracts.arn}/*"
+      },
       {
         Effect = "Allow"
         Action = [
@@ -52,7 +59,8 @@ resource "aws_iam_role_policy" "glue_job" {
           aws_s3_bucket.staging.arn,
           aws_s3_bucket.curated.arn,
           aws_s3_bucket.quarantine.arn,
-          aws_s3_bucket.scripts.arn
+          aws_s3_bucket.scripts.arn,
+          aws_s3_bucket.contracts.arn
         ]
       },
       {
@@ -126,9 +134,40 @@ resource "aws_iam_role_policy" "step_functions" {
           aws_lambda_function.schema_analyzer.arn,
           aws_lambda_function.contract_generator.arn,
           aws_lambda_function.etl_patch_agent.arn,
-          aws_lambda_function.staging_validator.arn
+          aws_lambda_function.staging_validator.arn,
+          aws_lambda_function.etl_batcher.arn
         ]
       },
+      {
+        Effect = "Allow"
+        Action = [
+          "states:StartExecution"
+        ]
+        Resource = local.bulk_state_machine_arn
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "states:DescribeExecution",
+          "states:StopExecution"
+        ]
+        Resource = local.bulk_state_machine_executions
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "s3:ListBucket"
+        ]
+        Resource = aws_s3_bucket.raw.arn
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "s3:GetObject",
+          "s3:PutObject"
+        ]
+        Resource = "${aws_s3_bucket.raw.arn}/*"
+      },
       {
         Effect = "Allow"
         Action = [
@@ -138,6 +177,13 @@ resource "aws_iam_role_policy" "step_functions" {
         ]
         Resource = aws_glue_job.etl_job.arn
       },
+      {
+        Effect = "Allow"
+        Action = [
+          "sqs:SendMessage"
+        ]
+        Resource = aws_sqs_queue.etl_batch.arn
+      },
       {
         Effect = "Allow"
         Action = [
@@ -225,6 +271,13 @@ resource "aws_iam_role_policy" "lambda_agent" {
           "${aws_s3_bucket.quarantine.arn}/*"
         ]
       },
+      {
+        Effect = "Allow"
+        Action = [
+          "s3:ListBucket"
+        ]
+        Resource = aws_s3_bucket.contracts.arn
+      },
       {
         Effect = "Allow"
         Action = [
@@ -232,12 +285,16 @@ resource "aws_iam_role_policy" "lambda_agent" {
           "dynamodb:PutItem",
           "dynamodb:UpdateItem",
           "dynamodb:Query",
-          "dynamodb:Scan"
+          "dynamodb:BatchWriteItem"
         ]
         Resource = [
           aws_dynamodb_table.schema_history.arn,
           aws_dynamodb_table.contract_approvals.arn,
           aws_dynamodb_table.agent_memory.arn,
+          aws_dynamodb_table.schema_blobs.arn,
+          aws_dynamodb_table.schema_fingerprints.arn,
+          aws_dynamodb_table.impact_cache.arn,
+          aws_dynamodb_table.execution_state.arn,
           "${aws_dynamodb_table.schema_history.arn}/index/*",
           "${aws_dynamodb_table.contract_approvals.arn}/index/*",
           "${aws_dynamodb_table.agent_memory.arn}/index/*"
@@ -246,7 +303,54 @@ resource "aws_iam_role_policy" "lambda_agent" {
       {
         Effect = "Allow"
         Action = [
-          "bedrock:InvokeModel"
+          "sqs:SendMessage",
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:GetQueueAttributes"
+        ]
+        Resource = [
+          aws_sqs_queue.impact_batch.arn,
+          aws_sqs_queue.etl_batch.arn
+        ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "glue:StartJobRun",
+          "glue:GetJobRun"
+        ]
+        Resource = aws_glue_job.etl_job.arn
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:DescribeStream",
+          "dynamodb:GetRecords",
+          "dynamodb:GetShardIterator",
+          "dynamodb:ListStreams"
+        ]
+        Resource = "${aws_dynamodb_table.contract_approvals.arn}/stream/*"
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "states:SendTaskSuccess",
+          "states:SendTaskFailure"
+        ]
+        Resource = aws_sfn_state_machine.schemaguard_orchestrator.arn
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "sns:Publish"
+        ]
+        Resource = aws_sns_topic.schema_drift_alerts.arn
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "bedrock:InvokeModel",
+          "bedrock:InvokeModelWithResponseStream"
         ]
         Resource = "arn:${local.partition}:bedrock:${var.aws_region}::foundation-model/${var.bedrock_model_id}"
       },
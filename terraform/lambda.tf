@@ -1,6 +1,37 @@
 # Lambda functions for agent components
 # Using archive_file data source for automatic packaging (low-code approach)
 
+# Agent dependencies (agents/requirements.txt) as a Lambda layer. The runtime's
+# bundled boto3 predates conditional S3 writes (IfMatch/IfNoneMatch on the
+# contract manifest) and there is no zstandard, so both are installed for the
+# Lambda platform at apply time. Rebuilt when requirements.txt changes or the
+# build directory is missing (e.g. a fresh checkout).
+resource "terraform_data" "agent_dependencies" {
+  triggers_replace = [
+    filemd5("${path.module}/../agents/requirements.txt"),
+    local.lambda_runtime,
+    fileexists("${local.agent_dependencies_dir}/python/boto3/__init__.py") ? "built" : timestamp()
+  ]
+
+  provisioner "local-exec" {
+    command = <<-EOT
+      rm -rf "${local.agent_dependencies_dir}"
+      python3 -m pip install --quiet --upgrade \
+        --requirement "${path.module}/../agents/requirements.txt" \
+        --target "${local.agent_dependencies_dir}/python" \
+        --platform manylinux2014_x86_64 --implementation cp \
+        --python-version ${trimprefix(local.lambda_runtime, "python")} --only-binary=:all:
+    EOT
+  }
+}
+
+resource "aws_lambda_layer_version" "agent_dependencies" {
+  layer_name          = "${local.resource_prefix}-agent-dependencies"
+  filename            = data.archive_file.agent_dependencies.output_path
+  source_code_hash    = data.archive_file.agent_dependencies.output_base64sha256
+  compatible_runtimes = [local.lambda_runtime]
+}
+
 # Schema Analyzer Lambda
 resource "aws_lambda_function" "schema_analyzer" {
   filename         = data.archive_file.schema_analyzer.output_path
@@ -9,16 +40,22 @@ resource "aws_lambda_function" "schema_analyzer" {
   handler         = "schema_analyzer.lambda_handler"
   source_code_hash = data.archive_file.schema_analyzer.output_base64sha256
   runtime         = local.lambda_runtime
+  layers          = [aws_lambda_layer_version.agent_dependencies.arn]
   timeout         = local.lambda_timeout
   memory_size     = local.lambda_memory_size
 
   environment {
     variables = {
-      SCHEMA_HISTORY_TABLE = aws_dynamodb_table.schema_history.name
-      AGENT_MEMORY_TABLE   = aws_dynamodb_table.agent_memory.name
-      CONTRACTS_BUCKET     = aws_s3_bucket.contracts.id
-      BEDROCK_MODEL_ID     = var.bedrock_model_id
-      ENVIRONMENT          = var.environment
+      SCHEMA_HISTORY_TABLE     = aws_dynamodb_table.schema_history.name
+      SCHEMA_BLOB_TABLE        = aws_dynamodb_table.schema_blobs.name
+      AGENT_MEMORY_TABLE       = aws_dynamodb_table.agent_memory.name
+      SCHEMA_FINGERPRINT_TABLE = aws_dynamodb_table.schema_fingerprints.name
+      IMPACT_CACHE_TABLE       = aws_dynamodb_table.impact_cache.name
+      IMPACT_BATCH_QUEUE_URL   = var.enable_impact_batching ? aws_sqs_queue.impact_batch.url : ""
+      CONTRACTS_BUCKET         = aws_s3_bucket.contracts.id
+      BEDROCK_MODEL_ID         = var.bedrock_model_id
+      STREAMING_INFERENCE      = "true"
+      ENVIRONMENT              = var.environment
     }
   }
 
@@ -39,13 +76,16 @@ resource "aws_lambda_function" "contract_generator" {
   handler         = "contract_generator.lambda_handler"
   source_code_hash = data.archive_file.contract_generator.output_base64sha256
   runtime         = local.lambda_runtime
+  layers          = [aws_lambda_layer_version.agent_dependencies.arn]
   timeout         = local.lambda_timeout
   memory_size     = local.lambda_memory_size
 
   environment {
     variables = {
       CONTRACT_APPROVALS_TABLE = aws_dynamodb_table.contract_approvals.name
+      AGENT_MEMORY_TABLE       = aws_dynamodb_table.agent_memory.name
       CONTRACTS_BUCKET         = aws_s3_bucket.contracts.id
+      SNS_TOPIC_ARN            = aws_sns_topic.schema_drift_alerts.arn
       BEDROCK_MODEL_ID         = var.bedrock_model_id
       ENVIRONMENT              = var.environment
     }
@@ -68,6 +108,7 @@ resource "aws_lambda_function" "etl_patch_agent" {
   handler         = "etl_patch_agent.lambda_handler"
   source_code_hash = data.archive_file.etl_patch_agent.output_base64sha256
   runtime         = local.lambda_runtime
+  layers          = [aws_lambda_layer_version.agent_dependencies.arn]
   timeout         = local.lambda_timeout
   memory_size     = local.lambda_memory_size
 
@@ -96,6 +137,7 @@ resource "aws_lambda_function" "staging_validator" {
   handler         = "staging_validator.lambda_handler"
   source_code_hash = data.archive_file.staging_validator.output_base64sha256
   runtime         = local.lambda_runtime
+  layers          = [aws_lambda_layer_version.agent_dependencies.arn]
   timeout         = 600  # Longer timeout for Athena queries
   memory_size     = 1024  # More memory for data processing
 
@@ -118,6 +160,194 @@ resource "aws_lambda_function" "staging_validator" {
   )
 }
 
+# Impact Batcher Lambda - same package as the analyzer, drains the impact batch queue
+resource "aws_lambda_function" "impact_batcher" {
+  filename         = data.archive_file.schema_analyzer.output_path
+  function_name    = local.lambda_names.impact_batcher
+  role            = aws_iam_role.lambda_agent.arn
+  handler         = "schema_analyzer.batch_impact_handler"
+  source_code_hash = data.archive_file.schema_analyzer.output_base64sha256
+  runtime         = local.lambda_runtime
+  layers          = [aws_lambda_layer_version.agent_dependencies.arn]
+  timeout         = local.lambda_timeout
+  memory_size     = local.lambda_memory_size
+
+  environment {
+    variables = {
+      SCHEMA_HISTORY_TABLE = aws_dynamodb_table.schema_history.name
+      AGENT_MEMORY_TABLE   = aws_dynamodb_table.agent_memory.name
+      IMPACT_CACHE_TABLE   = aws_dynamodb_table.impact_cache.name
+      CONTRACTS_BUCKET     = aws_s3_bucket.contracts.id
+      BEDROCK_MODEL_ID     = var.bedrock_model_id
+      ENVIRONMENT          = var.environment
+    }
+  }
+
+  tags = merge(
+    local.common_tags,
+    {
+      Name = "SchemaGuard Impact Batcher"
+      Component = "Agent"
+    }
+  )
+}
+
+resource "aws_lambda_event_source_mapping" "impact_batch" {
+  event_source_arn                   = aws_sqs_queue.impact_batch.arn
+  function_name                      = aws_lambda_function.impact_batcher.arn
+  enabled                            = var.enable_impact_batching
+  batch_size                         = 100
+  maximum_batching_window_in_seconds = var.impact_batch_window_seconds
+  function_response_types            = ["ReportBatchItemFailures"]
+}
+
+# Approval Handler Lambda - same package as the contract generator, resumes workflows
+# waiting on a contract approval as soon as the approval item is decided
+resource "aws_lambda_function" "approval_handler" {
+  filename         = data.archive_file.contract_generator.output_path
+  function_name    = local.lambda_names.approval_handler
+  role            = aws_iam_role.lambda_agent.arn
+  handler         = "contract_generator.approval_handler"
+  source_code_hash = data.archive_file.contract_generator.output_base64sha256
+  runtime         = local.lambda_runtime
+  layers          = [aws_lambda_layer_version.agent_dependencies.arn]
+  timeout         = 60
+  memory_size     = 256
+
+  environment {
+    variables = {
+      CONTRACT_APPROVALS_TABLE = aws_dynamodb_table.contract_approvals.name
+      CONTRACTS_BUCKET         = aws_s3_bucket.contracts.id
+      ENVIRONMENT              = var.environment
+    }
+  }
+
+  tags = merge(
+    local.common_tags,
+    {
+      Name = "SchemaGuard Approval Handler"
+      Component = "Agent"
+    }
+  )
+}
+
+resource "aws_lambda_event_source_mapping" "contract_approvals" {
+  event_source_arn        = aws_dynamodb_table.contract_approvals.stream_arn
+  function_name           = aws_lambda_function.approval_handler.arn
+  starting_position       = "LATEST"
+  batch_size              = 10
+  function_response_types = ["ReportBatchItemFailures"]
+
+  filter_criteria {
+    filter {
+      pattern = jsonencode({ eventName = ["MODIFY"] })
+    }
+  }
+}
+
+# ETL Batcher Lambda - one production Glue run per window of NO_CHANGE files
+resource "aws_lambda_function" "etl_batcher" {
+  filename         = data.archive_file.etl_batcher.output_path
+  function_name    = local.lambda_names.etl_batcher
+  role            = aws_iam_role.lambda_agent.arn
+  handler         = "etl_batcher.lambda_handler"
+  source_code_hash = data.archive_file.etl_batcher.output_base64sha256
+  runtime         = local.lambda_runtime
+  layers          = [aws_lambda_layer_version.agent_dependencies.arn]
+  timeout         = local.lambda_timeout
+  memory_size     = 256
+
+  environment {
+    variables = {
+      GLUE_JOB_NAME         = aws_glue_job.etl_job.name
+      MANIFEST_BUCKET       = aws_s3_bucket.raw.id
+      EXECUTION_STATE_TABLE = aws_dynamodb_table.execution_state.name
+      ETL_BATCH_MAX_FILES   = tostring(var.etl_batch_max_files)
+      ENVIRONMENT           = var.environment
+    }
+  }
+
+  tags = merge(
+    local.common_tags,
+    {
+      Name = "SchemaGuard ETL Batcher"
+      Component = "Agent"
+    }
+  )
+}
+
+resource "aws_lambda_event_source_mapping" "etl_batch" {
+  event_source_arn                   = aws_sqs_queue.etl_batch.arn
+  function_name                      = aws_lambda_function.etl_batcher.arn
+  enabled                            = var.enable_etl_batching
+  batch_size                         = var.etl_batch_max_files
+  maximum_batching_window_in_seconds = var.etl_batch_window_seconds
+  function_response_types            = ["ReportBatchItemFailures"]
+}
+
+# ETL Batch Monitor Lambda - same package as the ETL batcher, settles the executions
+# of a batched Glue run when the run finishes
+resource "aws_lambda_function" "etl_batch_monitor" {
+  filename         = data.archive_file.etl_batcher.output_path
+  function_name    = local.lambda_names.etl_batch_monitor
+  role            = aws_iam_role.lambda_agent.arn
+  handler         = "etl_batcher.glue_run_handler"
+  source_code_hash = data.archive_file.etl_batcher.output_base64sha256
+  runtime         = local.lambda_runtime
+  layers          = [aws_lambda_layer_version.agent_dependencies.arn]
+  timeout         = local.lambda_timeout
+  memory_size     = 256
+
+  environment {
+    variables = {
+      GLUE_JOB_NAME         = aws_glue_job.etl_job.name
+      MANIFEST_BUCKET       = aws_s3_bucket.raw.id
+      EXECUTION_STATE_TABLE = aws_dynamodb_table.execution_state.name
+      SNS_TOPIC_ARN         = aws_sns_topic.schema_drift_alerts.arn
+      ENVIRONMENT           = var.environment
+    }
+  }
+
+  tags = merge(
+    local.common_tags,
+    {
+      Name = "SchemaGuard ETL Batch Monitor"
+      Component = "Agent"
+    }
+  )
+}
+
+resource "aws_cloudwatch_event_rule" "glue_job_finished" {
+  name        = "${local.resource_prefix}-glue-job-finished"
+  description = "Report finished SchemaGuard ETL runs to the ETL batch monitor"
+  state       = var.enable_etl_batching ? "ENABLED" : "DISABLED"
+
+  event_pattern = jsonencode({
+    source      = ["aws.glue"]
+    detail-type = ["Glue Job State Change"]
+    detail = {
+      jobName = [aws_glue_job.etl_job.name]
+      state   = ["SUCCEEDED", "FAILED", "TIMEOUT", "STOPPED"]
+    }
+  })
+
+  tags = local.common_tags
+}
+
+resource "aws_cloudwatch_event_target" "etl_batch_monitor" {
+  rule      = aws_cloudwatch_event_rule.glue_job_finished.name
+  target_id = "SettleBatchedExecutions"
+  arn       = aws_lambda_function.etl_batch_monitor.arn
+}
+
+resource "aws_lambda_permission" "etl_batch_monitor" {
+  statement_id  = "AllowGlueJobStateChange"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.etl_batch_monitor.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.glue_job_finished.arn
+}
+
 # CloudWatch Log Groups for Lambda functions (centralized configuration)
 resource "aws_cloudwatch_log_group" "schema_analyzer" {
   name              = "/aws/lambda/${aws_lambda_function.schema_analyzer.function_name}"
@@ -146,3 +376,31 @@ resource "aws_cloudwatch_log_group" "staging_validator" {
 
   tags = local.common_tags
 }
+
+resource "aws_cloudwatch_log_group" "impact_batcher" {
+  name              = "/aws/lambda/${aws_lambda_function.impact_batcher.function_name}"
+  retention_in_days = local.log_retention_days
+
+  tags = local.common_tags
+}
+
+resource "aws_cloudwatch_log_group" "approval_handler" {
+  name              = "/aws/lambda/${aws_lambda_function.approval_handler.function_name}"
+  retention_in_days = local.log_retention_days
+
+  tags = local.common_tags
+}
+
+resource "aws_cloudwatch_log_group" "etl_batcher" {
+  name              = "/aws/lambda/${aws_lambda_function.etl_batcher.function_name}"
+  retention_in_days = local.log_retention_days
+
+  tags = local.common_tags
+}
+
+resource "aws_cloudwatch_log_group" "etl_batch_monitor" {
+  name              = "/aws/lambda/${aws_lambda_function.etl_batch_monitor.function_name}"
+  retention_in_days = local.log_retention_days
+
+  tags = local.common_tags
+}
@@ -25,6 +25,9 @@ locals {
   lambda_runtime     = "python3.11"
   lambda_timeout     = 300
   lambda_memory_size = 512
+
+  # agents/requirements.txt installed for the Lambda platform (see the agent_dependencies layer)
+  agent_dependencies_dir = "${path.module}/build/agent-dependencies"
   
   # S3 bucket names with account ID for global uniqueness
   bucket_names = {
@@ -50,7 +53,19 @@ locals {
     contract_generator = "${local.resource_prefix}-contract-generator"
     etl_patch_agent    = "${local.resource_prefix}-etl-patch-agent"
     staging_validator  = "${local.resource_prefix}-staging-validator"
+    impact_batcher     = "${local.resource_prefix}-impact-batcher"
+    approval_handler   = "${local.resource_prefix}-approval-handler"
+    etl_batcher        = "${local.resource_prefix}-etl-batcher"
+    etl_batch_monitor  = "${local.resource_prefix}-etl-batch-monitor"
   }
+
+  # Bulk orchestrator name and ARNs (referenced from its own role policy)
+  bulk_state_machine_name = "${local.resource_prefix}-bulk-orchestrator"
+  bulk_state_machine_arn  = "arn:${local.partition}:states:${var.aws_region}:${local.account_id}:stateMachine:${local.bulk_state_machine_name}"
+  bulk_state_machine_executions = [
+    "arn:${local.partition}:states:${var.aws_region}:${local.account_id}:execution:${local.bulk_state_machine_name}/*",
+    "arn:${local.partition}:states:${var.aws_region}:${local.account_id}:express:${local.bulk_state_machine_name}/*"
+  ]
   
   # CloudWatch log retention (centralized)
   log_retention_days = 30
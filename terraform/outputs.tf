@@ -45,11 +45,31 @@ output "step_functions_arn" {
   value       = aws_sfn_state_machine.schemaguard_orchestrator.arn
 }
 
+output "bulk_step_functions_arn" {
+  description = "ARN of the bulk (prefix or manifest fan-out) state machine"
+  value       = aws_sfn_state_machine.schemaguard_bulk.arn
+}
+
 output "schema_history_table" {
   description = "DynamoDB table for schema history"
   value       = aws_dynamodb_table.schema_history.name
 }
 
+output "schema_blobs_table" {
+  description = "DynamoDB table for content-addressed schema blobs"
+  value       = aws_dynamodb_table.schema_blobs.name
+}
+
+output "schema_fingerprints_table" {
+  description = "DynamoDB table for cached schema analysis results"
+  value       = aws_dynamodb_table.schema_fingerprints.name
+}
+
+output "impact_cache_table" {
+  description = "DynamoDB table for cached Bedrock impact analyses"
+  value       = aws_dynamodb_table.impact_cache.name
+}
+
 output "contract_approvals_table" {
   description = "DynamoDB table for contract approvals"
   value       = aws_dynamodb_table.contract_approvals.name
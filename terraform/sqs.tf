@@ -0,0 +1,67 @@
+# SQS queues for micro-batched Bedrock impact analysis and production ETL runs
+
+# Impact batch queue - analyzer invocations queue distinct diffs for one multi-diff prompt
+resource "aws_sqs_queue" "impact_batch" {
+  name                       = "${local.resource_prefix}-impact-batch"
+  visibility_timeout_seconds = local.lambda_timeout + 60
+  message_retention_seconds  = 3600
+  sqs_managed_sse_enabled    = true
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.impact_batch_dlq.arn
+    maxReceiveCount     = 3
+  })
+
+  tags = merge(
+    local.common_tags,
+    {
+      Name = "SchemaGuard Impact Batch Queue"
+    }
+  )
+}
+
+resource "aws_sqs_queue" "impact_batch_dlq" {
+  name                      = "${local.resource_prefix}-impact-batch-dlq"
+  message_retention_seconds = 1209600
+  sqs_managed_sse_enabled   = true
+
+  tags = merge(
+    local.common_tags,
+    {
+      Name = "SchemaGuard Impact Batch DLQ"
+    }
+  )
+}
+
+# ETL batch queue - NO_CHANGE files wait here for one production Glue run per window
+resource "aws_sqs_queue" "etl_batch" {
+  name                       = "${local.resource_prefix}-etl-batch"
+  visibility_timeout_seconds = local.lambda_timeout + var.etl_batch_window_seconds + 60
+  message_retention_seconds  = 86400
+  sqs_managed_sse_enabled    = true
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.etl_batch_dlq.arn
+    maxReceiveCount     = 5
+  })
+
+  tags = merge(
+    local.common_tags,
+    {
+      Name = "SchemaGuard ETL Batch Queue"
+    }
+  )
+}
+
+resource "aws_sqs_queue" "etl_batch_dlq" {
+  name                      = "${local.resource_prefix}-etl-batch-dlq"
+  message_retention_seconds = 1209600
+  sqs_managed_sse_enabled   = true
+
+  tags = merge(
+    local.common_tags,
+    {
+      Name = "SchemaGuard ETL Batch DLQ"
+    }
+  )
+}
@@ -5,13 +5,16 @@ resource "aws_sfn_state_machine" "schemaguard_orchestrator" {
   role_arn = aws_iam_role.step_functions.arn
 
   definition = templatefile("${path.module}/../step-functions/schemaguard-state-machine.json", {
-    schema_analyzer_arn     = aws_lambda_function.schema_analyzer.arn
-    contract_generator_arn  = aws_lambda_function.contract_generator.arn
-    etl_patch_agent_arn     = aws_lambda_function.etl_patch_agent.arn
-    staging_validator_arn   = aws_lambda_function.staging_validator.arn
-    glue_job_name           = aws_glue_job.etl_job.name
-    sns_topic_arn           = aws_sns_topic.schema_drift_alerts.arn
-    execution_state_table   = aws_dynamodb_table.execution_state.name
+    schema_analyzer_arn      = aws_lambda_function.schema_analyzer.arn
+    contract_generator_arn   = aws_lambda_function.contract_generator.arn
+    etl_patch_agent_arn      = aws_lambda_function.etl_patch_agent.arn
+    staging_validator_arn    = aws_lambda_function.staging_validator.arn
+    glue_job_name            = aws_glue_job.etl_job.name
+    sns_topic_arn            = aws_sns_topic.schema_drift_alerts.arn
+    execution_state_table    = aws_dynamodb_table.execution_state.name
+    approval_timeout_seconds = var.approval_timeout_seconds
+    etl_batch_queue_url      = aws_sqs_queue.etl_batch.url
+    no_change_state          = var.enable_etl_batching ? "QueueNoChangeFile" : "ExecuteETLProduction"
   })
 
   logging_configuration {
@@ -32,6 +35,44 @@ resource "aws_sfn_state_machine" "schemaguard_orchestrator" {
   )
 }
 
+# Bulk entry point: takes an S3 prefix or key manifest, fans schema analysis out with a
+# distributed Map and runs ETL once per distinct schema decision
+resource "aws_sfn_state_machine" "schemaguard_bulk" {
+  name     = local.bulk_state_machine_name
+  role_arn = aws_iam_role.step_functions.arn
+
+  definition = templatefile("${path.module}/../step-functions/schemaguard-bulk-state-machine.json", {
+    schema_analyzer_arn               = aws_lambda_function.schema_analyzer.arn
+    contract_generator_arn            = aws_lambda_function.contract_generator.arn
+    etl_batcher_arn                   = aws_lambda_function.etl_batcher.arn
+    staging_validator_arn             = aws_lambda_function.staging_validator.arn
+    glue_job_name                     = aws_glue_job.etl_job.name
+    sns_topic_arn                     = aws_sns_topic.schema_drift_alerts.arn
+    results_bucket                    = aws_s3_bucket.raw.id
+    bulk_max_concurrency              = var.bulk_max_concurrency
+    bulk_items_per_batch              = var.bulk_items_per_batch
+    bulk_etl_concurrency              = var.bulk_etl_concurrency
+    bulk_tolerated_failure_percentage = var.bulk_tolerated_failure_percentage
+  })
+
+  logging_configuration {
+    log_destination        = "${aws_cloudwatch_log_group.step_functions_bulk.arn}:*"
+    include_execution_data = true
+    level                  = "ERROR"
+  }
+
+  tracing_configuration {
+    enabled = true
+  }
+
+  tags = merge(
+    local.common_tags,
+    {
+      Name = "SchemaGuard Bulk Orchestrator"
+    }
+  )
+}
+
 # CloudWatch Log Group for Step Functions
 resource "aws_cloudwatch_log_group" "step_functions" {
   name              = "/aws/vendedlogs/states/${local.resource_prefix}-orchestrator"
@@ -40,6 +81,13 @@ resource "aws_cloudwatch_log_group" "step_functions" {
   tags = local.common_tags
 }
 
+resource "aws_cloudwatch_log_group" "step_functions_bulk" {
+  name              = "/aws/vendedlogs/states/${local.bulk_state_machine_name}"
+  retention_in_days = 30
+
+  tags = local.common_tags
+}
+
 # EventBridge Rule to trigger Step Functions on S3 events
 resource "aws_cloudwatch_event_rule" "s3_object_created" {
   name        = "${local.resource_prefix}-s3-object-created"
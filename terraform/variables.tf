@@ -74,3 +74,63 @@ variable "tags" {
     Purpose     = "Agentic-ETL-Platform"
   }
 }
+
+variable "enable_impact_batching" {
+  description = "Batch Bedrock impact analyses across concurrent executions through SQS"
+  type        = bool
+  default     = false
+}
+
+variable "impact_batch_window_seconds" {
+  description = "SQS batching window for the impact batcher Lambda"
+  type        = number
+  default     = 5
+}
+
+variable "enable_etl_batching" {
+  description = "Queue NO_CHANGE files and run the production ETL once per window instead of once per file"
+  type        = bool
+  default     = false
+}
+
+variable "etl_batch_window_seconds" {
+  description = "How long NO_CHANGE files are collected before one production Glue run (max 300)"
+  type        = number
+  default     = 120
+}
+
+variable "etl_batch_max_files" {
+  description = "Maximum files in one production Glue run; a full window starts the run early"
+  type        = number
+  default     = 500
+}
+
+variable "bulk_max_concurrency" {
+  description = "Concurrent analyzer batches in the bulk orchestrator's distributed Map"
+  type        = number
+  default     = 40
+}
+
+variable "bulk_items_per_batch" {
+  description = "S3 keys handed to one schema analyzer invocation by the bulk orchestrator"
+  type        = number
+  default     = 100
+}
+
+variable "bulk_etl_concurrency" {
+  description = "Concurrent Glue runs (one per distinct schema decision) in the bulk orchestrator"
+  type        = number
+  default     = 2
+}
+
+variable "bulk_tolerated_failure_percentage" {
+  description = "Share of analyzer batches that may fail before a bulk run fails"
+  type        = number
+  default     = 5
+}
+
+variable "approval_timeout_seconds" {
+  description = "How long a workflow waits for a contract approval before quarantining the data"
+  type        = number
+  default     = 604800
+}
@@ -2,16 +2,38 @@
 """
 Results Analyzer for SchemaGuard AI
 Analyzes actual performance and generates metrics for README
+
+File totals come from the per-schema counters (counter#... items), which
+count every analyzed file including fingerprint-cache hits; per-file detail
+rows exist only for freshly analyzed schemas. Set HISTORY_WRITE_SHARDS if
+the deployment does not use the default of 8. Detail rows are decoded with
+read_schema_history, which resolves schema refs from the blob table (by
+default the history table name with schema-history replaced by schema-blobs).
 """
 
 import json
+import os
+import sys
 import boto3
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
 
-def analyze_results(schema_history_table, execution_state_table):
+AGENTS_DIR = Path(__file__).resolve().parent.parent / "agents"
+
+def load_analyzer(schema_history_table, schema_blob_table):
+    """Import schema_analyzer against the deployed tables (for read_schema_counters and read_schema_history)"""
+    os.environ["SCHEMA_HISTORY_TABLE"] = schema_history_table
+    os.environ["SCHEMA_BLOB_TABLE"] = schema_blob_table
+    for name in ["AGENT_MEMORY_TABLE", "CONTRACTS_BUCKET", "BEDROCK_MODEL_ID"]:
+        os.environ.setdefault(name, "analyze-results")
+    sys.path.insert(0, str(AGENTS_DIR))
+    import schema_analyzer
+    return schema_analyzer
+
+def analyze_results(schema_history_table, execution_state_table, schema_blob_table=None):
     """Analyze test results from DynamoDB"""
+    schema_blob_table = schema_blob_table or schema_history_table.replace("schema-history", "schema-blobs")
     
     dynamodb = boto3.resource('dynamodb')
     schema_table = dynamodb.Table(schema_history_table)
@@ -21,24 +43,41 @@ def analyze_results(schema_history_table, execution_state_table):
     print("=" * 70)
     print()
     
-    # Scan schema history
+    # Scan schema history: detail rows are analyses, counter rows only name the schemas seen
     print("📊 Scanning schema history...")
     schema_results = schema_table.scan()
-    items = schema_results['Items']
+    scanned = schema_results['Items']
     
     # Handle pagination
     while 'LastEvaluatedKey' in schema_results:
         schema_results = schema_table.scan(ExclusiveStartKey=schema_results['LastEvaluatedKey'])
-        items.extend(schema_results['Items'])
-    
-    print(f"   Found {len(items)} schema analysis records")
+        scanned.extend(schema_results['Items'])
+    
+    analyzer = load_analyzer(schema_history_table, schema_blob_table)
+    items = [analyzer.read_schema_history(item) for item in scanned if not item['schema_id'].startswith('counter#')]
+    fingerprints = {item['schema_fingerprint'] for item in scanned
+                    if item['schema_id'].startswith('counter#') and 'schema_fingerprint' in item}
+    
+    # Totals per schema, summed over counter shards and time buckets
+    change_types = defaultdict(int)
+    total_files = 0
+    for fingerprint in fingerprints:
+        for bucket in analyzer.read_schema_counters(fingerprint).values():
+            total_files += bucket['file_count']
+            for change_type, files in bucket['change_types'].items():
+                change_types[change_type] += files
+    
+    print(f"   Found {len(items)} schema analysis records and {len(fingerprints)} distinct schemas")
+    print(f"   Counted {total_files} processed files")
     print()
     
     # Analyze results
     analysis = {
         "test_run_date": datetime.utcnow().isoformat(),
-        "total_files_processed": len(items),
-        "change_types": defaultdict(int),
+        "total_files_processed": total_files,
+        "schema_analyses": len(items),
+        "change_types": change_types,
+        "risk_levels": defaultdict(int),
         "processing_times": [],
         "accuracy_metrics": {
             "correct_detections": 0,
@@ -60,10 +99,9 @@ def analyze_results(schema_history_table, execution_state_table):
         }
     }
     
-    # Process each item
+    # Process each detail row
     for item in items:
-        change_type = item.get('change_type', 'UNKNOWN')
-        analysis["change_types"][change_type] += 1
+        analysis["risk_levels"][item.get('impact_analysis', {}).get('risk_level', 'UNKNOWN')] += 1
         
         # Calculate processing time if available
         if 'timestamp' in item and 'execution_id' in item:
@@ -80,14 +118,14 @@ def analyze_results(schema_history_table, execution_state_table):
         analysis["performance_metrics"]["p95_time_seconds"] = times[int(len(times)*0.95)]
         analysis["performance_metrics"]["p99_time_seconds"] = times[int(len(times)*0.99)]
     
-    # Cost estimation
+    # Cost estimation (fingerprint-cache hits make no Bedrock call and write no detail row)
     analysis["cost_metrics"]["bedrock_calls"] = len(items)
-    analysis["cost_metrics"]["lambda_invocations"] = len(items) * 4  # 4 Lambda functions
+    analysis["cost_metrics"]["lambda_invocations"] = total_files * 4  # 4 Lambda functions
     analysis["cost_metrics"]["estimated_cost_usd"] = (
         (len(items) * 0.003) +  # Bedrock
-        (len(items) * 4 * 0.0000002) +  # Lambda
-        (len(items) * 10 * 0.000025) +  # Step Functions
-        (len(items) * 5 * 0.00000125)  # DynamoDB
+        (total_files * 4 * 0.0000002) +  # Lambda
+        (total_files * 10 * 0.000025) +  # Step Functions
+        (total_files * 5 * 0.00000125)  # DynamoDB
     )
     
     # Load expected results
@@ -113,7 +151,7 @@ def analyze_results(schema_history_table, execution_state_table):
 
 **Test Environment:** AWS {boto3.session.Session().region_name}  
 **Test Date:** {datetime.utcnow().strftime('%B %d, %Y')}  
-**Test Duration:** {analysis['performance_metrics']['avg_time_seconds'] * len(items) / 60:.1f} minutes
+**Test Duration:** {analysis['performance_metrics']['avg_time_seconds'] * total_files / 60:.1f} minutes
 
 ### Test Results
 
@@ -142,8 +180,8 @@ def analyze_results(schema_history_table, execution_state_table):
 |-----------|-------|------------|
 | **Bedrock API Calls** | {analysis['cost_metrics']['bedrock_calls']:,} | ${analysis['cost_metrics']['bedrock_calls'] * 0.003:.2f} |
 | **Lambda Invocations** | {analysis['cost_metrics']['lambda_invocations']:,} | ${analysis['cost_metrics']['lambda_invocations'] * 0.0000002:.2f} |
-| **Step Functions** | {analysis['cost_metrics']['bedrock_calls'] * 10:,} transitions | ${analysis['cost_metrics']['bedrock_calls'] * 10 * 0.000025:.2f} |
-| **DynamoDB Writes** | {analysis['cost_metrics']['bedrock_calls'] * 5:,} | ${analysis['cost_metrics']['bedrock_calls'] * 5 * 0.00000125:.2f} |
+| **Step Functions** | {total_files * 10:,} transitions | ${total_files * 10 * 0.000025:.2f} |
+| **DynamoDB Writes** | {total_files * 5:,} | ${total_files * 5 * 0.00000125:.2f} |
 | **Total** | - | **${analysis['cost_metrics']['estimated_cost_usd']:.2f}** |
 | **Cost per File** | - | **${analysis['cost_metrics']['estimated_cost_usd']/analysis['total_files_processed']:.5f}** |
 
@@ -173,6 +211,7 @@ def analyze_results(schema_history_table, execution_state_table):
     print()
     print(f"📊 Results Summary:")
     print(f"   Files processed: {analysis['total_files_processed']:,}")
+    print(f"   Risk levels (analyzed schemas): {dict(analysis['risk_levels'])}")
     print(f"   Avg processing time: {analysis['performance_metrics']['avg_time_seconds']:.1f}s")
     print(f"   Total cost: ${analysis['cost_metrics']['estimated_cost_usd']:.2f}")
     print()
@@ -191,7 +230,7 @@ if __name__ == "__main__":
     import sys
     
     if len(sys.argv) < 3:
-        print("Usage: python analyze_results.py <schema-history-table> <execution-state-table>")
+        print("Usage: python analyze_results.py <schema-history-table> <execution-state-table> [schema-blobs-table]")
         print()
         print("Example:")
         print("  python analyze_results.py schemaguard-ai-dev-schema-history schemaguard-ai-dev-execution-state")
@@ -199,5 +238,6 @@ if __name__ == "__main__":
     
     schema_table = sys.argv[1]
     execution_table = sys.argv[2]
+    blob_table = sys.argv[3] if len(sys.argv) > 3 else None
     
-    analyze_results(schema_table, execution_table)
+    analyze_results(schema_table, execution_table, blob_table)
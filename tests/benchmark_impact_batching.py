@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Micro-batched Impact Analysis Benchmark for SchemaGuard AI
+Replays a backfill of analyzer requests against a local stub model and
+counts Bedrock calls for per-invocation prompts versus the SQS batcher
+(no AWS calls are made; the SQS batching window is simulated)
+"""
+
+import io
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+AGENTS_DIR = Path(__file__).resolve().parent.parent / "agents"
+
+INVOCATIONS = 1000
+DISTINCT_DIFFS = 120
+ARRIVALS_PER_MINUTE = 300
+WINDOW_SECONDS = 5
+
+class StubImpactModel:
+    """Answers single- and multi-diff impact prompts; latency is simulated, not slept"""
+
+    def __init__(self, base_seconds=0.8, seconds_per_answer=0.15):
+        self.base_seconds = base_seconds
+        self.seconds_per_answer = seconds_per_answer
+        self.calls = 0
+        self.simulated_seconds = 0.0
+
+    def answer(self, change):
+        risky = change.get("removed") or change.get("type_changes")
+        return {
+            "risk_level": "HIGH" if risky else "LOW",
+            "safe_to_auto_approve": not risky,
+            "impacts": [f"{entry['field']} added" for entry in change.get("added", [])],
+            "recommendations": []
+        }
+
+    def invoke_model(self, modelId, body, **kwargs):
+        prompt = json.loads(body)["messages"][0]["content"]
+        self.calls += 1
+        if prompt.startswith("Analyze the impact of each"):
+            changes = json.loads(prompt.split("Changes: ", 1)[1].split("\n", 1)[0])
+            text = json.dumps([dict(self.answer(change), id=change["id"]) for change in changes])
+            self.simulated_seconds += self.base_seconds + self.seconds_per_answer * len(changes)
+        else:
+            added = json.loads(prompt.split("Added: ", 1)[1].split("\n", 1)[0])
+            removed = json.loads(prompt.split("Removed: ", 1)[1].split("\n", 1)[0])
+            text = json.dumps(self.answer({"added": added, "removed": removed}))
+            self.simulated_seconds += self.base_seconds + self.seconds_per_answer
+        return {"body": io.BytesIO(json.dumps({"content": [{"type": "text", "text": text}]}).encode())}
+
+def load_analyzer():
+    """Import schema_analyzer with placeholder settings and in-memory caches only"""
+    for name in ["SCHEMA_HISTORY_TABLE", "AGENT_MEMORY_TABLE", "CONTRACTS_BUCKET", "BEDROCK_MODEL_ID"]:
+        os.environ.setdefault(name, "benchmark")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    sys.path.insert(0, str(AGENTS_DIR))
+    import schema_analyzer
+    return schema_analyzer
+
+def build_requests(invocations, distinct):
+    """Nested additive diffs (no local rule matches them), drawn with a skewed popularity"""
+    diffs = []
+    for i in range(distinct):
+        diffs.append({
+            "added_fields": [
+                {"field": f"extension_{i}", "type": "object"},
+                {"field": f"extension_{i}.value", "type": random.choice(["string", "integer"])}
+            ],
+            "removed_fields": [],
+            "type_changes": []
+        })
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    return random.choices(diffs, weights=weights, k=invocations)
+
+def per_invocation(analyzer, requests, shared_cache):
+    """Every analyzer invocation prompts Bedrock for its own diff"""
+    model = StubImpactModel()
+    analyzer.bedrock_runtime = model
+    analyzer.impact_cache.entries.clear()
+    for diff in requests:
+        if not shared_cache:
+            analyzer.impact_cache.entries.clear()
+        analyzer.analyze_impact_with_bedrock(diff, "ADDITIVE", "benchmark", 1)
+    return model
+
+def batched(analyzer, requests):
+    """Group arrivals into SQS batching windows and run the batcher once per window"""
+    model = StubImpactModel()
+    analyzer.bedrock_runtime = model
+    analyzer.impact_cache.entries.clear()
+    per_window = max(1, ARRIVALS_PER_MINUTE * WINDOW_SECONDS // 60)
+    for start in range(0, len(requests), per_window):
+        records = []
+        for offset, diff in enumerate(requests[start:start + per_window]):
+            records.append({"messageId": str(start + offset), "body": json.dumps({
+                "diff_key": analyzer.impact_cache_key(diff, "ADDITIVE", 1),
+                "schema_diff": diff,
+                "change_type": "ADDITIVE",
+                "contract_version": "1"
+            })})
+        response = analyzer.batch_impact_handler({"Records": records}, None)
+        assert not response["batchItemFailures"], response
+    return model
+
+def run_benchmark(invocations=INVOCATIONS):
+    random.seed(7)
+    analyzer = load_analyzer()
+    requests = build_requests(invocations, DISTINCT_DIFFS)
+
+    print("⏱️  SchemaGuard AI - Micro-batched Impact Analysis Benchmark")
+    print("=" * 70)
+    print(f"   {invocations} invocations, {len(set(map(json.dumps, requests)))} distinct diffs, "
+          f"{ARRIVALS_PER_MINUTE}/min arrivals, {WINDOW_SECONDS}s batching window")
+    print()
+
+    start = time.perf_counter()
+    results = {
+        "per_invocation": per_invocation(analyzer, requests, shared_cache=False),
+        "per_invocation_cached": per_invocation(analyzer, requests, shared_cache=True),
+        "batched": batched(analyzer, requests)
+    }
+    for mode, model in results.items():
+        print(f"   {mode:<22} model calls {model.calls:5d}   simulated model time {model.simulated_seconds:8.1f}s")
+
+    print()
+    print(f"   call reduction (batched vs per-invocation): "
+          f"{results['per_invocation'].calls / results['batched'].calls:.1f}x")
+    print(f"   harness wall time {time.perf_counter() - start:.2f}s")
+    print("=" * 70)
+    return {mode: model.calls for mode, model in results.items()}
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else INVOCATIONS)
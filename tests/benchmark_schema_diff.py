@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Schema Diff Benchmark for SchemaGuard AI
+Times the nested schema diff in agents/schema_analyzer.py on wide,
+deeply nested schemas with thousands of leaves
+"""
+
+import copy
+import os
+import sys
+import time
+from pathlib import Path
+
+AGENTS_DIR = Path(__file__).resolve().parent.parent / "agents"
+LEAF_COUNTS = [1000, 5000, 20000, 100000]
+FANOUT = 10
+REPEATS = 5
+
+def load_analyzer():
+    """Import schema_analyzer with placeholder settings (no AWS calls are made)"""
+    for name in ["SCHEMA_HISTORY_TABLE", "AGENT_MEMORY_TABLE", "CONTRACTS_BUCKET", "BEDROCK_MODEL_ID"]:
+        os.environ.setdefault(name, "benchmark")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    sys.path.insert(0, str(AGENTS_DIR))
+    import schema_analyzer
+    return schema_analyzer
+
+def build_schema(leaves, fanout=FANOUT, depth=0):
+    """Build an object schema with `leaves` string leaves spread over nested objects"""
+    if leaves <= fanout:
+        return {
+            "type": "object",
+            "properties": {f"field_{i}": {"type": "string"} for i in range(leaves)}
+        }
+    per_child = -(-leaves // fanout)
+    properties = {}
+    remaining = leaves
+    for i in range(fanout):
+        if remaining <= 0:
+            break
+        properties[f"node_{depth}_{i}"] = build_schema(min(per_child, remaining), fanout, depth + 1)
+        remaining -= per_child
+    return {"type": "object", "properties": properties}
+
+def string_leaf_paths(schema, prefix=""):
+    """Dotted paths of the string leaves of a build_schema() schema, in document order"""
+    paths = []
+    for name, child in schema.get('properties', {}).items():
+        path = f"{prefix}.{name}" if prefix else name
+        paths += [path] if child['type'] == 'string' else string_leaf_paths(child, path)
+    return paths
+
+def mutate(schema):
+    """Return a copy with one nested field added, one removed and one retyped"""
+    incoming = copy.deepcopy(schema)
+    paths = string_leaf_paths(incoming)
+    nodes = {}
+    for path in (paths[0], paths[len(paths) // 2], paths[-1]):
+        node = incoming
+        parts = path.split('.')
+        for part in parts[:-1]:
+            node = node['properties'][part]
+        nodes[path] = (node, parts[-1])
+    (added_parent, _), (removed_parent, removed), (retyped_parent, retyped) = nodes.values()
+    added_parent['properties']['new_nested_field'] = {"type": "integer"}
+    del removed_parent['properties'][removed]
+    retyped_parent['properties'][retyped] = {"type": "integer"}
+    return incoming
+
+def time_best(fn):
+    """Best-of-REPEATS wall time of fn() in seconds"""
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def run_benchmark():
+    """Time compare_schemas cold, with a warm contract tree, and for identical schemas"""
+    analyzer = load_analyzer()
+
+    print("⏱️  SchemaGuard AI - Nested Schema Diff Benchmark")
+    print("=" * 70)
+    print()
+
+    results = []
+    for leaves in LEAF_COUNTS:
+        expected = build_schema(leaves)
+        incoming = mutate(expected)
+        paths = sum(1 for _ in analyzer.schema_paths(expected))
+
+        def cold():
+            analyzer._schema_tree_memo.clear()
+            return analyzer.compare_schemas(expected, incoming)
+
+        # Warm container: the contract tree is memoized, each file brings a new schema object
+        analyzer.schema_tree(expected)
+        fresh_mutated = [copy.deepcopy(incoming) for _ in range(REPEATS)]
+        fresh_identical = [copy.deepcopy(expected) for _ in range(REPEATS)]
+        cold_seconds = time_best(cold)
+        analyzer.schema_tree(expected)
+        warm_seconds = time_best(lambda: analyzer.compare_schemas(expected, fresh_mutated.pop()))
+        identical_seconds = time_best(lambda: analyzer.compare_schemas(expected, fresh_identical.pop()))
+
+        changes = sum(len(entries) for entries in cold().values())
+        results.append({
+            "leaves": leaves, "paths": paths, "changes": changes,
+            "cold_seconds": cold_seconds, "warm_seconds": warm_seconds, "identical_seconds": identical_seconds
+        })
+        print(f"📊 {leaves:>6} leaves ({paths:>6} paths, {changes} changes)")
+        print(f"   cold (hash both + diff)   {cold_seconds * 1000:9.2f} ms   {cold_seconds / paths * 1e6:5.2f} µs/path")
+        print(f"   warm contract tree        {warm_seconds * 1000:9.2f} ms")
+        print(f"   identical schema          {identical_seconds * 1000:9.2f} ms")
+
+    print()
+    print("=" * 70)
+    return results
+
+if __name__ == "__main__":
+    run_benchmark()
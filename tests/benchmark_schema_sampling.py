@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Sampled Schema Inference Benchmark for SchemaGuard AI
+Compares full-scan inference against reservoir sampling with early
+termination on NDJSON batches built from the comprehensive test suite generators
+"""
+
+import importlib.util
+import io
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+TESTS_DIR = Path(__file__).resolve().parent
+AGENTS_DIR = TESTS_DIR.parent / "agents"
+
+RECORDS_PER_BATCH = 100000
+SAMPLE_SIZE = 1000
+STABLE_AFTER = 500
+
+def load_analyzer():
+    """Import schema_analyzer with placeholder settings (no AWS calls are made)"""
+    for name in ["SCHEMA_HISTORY_TABLE", "AGENT_MEMORY_TABLE", "CONTRACTS_BUCKET", "BEDROCK_MODEL_ID"]:
+        os.environ.setdefault(name, "benchmark")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    sys.path.insert(0, str(AGENTS_DIR))
+    import schema_analyzer
+    return schema_analyzer
+
+def load_generators():
+    """Import the event generators from comprehensive-test-suite.py"""
+    spec = importlib.util.spec_from_file_location("comprehensive_test_suite", TESTS_DIR / "comprehensive-test-suite.py")
+    suite = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(suite)
+    return suite
+
+def build_batches(suite, records):
+    """Build one NDJSON batch per scenario plus a mixed batch with the suite's distribution"""
+    generators = {
+        "baseline": suite.generate_baseline_event,
+        "additive": suite.generate_additive_event,
+        "breaking": suite.generate_breaking_event,
+        "missing_required": suite.generate_missing_required_event,
+        "nested_changes": suite.generate_nested_event
+    }
+    batches = {}
+    for scenario, generate in generators.items():
+        batches[scenario] = "\n".join(json.dumps(generate(i)) for i in range(records)).encode()
+
+    total = sum(suite.TEST_SCENARIOS.values())
+    mixed = []
+    for scenario, count in suite.TEST_SCENARIOS.items():
+        mixed.extend(generators[scenario](i) for i in range(records * count // total))
+    random.shuffle(mixed)
+    batches["mixed"] = "\n".join(json.dumps(event) for event in mixed).encode()
+    return batches
+
+def time_profile(analyzer, body, **options):
+    """Run streaming inference once and return (profile, seconds)"""
+    start = time.perf_counter()
+    profile = analyzer.infer_profile_from_stream(io.BytesIO(body), **options)
+    return profile, time.perf_counter() - start
+
+def run_benchmark(records=RECORDS_PER_BATCH):
+    """Benchmark full-scan against sampled inference for each scenario"""
+    random.seed(42)
+    analyzer = load_analyzer()
+    suite = load_generators()
+
+    print("⏱️  SchemaGuard AI - Sampled Schema Inference Benchmark")
+    print("=" * 70)
+    print(f"   {records} records per batch, reservoir {SAMPLE_SIZE}, stable after {STABLE_AFTER}")
+    print()
+
+    results = {}
+    for scenario, body in build_batches(suite, records).items():
+        full, full_seconds = time_profile(analyzer, body)
+        sampled, sampled_seconds = time_profile(
+            analyzer, body, sample_size=SAMPLE_SIZE, stable_after=STABLE_AFTER
+        )
+        full_paths = set(analyzer.schema_paths(full["schema"]))
+        sampled_paths = set(analyzer.schema_paths(sampled["schema"]))
+
+        results[scenario] = {
+            "full_seconds": full_seconds,
+            "sampled_seconds": sampled_seconds,
+            "records_read": sampled["record_count"],
+            "records_inferred": sampled["inferred_records"],
+            "confidence": sampled["confidence"],
+            "path_recall": len(full_paths & sampled_paths) / len(full_paths) if full_paths else 1.0,
+            "schema_identical": full["schema"] == sampled["schema"]
+        }
+        r = results[scenario]
+        print(f"📊 {scenario}")
+        print(f"   full scan  {full_seconds:7.3f}s  ({full['record_count']} records)")
+        print(f"   sampled    {sampled_seconds:7.3f}s  (read {r['records_read']}, inferred {r['records_inferred']})")
+        print(f"   speedup {full_seconds / sampled_seconds:6.1f}x   confidence {r['confidence']:.4f}   "
+              f"path recall {r['path_recall']:.1%}   identical schema: {r['schema_identical']}")
+        print()
+
+    print("=" * 70)
+    return results
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else RECORDS_PER_BATCH)
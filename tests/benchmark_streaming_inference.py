@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Streaming Schema Inference Benchmark for SchemaGuard AI
+Compares peak RSS and wall time of the full-read path against the
+streaming parser in agents/schema_analyzer.py for large batch files
+"""
+
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+AGENTS_DIR = Path(__file__).resolve().parent.parent / "agents"
+DEFAULT_SIZES_MB = [10, 100, 1000]
+
+def load_analyzer():
+    """Import schema_analyzer with placeholder settings (no AWS calls are made)"""
+    for name in ["SCHEMA_HISTORY_TABLE", "AGENT_MEMORY_TABLE", "CONTRACTS_BUCKET", "BEDROCK_MODEL_ID"]:
+        os.environ.setdefault(name, "benchmark")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    sys.path.insert(0, str(AGENTS_DIR))
+    import schema_analyzer
+    return schema_analyzer
+
+def generate_batch_file(path, size_mb):
+    """Write a JSON array of baseline events of roughly size_mb megabytes"""
+    target = size_mb * 1024 * 1024
+    written = 0
+    index = 0
+    with open(path, 'w') as f:
+        f.write("[")
+        while written < target:
+            event = {
+                "id": f"event-{index:09d}",
+                "timestamp": 1704067200000 + index,
+                "event_type": random.choice(["user_action", "system_event", "api_call"]),
+                "user_id": f"user-{random.randint(1000, 9999)}",
+                "data": {
+                    "action": random.choice(["click", "view", "purchase", "search"]),
+                    "target": random.choice(["button", "link", "product", "page"])
+                }
+            }
+            chunk = ("," if index else "") + json.dumps(event)
+            f.write(chunk)
+            written += len(chunk)
+            index += 1
+        f.write("]")
+    return index
+
+def run_worker(mode, path):
+    """Infer the schema of a local file through extract_schema_profile_from_s3 and report usage"""
+    analyzer = load_analyzer()
+    analyzer.s3_client.get_object = lambda Bucket, Key: {"Body": open(path, "rb")}
+
+    start = time.perf_counter()
+    schema = analyzer.extract_schema_profile_from_s3("local", path, streaming=(mode == "streaming"))["schema"]
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "wall_seconds": elapsed,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "schema_type": schema.get("type")
+    }))
+
+def measure(mode, path):
+    """Run one mode in a fresh interpreter so peak RSS is not shared between runs"""
+    output = subprocess.run(
+        [sys.executable, __file__, "--worker", mode, str(path)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def run_benchmark(sizes_mb):
+    """Benchmark both inference paths for each input size"""
+    print("⏱️  SchemaGuard AI - Streaming Schema Inference Benchmark")
+    print("=" * 70)
+    print()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in sizes_mb:
+            path = Path(tmp) / f"batch_{size_mb}mb.json"
+            records = generate_batch_file(path, size_mb)
+            print(f"📁 {size_mb} MB input ({records} records)")
+
+            row = {"size_mb": size_mb, "records": records}
+            for mode in ["full", "streaming"]:
+                stats = measure(mode, path)
+                row[mode] = stats
+                print(f"   {mode:<10} wall {stats['wall_seconds']:8.2f}s   peak RSS {stats['peak_rss_mb']:9.1f} MB")
+            results.append(row)
+            path.unlink()
+            print()
+
+    print("=" * 70)
+    return results
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--worker":
+        run_worker(sys.argv[2], sys.argv[3])
+    else:
+        sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES_MB
+        run_benchmark(sizes)
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Schema History Write Estimator for SchemaGuard AI
+Replays the legacy one-item-per-file history writes and the sharded counter
+writes against DynamoDB Local and estimates, for each pattern, the write
+units per partition key per second against DynamoDB's 1,000 WCU/s partition
+limit.
+
+This is an estimator, not a load test. DynamoDB Local accepts every write
+(it does not emulate partition throughput or report consumed capacity), so
+nothing is measured: each request is charged by the size of the item it
+writes (for a counter update, the updated counter item) and bucketed per key
+per second on the client. Throttling on real DynamoDB also depends on
+adaptive capacity and partition splits, so the output only compares the two
+write patterns; it says nothing about how either behaves on a live table.
+
+Usage:
+    docker run -p 8000:8000 amazon/dynamodb-local
+    python tests/estimate_history_writes.py [files] [endpoint]
+"""
+
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import boto3
+
+AGENTS_DIR = Path(__file__).resolve().parent.parent / "agents"
+
+DEFAULT_FILES = 20000
+DEFAULT_ENDPOINT = "http://localhost:8000"
+BASELINE_SHARE = 0.7
+OTHER_SCHEMAS = 50
+WRITERS = 32
+PARTITION_WCU_LIMIT = 1000
+
+BASELINE_SCHEMA = json.load(open(Path(__file__).resolve().parent.parent / "contracts" / "contract_v1.json"))["schema"]
+
+def local_resource(endpoint):
+    return boto3.resource("dynamodb", endpoint_url=endpoint, region_name="us-east-1",
+                          aws_access_key_id="local", aws_secret_access_key="local")
+
+def attribute_size(value):
+    """Approximate DynamoDB attribute value size in bytes"""
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if hasattr(value, "value"):
+        return len(value.value)
+    if isinstance(value, (int, float)):
+        return len(str(value)) // 2 + 1
+    return len(json.dumps(value, default=str))
+
+def write_units(item):
+    return max(1, math.ceil(sum(len(name) + attribute_size(value) for name, value in item.items()) / 1024))
+
+class WriteMeter:
+    """Thread-safe tally of write units per (partition key, second)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.per_key_second = defaultdict(int)
+        self.total_units = 0
+        self.requests = 0
+
+    def record(self, key, units):
+        with self.lock:
+            self.per_key_second[(key, int(time.time()))] += units
+            self.total_units += units
+            self.requests += 1
+
+    def report(self):
+        busiest = defaultdict(int)
+        for (key, _), units in self.per_key_second.items():
+            busiest[key] = max(busiest[key], units)
+        over = sum(units - PARTITION_WCU_LIMIT for units in self.per_key_second.values() if units > PARTITION_WCU_LIMIT)
+        return {
+            "requests": self.requests,
+            "write_units": self.total_units,
+            "partition_keys": len(busiest),
+            "peak_key_wcu_per_second": max(busiest.values()) if busiest else 0,
+            "units_over_partition_limit": over
+        }
+
+def create_table(dynamodb, name):
+    """Create a table with the schema-history key schema on DynamoDB Local"""
+    try:
+        dynamodb.Table(name).delete()
+        dynamodb.meta.client.get_waiter("table_not_exists").wait(TableName=name)
+    except dynamodb.meta.client.exceptions.ResourceNotFoundException:
+        pass
+    table = dynamodb.create_table(
+        TableName=name,
+        BillingMode="PAY_PER_REQUEST",
+        KeySchema=[{"AttributeName": "schema_id", "KeyType": "HASH"},
+                   {"AttributeName": "timestamp", "KeyType": "RANGE"}],
+        AttributeDefinitions=[{"AttributeName": "schema_id", "AttributeType": "S"},
+                              {"AttributeName": "timestamp", "AttributeType": "N"}]
+    )
+    table.wait_until_exists()
+    return table
+
+def build_workload(files):
+    """Incoming schemas for each file: BASELINE_SHARE of them are the baseline schema"""
+    others = []
+    for i in range(OTHER_SCHEMAS):
+        schema = json.loads(json.dumps(BASELINE_SCHEMA))
+        schema["properties"][f"extra_{i}"] = {"type": "string"}
+        others.append(schema)
+    return [BASELINE_SCHEMA if random.random() < BASELINE_SHARE else random.choice(others) for _ in range(files)]
+
+def load_analyzer(endpoint, table_name, shards, detail):
+    """Import schema_analyzer against DynamoDB Local with the given history settings"""
+    os.environ.update({
+        "SCHEMA_HISTORY_TABLE": table_name,
+        "HISTORY_WRITE_SHARDS": str(shards),
+        "HISTORY_PER_FILE_DETAIL": str(detail).lower(),
+        "SCHEMA_BLOB_TABLE": ""
+    })
+    for name in ["AGENT_MEMORY_TABLE", "CONTRACTS_BUCKET", "BEDROCK_MODEL_ID"]:
+        os.environ.setdefault(name, "estimate")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    sys.path.insert(0, str(AGENTS_DIR))
+    sys.modules.pop("schema_analyzer", None)
+    import schema_analyzer
+    schema_analyzer.dynamodb = local_resource(endpoint)
+    schema_analyzer.history_writes.dynamodb = schema_analyzer.dynamodb
+    return schema_analyzer
+
+def run_legacy(table, workload, meter):
+    """The pre-sharding write path: one full JSON item per file, keyed on the schema hash"""
+    import hashlib
+
+    def write(index_schema):
+        index, schema = index_schema
+        item = {
+            "schema_id": hashlib.md5(json.dumps(schema, sort_keys=True).encode()).hexdigest(),
+            "timestamp": int(time.time() * 1000),
+            "execution_id": f"estimate-{index}",
+            "data_source": "raw_data",
+            "incoming_schema": json.dumps(schema),
+            "expected_schema": json.dumps(BASELINE_SCHEMA),
+            "schema_diff": json.dumps({"added_fields": [], "removed_fields": [], "type_changes": []}),
+            "change_type": "NO_CHANGE",
+            "impact_analysis": json.dumps({"risk_level": "LOW", "impacts": [], "recommendations": [],
+                                           "safe_to_auto_approve": True}),
+            "expiration_time": int(time.time()) + 90 * 24 * 60 * 60
+        }
+        table.put_item(Item=item)
+        meter.record(item["schema_id"], write_units(item))
+
+    with ThreadPoolExecutor(max_workers=WRITERS) as pool:
+        list(pool.map(write, enumerate(workload)))
+
+def run_sharded(analyzer, workload, meter):
+    """The counter path: one small atomic update per file on a sharded key"""
+    original_update = analyzer.get_table(analyzer.SCHEMA_HISTORY_TABLE).update_item
+
+    def metered_update(**request):
+        response = original_update(**request)
+        values = request["ExpressionAttributeValues"]
+        counter_item = dict(request["Key"], file_count=values[":files"], record_count=values[":records"],
+                            schema_fingerprint=values[":fingerprint"], change_type=values[":change_type"],
+                            last_execution_id=values[":execution_id"], expiration_time=values[":expires"])
+        meter.record(request["Key"]["schema_id"], write_units(counter_item))
+        return response
+
+    analyzer.get_table(analyzer.SCHEMA_HISTORY_TABLE).update_item = metered_update
+
+    def write(index_schema):
+        index, schema = index_schema
+        analyzer.record_schema_counter(analyzer.schema_fingerprint(schema), "NO_CHANGE", f"estimate-{index}", 100)
+
+    with ThreadPoolExecutor(max_workers=WRITERS) as pool:
+        list(pool.map(write, enumerate(workload)))
+    return analyzer.read_schema_counters(analyzer.schema_fingerprint(BASELINE_SCHEMA))
+
+def run_estimate(files=DEFAULT_FILES, endpoint=DEFAULT_ENDPOINT):
+    random.seed(19)
+    dynamodb = local_resource(endpoint)
+    workload = build_workload(files)
+
+    print("🧮 SchemaGuard AI - Schema History Write Estimate (DynamoDB Local)")
+    print("=" * 70)
+    print(f"   {files} files, {BASELINE_SHARE:.0%} baseline schema, {WRITERS} concurrent writers")
+    print(f"   Estimated from item sizes, not measured: DynamoDB Local does not meter capacity or throttle")
+    print()
+
+    results = {}
+    for mode in ["legacy", "sharded_counters"]:
+        table = create_table(dynamodb, f"schemaguard-estimate-{mode.replace('_', '-')}")
+        meter = WriteMeter()
+        start = time.perf_counter()
+        if mode == "legacy":
+            run_legacy(table, workload, meter)
+        else:
+            analyzer = load_analyzer(endpoint, table.name, shards=8, detail=False)
+            counters = run_sharded(analyzer, workload, meter)
+            baseline_files = sum(bucket["file_count"] for bucket in counters.values())
+        elapsed = time.perf_counter() - start
+
+        report = meter.report()
+        report["seconds"] = elapsed
+        report["writes_per_second"] = report["requests"] / elapsed
+        results[mode] = report
+        print(f"📊 {mode}")
+        print(f"   {report['requests']} writes in {elapsed:.1f}s ({report['writes_per_second']:.0f}/s), "
+              f"~{report['write_units']} estimated WCU over {report['partition_keys']} partition keys")
+        print(f"   estimated peak WCU/s on one key {report['peak_key_wcu_per_second']}   "
+              f"estimated WCU over the {PARTITION_WCU_LIMIT} WCU/s partition limit: "
+              f"{report['units_over_partition_limit']}")
+        if mode == "sharded_counters":
+            print(f"   baseline files counted across shards: {baseline_files}")
+        print()
+
+    print("=" * 70)
+    return results
+
+if __name__ == "__main__":
+    run_estimate(
+        int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_FILES,
+        sys.argv[2] if len(sys.argv) > 2 else os.environ.get("DYNAMODB_ENDPOINT", DEFAULT_ENDPOINT)
+    )
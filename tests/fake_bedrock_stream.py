@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Fake Bedrock Runtime Client for SchemaGuard AI
+Replays a fixed model answer through invoke_model and
+invoke_model_with_response_stream with simulated token latency,
+so streaming code paths can be exercised without AWS
+"""
+
+import io
+import json
+import time
+
+class FakeEventStream:
+    """Iterable of Anthropic messages stream events, like botocore's EventStream"""
+
+    def __init__(self, text, chunk_chars, seconds_per_chunk):
+        self.text = text
+        self.chunk_chars = chunk_chars
+        self.seconds_per_chunk = seconds_per_chunk
+        self.chunks_sent = 0
+        self.closed = False
+
+    def _event(self, payload):
+        return {"chunk": {"bytes": json.dumps(payload).encode()}}
+
+    def __iter__(self):
+        yield self._event({"type": "message_start", "message": {"role": "assistant"}})
+        yield self._event({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+        for start in range(0, len(self.text), self.chunk_chars):
+            if self.closed:
+                return
+            time.sleep(self.seconds_per_chunk)
+            self.chunks_sent += 1
+            yield self._event({
+                "type": "content_block_delta",
+                "index": 0,
+                "delta": {"type": "text_delta", "text": self.text[start:start + self.chunk_chars]}
+            })
+        yield self._event({"type": "content_block_stop", "index": 0})
+        yield self._event({"type": "message_stop"})
+
+    def close(self):
+        self.closed = True
+
+class FakeBedrockRuntime:
+    """Stand-in for boto3.client('bedrock-runtime') that always gives the same answer"""
+
+    def __init__(self, answer, chunk_chars=8, seconds_per_chunk=0.01):
+        self.text = answer if isinstance(answer, str) else json.dumps(answer)
+        self.chunk_chars = chunk_chars
+        self.seconds_per_chunk = seconds_per_chunk
+        self.streams = []
+
+    def invoke_model(self, modelId, body, **kwargs):
+        chunks = -(-len(self.text) // self.chunk_chars)
+        time.sleep(chunks * self.seconds_per_chunk)
+        payload = {"content": [{"type": "text", "text": self.text}]}
+        return {"body": io.BytesIO(json.dumps(payload).encode())}
+
+    def invoke_model_with_response_stream(self, modelId, body, **kwargs):
+        stream = FakeEventStream(self.text, self.chunk_chars, self.seconds_per_chunk)
+        self.streams.append(stream)
+        return {"body": stream}
@@ -0,0 +1,174 @@
+"""
+Schema Analyzer Tests for SchemaGuard AI
+Runs the sample files in tests/ through schema inference and the contract
+diff (no AWS calls are made; S3 reads are served from the local files)
+
+Usage:
+    python -m pytest tests/test_schema_analyzer.py
+"""
+
+import gzip
+import io
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+TESTS_DIR = Path(__file__).resolve().parent
+AGENTS_DIR = TESTS_DIR.parent / "agents"
+CONTRACT = json.load(open(TESTS_DIR.parent / "contracts" / "contract_v1.json"))
+
+for name in ["SCHEMA_HISTORY_TABLE", "AGENT_MEMORY_TABLE", "CONTRACTS_BUCKET", "BEDROCK_MODEL_ID"]:
+    os.environ.setdefault(name, "test")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+sys.path.insert(0, str(AGENTS_DIR))
+
+import schema_analyzer  # noqa: E402
+
+@pytest.fixture
+def local_s3(monkeypatch):
+    """Serve get_object from files in tests/ (the key is the file name)"""
+    def get_object(Bucket, Key, **kwargs):
+        return {"Body": open(TESTS_DIR / Key, "rb")}
+    monkeypatch.setattr(schema_analyzer.s3_client, "get_object", get_object)
+
+def classify(key, streaming=True):
+    profile = schema_analyzer.extract_schema_profile_from_s3("local", key, streaming=streaming)
+    diff = schema_analyzer.compare_schemas(CONTRACT["schema"], profile["schema"])
+    return profile, schema_analyzer.classify_change(diff)
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_baseline_batch_array_is_no_change(local_s3, streaming):
+    profile, change_type = classify("02-baseline-batch.json", streaming)
+    assert profile["is_array"]
+    assert profile["record_count"] == len(json.load(open(TESTS_DIR / "02-baseline-batch.json")))
+    assert profile["schema"]["type"] == "object"
+    assert change_type == "NO_CHANGE"
+
+@pytest.mark.parametrize("key, expected", [
+    ("01-baseline-single.json", "NO_CHANGE"),
+    ("03-additive-change.json", "ADDITIVE"),
+    ("04-breaking-change.json", "BREAKING")
+])
+def test_single_documents(local_s3, key, expected):
+    assert classify(key)[1] == expected
+
+@pytest.mark.parametrize("key, expected", [
+    ("batch.json", "gzip"),
+    ("batch.json.gz", "")
+])
+def test_undeclared_compression_is_reported_for_glue(monkeypatch, key, expected):
+    body = gzip.compress((TESTS_DIR / "02-baseline-batch.json").read_bytes())
+    monkeypatch.setattr(schema_analyzer.s3_client, "get_object",
+                        lambda Bucket, Key, **kwargs: {"Body": io.BytesIO(body)})
+    profile = schema_analyzer.extract_schema_profile_from_s3("local", key)
+    assert profile["raw_compression"] == expected
+    assert schema_analyzer.classify_change(
+        schema_analyzer.compare_schemas(CONTRACT["schema"], profile["schema"])) == "NO_CHANGE"
+
+@pytest.mark.parametrize("key", ["batch.json", "batch.json.zst"])
+def test_zstd_is_always_reported_for_glue(monkeypatch, key):
+    zstandard = pytest.importorskip("zstandard")
+    body = zstandard.ZstdCompressor().compress((TESTS_DIR / "02-baseline-batch.json").read_bytes())
+    monkeypatch.setattr(schema_analyzer.s3_client, "get_object",
+                        lambda Bucket, Key, **kwargs: {"Body": io.BytesIO(body)})
+    profile = schema_analyzer.extract_schema_profile_from_s3("local", key)
+    assert profile["raw_compression"] == "zstd"
+    assert profile["record_count"] == len(json.load(open(TESTS_DIR / "02-baseline-batch.json")))
+
+def test_empty_incoming_array_is_not_a_removal():
+    contract = {"type": "object", "properties": {
+        "id": {"type": "string"},
+        "tags": {"type": "array", "items": {"type": "string"}}
+    }}
+    empty = schema_analyzer.infer_schema({"id": "a", "tags": []})
+    diff = schema_analyzer.compare_schemas(contract, empty)
+    assert diff["removed_fields"] == []
+    assert schema_analyzer.classify_change(diff) == "NO_CHANGE"
+
+    retyped = schema_analyzer.infer_schema({"id": "a", "tags": [1]})
+    assert schema_analyzer.compare_schemas(contract, retyped)["type_changes"] == [
+        {"field": "tags[]", "expected_type": "string", "incoming_type": "integer"}]
+
+def test_impact_batch_chunk_answers_fit_the_output_limit():
+    assert (schema_analyzer.IMPACT_BATCH_MAX_DIFFS * schema_analyzer.IMPACT_BATCH_ANSWER_TOKENS
+            <= schema_analyzer.IMPACT_BATCH_MAX_OUTPUT_TOKENS)
+
+def test_batched_lookup_is_counted_once(monkeypatch):
+    answers = iter([{}, {"Item": {"payload": json.dumps({"risk_level": "LOW"})}}])
+
+    class Table:
+        def get_item(self, Key):
+            return next(answers)
+
+    monkeypatch.setattr(schema_analyzer, "get_table", lambda name: Table())
+    cache = schema_analyzer.TieredCache("impact", "diff_key", 8, 1)
+    assert cache.get("diff") is None
+    assert cache.wait_for("diff", 1, 0)["value"] == {"risk_level": "LOW"}
+    assert (cache.stats()["misses"], cache.stats()["table_hits"]) == (1, 0)
+
+def test_history_item_round_trips_through_blobs_and_compression(monkeypatch):
+    """store_schema_history writes refs and compressed attributes; read_schema_history undoes both"""
+    blobs, written = {}, []
+
+    class Table:
+        def put_item(self, Item, **kwargs):
+            blobs[Item["blob_id"]] = Item
+
+        def get_item(self, Key):
+            return {"Item": blobs[Key["blob_id"]]} if Key["blob_id"] in blobs else {}
+
+        def update_item(self, **kwargs):
+            pass
+
+    class Buffer:
+        def put(self, item):
+            written.append(item)
+
+    incoming = {f"field_{i}": "string" for i in range(200)}
+    impact = {"risk_level": "LOW", "impacts": ["x" * 2000], "recommendations": [], "safe_to_auto_approve": True}
+    monkeypatch.setattr(schema_analyzer, "get_table", lambda name: Table())
+    monkeypatch.setattr(schema_analyzer, "history_writes", Buffer())
+    monkeypatch.setattr(schema_analyzer, "HISTORY_PER_FILE_DETAIL", True)
+    monkeypatch.setattr(schema_analyzer, "SCHEMA_BLOB_TABLE", "blobs")
+    schema_analyzer.store_schema_history("exec-1", incoming, CONTRACT["schema"], {"added_fields": ["field_0"]},
+                                         "ADDITIVE", impact)
+
+    item, = written
+    assert "incoming_schema" not in item and item["incoming_schema_ref"] in blobs
+    assert isinstance(item["impact_analysis"], schema_analyzer.Binary)
+    decoded = schema_analyzer.read_schema_history(item)
+    assert decoded["incoming_schema"] == incoming
+    assert decoded["expected_schema"] == CONTRACT["schema"]
+    assert decoded["impact_analysis"] == impact
+    assert decoded["schema_diff"] == {"added_fields": ["field_0"]}
+
+def test_inline_history_item_decodes_without_blob_table(monkeypatch):
+    monkeypatch.setattr(schema_analyzer, "SCHEMA_BLOB_TABLE", "")
+    item = {"incoming_schema": schema_analyzer.encode_attribute({"a": "string"}),
+            "impact_analysis": json.dumps({"risk_level": "HIGH"})}
+    assert schema_analyzer.read_schema_history(item) == {"incoming_schema": {"a": "string"},
+                                                         "impact_analysis": {"risk_level": "HIGH"}}
+
+def test_pattern_index_picks_up_a_late_older_approval(monkeypatch):
+    """An approval stamped before the watermark but visible only later is still indexed"""
+    from boto3.dynamodb.conditions import ConditionExpressionBuilder
+
+    visible = [{"schema_pattern": "newer", "decision_timestamp": 100_000}]
+
+    class Table:
+        def query(self, KeyConditionExpression, **kwargs):
+            built = ConditionExpressionBuilder().build_expression(KeyConditionExpression, is_key_condition=True)
+            since = next((value for value in built.attribute_value_placeholders.values()
+                          if isinstance(value, int)), None)
+            return {"Items": [item for item in visible if since is None or item["decision_timestamp"] >= since]}
+
+    monkeypatch.setattr(schema_analyzer, "get_table", lambda name: Table())
+    index = schema_analyzer.PatternIndex("memory", refresh_seconds=1, overlap_seconds=60)
+    assert not index.might_be_approved("older")
+    visible.append({"schema_pattern": "older", "decision_timestamp": 70_000})
+    index.refreshed_at -= 1
+    assert index.might_be_approved("older")
+    assert index.patterns == {"newer", "older"} and index.watermark == 100_000
@@ -0,0 +1,107 @@
+"""
+State Machine Definition Tests for SchemaGuard AI
+Renders the step-functions/ templates the way terraform/step-functions.tf
+does (templatefile with the same variables) and checks the result is a
+valid, fully wired definition
+
+Usage:
+    python -m pytest tests/test_state_machines.py
+"""
+
+import json
+import re
+from pathlib import Path
+
+import pytest
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+STEP_FUNCTIONS_TF = (REPO_DIR / "terraform" / "step-functions.tf").read_text()
+VARIABLES_TF = (REPO_DIR / "terraform" / "variables.tf").read_text()
+
+NUMBER_VARIABLES = set(re.findall(r'variable "(\w+)" \{[^}]*?type\s*=\s*number', VARIABLES_TF))
+TEMPLATES = dict(re.findall(r'templatefile\("\$\{path\.module\}/\.\./step-functions/([\w-]+\.json)", \{(.*?)\n  \}\)',
+                            STEP_FUNCTIONS_TF, re.S))
+
+def template_variables(template):
+    """Map each templatefile variable to the values it can render as"""
+    variables = {}
+    for name, expression in re.findall(r'^\s*(\w+)\s*=\s*(.+)$', TEMPLATES[template], re.M):
+        choices = re.findall(r'"(\w+)"', expression)
+        if re.match(r'var\.(\w+)$', expression) and expression[4:] in NUMBER_VARIABLES:
+            variables[name] = ["60"]
+        elif "?" in expression and choices:
+            variables[name] = choices
+        else:
+            variables[name] = [name]
+    return variables
+
+def renderings(template):
+    """Every combination of conditional values, rendered"""
+    text = (REPO_DIR / "step-functions" / template).read_text()
+    rendered = [text]
+    for name, values in template_variables(template).items():
+        rendered = [r.replace("${" + name + "}", value) for r in rendered for value in values]
+    return rendered
+
+def walk(states):
+    """Yield (states, name, state) for every state, including Map and Parallel bodies"""
+    for name, state in states.items():
+        yield states, name, state
+        bodies = [state.get("ItemProcessor"), state.get("Iterator")] + state.get("Branches", [])
+        for body in filter(None, bodies):
+            yield from walk(body["States"])
+
+def transitions(state):
+    """(target, ResultPath) for each way a state can move on"""
+    if "Next" in state:
+        yield state["Next"], state.get("ResultPath", "$")
+    if "Default" in state:
+        yield state["Default"], None
+    for choice in state.get("Choices", []):
+        yield choice["Next"], None
+    for catcher in state.get("Catch", []):
+        yield catcher["Next"], catcher.get("ResultPath", "$")
+
+@pytest.mark.parametrize("template", sorted(TEMPLATES))
+def test_template_variables_match_terraform(template):
+    text = (REPO_DIR / "step-functions" / template).read_text()
+    assert set(re.findall(r"\$\{(\w+)\}", text)) == set(template_variables(template))
+
+@pytest.mark.parametrize("template", sorted(TEMPLATES))
+def test_rendered_definition_is_wired(template):
+    for rendered in renderings(template):
+        definition = json.loads(rendered)
+        assert definition["StartAt"] in definition["States"]
+        for states, name, state in walk(definition["States"]):
+            for target, _ in transitions(state):
+                assert target in states, f"{name} -> {target}"
+
+def test_quarantine_is_entered_with_an_error():
+    """QuarantineData reads $.error, so every way in must have set it"""
+    for rendered in renderings("schemaguard-state-machine.json"):
+        definition = json.loads(rendered)
+        for _, name, state in walk(definition["States"]):
+            for target, result_path in transitions(state):
+                if target == "QuarantineData":
+                    assert result_path == "$.error", name
+
+def test_bulk_etl_runs_on_a_pinned_contract():
+    """Each bulk Glue run reads $.etl.contract_version, so every path to one must have set it"""
+    for rendered in renderings("schemaguard-bulk-state-machine.json"):
+        definition = json.loads(rendered)
+        body = definition["States"]["RunETLPerDecision"]["ItemProcessor"]
+        states = body["States"]
+        seen = set()
+        pending = [(body["StartAt"], False)]
+        while pending:
+            name, pinned = pending.pop()
+            if (name, pinned) in seen:
+                continue
+            seen.add((name, pinned))
+            state = states[name]
+            if state.get("Resource", "").startswith("arn:aws:states:::glue:"):
+                assert pinned, name
+                assert state["Parameters"]["Arguments"]["--CONTRACT_VERSION.$"] == "$.etl.contract_version"
+            for target, result_path in transitions(state):
+                pending.append((target, pinned or (result_path == "$.etl" and "Next" in state
+                                                   and target == state["Next"])))